@@ -6,92 +6,125 @@ Ngày tạo: 2025-01-16
 Phiên bản: v2.0 AI Enhanced - Complete
 """
 
-import cv2
 import time
+import asyncio
 import json
 import os
 import logging
+import logging.handlers
+import atexit
 import threading
 import tkinter as tk
 from tkinter import ttk, font
-from PIL import Image, ImageTk
 from datetime import datetime
-from typing import Optional, List, Dict, Any
-from dataclasses import dataclass
+from typing import Optional, List, Dict, Any, Tuple
+from dataclasses import dataclass, replace
 from enum import Enum
 import sys
-import numpy as np
 
 # Import modules của dự án
 try:
-    from improved_face_recognition import ImprovedFaceRecognition, FaceDetectionResult
+    from lazy_imports import lazy_module, mark, preload, startup_report, timed, timed_import
+    from audit_log import AuditEventType, AuditLogger, start_queue_logging
+    from access_history import AccessHistory, AccessHistoryHandler
+    from access_schedule import AccessSchedule
     from enhanced_components import (
         Colors, EnhancedBuzzerManager, EnhancedNumpadDialog, 
         EnhancedMessageBox, AdminDataManager, ImprovedAdminGUI
     )
+    from async_devices import AsyncDeviceLayer
+    from auth_policy import AuthPolicy, Factor, FactorResult, MultiFactorSession
+    from auth_state_machine import AuthState, AuthStateMachine, EventType
+    from auth_timing import TimerManager, TimingPolicy
+    from buzzer_player import BackgroundBuzzer
+    from credential_sync import CredentialSyncer, HttpTransport, load_key
+    from device_health import DeviceHealthSupervisor, DeviceState
+    from evidence_recorder import EvidenceRecorder
+    from face_backends import BackendRecognizer, backend_modules, create_backend, gallery_path, resolve_backend
+    from inference_scheduler import InferenceScheduler
+    from occupancy import OccupancyEngine
+    from lockout_tracker import LockoutTracker, card_lockout_key, lockout_keys
+    from preroll_recorder import PrerollRecorder
+    from remote_recognition import RemoteRecognizer
+    from startup_orchestrator import StartupOrchestrator
+    from user_registry import UserRecord, UserRegistry, card_key
 except ImportError as e:
     print(f"❌ Lỗi import modules: {e}")
     print("🔧 Đảm bảo các file sau tồn tại:")
-    print("   - improved_face_recognition.py")
+    print("   - lazy_imports.py")
+    print("   - audit_log.py")
+    print("   - access_history.py")
+    print("   - access_schedule.py")
     print("   - enhanced_components.py")
+    print("   - async_devices.py")
+    print("   - auth_policy.py")
+    print("   - auth_state_machine.py")
+    print("   - auth_timing.py")
+    print("   - buzzer_player.py")
+    print("   - credential_sync.py")
+    print("   - device_health.py")
+    print("   - evidence_recorder.py")
+    print("   - face_backends.py")
+    print("   - inference_scheduler.py")
+    print("   - lockout_tracker.py")
+    print("   - occupancy.py")
+    print("   - preroll_recorder.py")
+    print("   - remote_recognition.py")
+    print("   - startup_orchestrator.py")
+    print("   - user_registry.py")
     sys.exit(1)
 
-# Hardware imports
+# Module nặng - chỉ import khi dùng lần đầu hoặc được nạp trước trên luồng nền
+cv2 = lazy_module("cv2")
+np = lazy_module("numpy")
+Image = lazy_module("PIL.Image")
+ImageTk = lazy_module("PIL.ImageTk")
+face_enrollment = lazy_module("face_enrollment")
+liveness = lazy_module("liveness")
+
+# Hardware imports - gpiozero cần ngay cho relay, driver camera/RFID/vân tay
+# được import trên luồng khởi động (xem _init_camera, _init_rfid, _init_fingerprint)
 try:
-    from picamera2 import Picamera2
     from gpiozero import LED, PWMOutputDevice
-    from pyfingerprint.pyfingerprint import PyFingerprint
-    import board
-    import busio
-    from adafruit_pn532.i2c import PN532_I2C
 except ImportError as e:
     logging.error(f"Không thể import thư viện phần cứng: {e}")
     # Thêm simulation mode cho testing
     print("⚠️ Hardware import failed - running in simulation mode")
-    
-    # Mock hardware classes for testing
-    class MockPicamera2:
-        def configure(self, config): pass
-        def start(self): pass
-        def stop(self): pass
-        def capture_array(self): 
-            return np.zeros((600, 800, 3), dtype=np.uint8)
-    
-    class MockLED:
-        def __init__(self, pin): self.state = True
-        def on(self): self.state = True
-        def off(self): self.state = False
-    
-    class MockPN532:
-        def SAM_configuration(self): pass
-        def read_passive_target(self, timeout=1): return None
-    
-    class MockFingerprint:
-        def verifyPassword(self): return True
-        def readImage(self): return False
-        def convertImage(self, slot): pass
-        def searchTemplate(self): return (-1, 0)
-        def createTemplate(self): pass
-        def storeTemplate(self, pos, slot): pass
-        def deleteTemplate(self, pos): pass
-        def loadTemplate(self, pos, slot): pass
-    
-    # Use mock classes
-    Picamera2 = MockPicamera2
+    LED = None
+
+# Mock hardware classes for testing
+class MockPicamera2:
+    def __init__(self, camera_num=0): pass
+    def create_video_configuration(self, **kwargs): return kwargs
+    def configure(self, config): pass
+    def start(self): pass
+    def stop(self): pass
+    def capture_array(self): 
+        return np.zeros((600, 800, 3), dtype=np.uint8)
+
+class MockLED:
+    def __init__(self, pin): self.state = True
+    def on(self): self.state = True
+    def off(self): self.state = False
+
+class MockPN532:
+    firmware_version = (0x32, 1, 6, 7)
+    def SAM_configuration(self): pass
+    def read_passive_target(self, timeout=1): return None
+
+class MockFingerprint:
+    def verifyPassword(self): return True
+    def readImage(self): return False
+    def convertImage(self, slot): pass
+    def searchTemplate(self): return (-1, 0)
+    def loadTemplate(self, pos, slot): pass
+    def compareCharacteristics(self): return 0
+    def createTemplate(self): pass
+    def storeTemplate(self, pos, slot): pass
+    def deleteTemplate(self, pos): pass
+
+if LED is None:
     LED = MockLED
-    
-    # Mock board and busio
-    class MockBoard:
-        SCL = None
-        SDA = None
-    
-    class MockBusIO:
-        def I2C(self, scl, sda): return None
-    
-    board = MockBoard()
-    busio = MockBusIO()
-    PN532_I2C = lambda i2c, debug=False: MockPN532()
-    PyFingerprint = lambda *args, **kwargs: MockFingerprint()
 
 # ==== CONFIGURATION ====
 @dataclass
@@ -106,12 +139,26 @@ class Config:
     BUZZER_GPIO: int = 17
     RELAY_GPIO: int = 5
     
+    # Thiết bị (mỗi cửa ghi đè trong DOORS)
+    CAMERA_INDEX: int = 0
+    FINGERPRINT_PORT: str = "/dev/ttyUSB0"
+    RFID_I2C_BUS: int = 1  # PN532 có địa chỉ I2C cố định - mỗi cửa cần một bus riêng
+    
     # Face Recognition - AI Enhanced
+    FACE_BACKEND: str = "improved"  # "improved" = ImprovedFaceRecognition, hoặc backend face_backends: "yunet+onnx", "ssd+lbph"...
+    FACE_BACKEND_THRESHOLD: Optional[float] = None  # None: FACE_RECOGNITION_THRESHOLD với lbph, mặc định của backend với loại khác
     FACE_CONFIDENCE_THRESHOLD: float = 0.5
     FACE_RECOGNITION_THRESHOLD: float = 85.0
     FACE_REQUIRED_CONSECUTIVE: int = 5
     FACE_DETECTION_INTERVAL: float = 0.03  # ~33 FPS
     
+    # Liveness (chống ảnh in / màn hình) - chỉ chạy trên frame đã nhận diện, trong khoảng nghỉ giữa hai frame
+    LIVENESS_MODE: str = "enforce"  # "enforce" (cả khi không kiểm tra được -> từ chối), "monitor" (chỉ ghi nhận) hoặc "off"
+    LIVENESS_THRESHOLD: float = 0.5
+    LIVENESS_MAX_FRAMES: int = 45  # Chưa đủ bằng chứng sau số frame này -> coi là giả mạo
+    LIVENESS_BUDGET: float = 0.5  # Phần FACE_DETECTION_INTERVAL dành cho liveness
+    LIVENESS_TEXTURE_MODEL: str = ""  # JSON trọng số kết cấu đã huấn luyện (trống = trọng số mặc định)
+    
     # Camera - Enhanced Quality
     CAMERA_WIDTH: int = 800
     CAMERA_HEIGHT: int = 600
@@ -122,34 +169,159 @@ class Config:
     ADMIN_UID: List[int] = None
     ADMIN_PASS: str = "0809"
     
+    # Người dùng: khuôn mặt / vân tay / thẻ phải thuộc cùng một người ("strict") hoặc độc lập ("off")
+    USERS_PATH: str = "/home/khoi/Desktop/KHOI_LUANAN/users.json"
+    IDENTITY_BINDING: str = "strict"
+    
+    # Lịch ra vào theo khung giờ (ca làm, ngày lễ, nhà thầu) - kiểm tra ngay trước khi mở cửa
+    ACCESS_SCHEDULE_PATH: str = "/home/khoi/Desktop/KHOI_LUANAN/schedules.json"
+    ACCESS_SCHEDULE_DEFAULT: str = "allow"  # Người không có quy tắc nào: "allow" hoặc "deny"
+    
+    # Chống dò mã / thẻ giữa các phiên: cửa sổ trượt, khóa tạm tăng gấp đôi mỗi lần, lưu qua khởi động lại
+    LOCKOUT_PATH: str = "/home/khoi/Desktop/KHOI_LUANAN/lockout.json"
+    LOCKOUT_WINDOW: float = 600.0
+    LOCKOUT_THRESHOLDS: Dict[str, int] = None  # door / passcode / fingerprint / rfid / card
+    LOCKOUT_BASE: float = 30.0
+    LOCKOUT_MAX: float = 3600.0
+    
+    # Anti-passback + số người trong khu vực (mỗi cửa khai báo hướng đầu đọc trong DOORS)
+    DOOR_ZONE: str = "main"
+    DOOR_DIRECTION: str = "none"  # "in", "out" hoặc "none" (không theo dõi)
+    ANTI_PASSBACK: str = "hard"  # "hard" (từ chối), "soft" (chỉ cảnh báo) hoặc "off"
+    OCCUPANCY_PATH: str = "/home/khoi/Desktop/KHOI_LUANAN/occupancy.json"
+    OCCUPANCY_SNAPSHOT_INTERVAL: float = 30.0
+    
     # Timing
     LOCK_OPEN_DURATION: int = 3
     MAX_ATTEMPTS: int = 5
     
+    # Audit log - JSON lines, xoay vòng theo dung lượng và theo ngày
+    DOOR_ID: str = "main"
+    AUDIT_LOG_PATH: str = "/home/khoi/Desktop/KHOI_LUANAN/audit/audit.jsonl"
+    AUDIT_MAX_BYTES: int = 5 * 1024 * 1024
+    AUDIT_BACKUP_COUNT: int = 60
+    HISTORY_PATH: str = "/home/khoi/Desktop/KHOI_LUANAN/history"  # SQLite theo tháng, có chỉ mục
+    
+    # Ảnh bằng chứng khi mở cửa / khuôn mặt lạ / thẻ sai / thất bại
+    EVIDENCE_PATH: str = "/home/khoi/Desktop/KHOI_LUANAN/evidence"
+    EVIDENCE_RING_SIZE: int = 30
+    EVIDENCE_PRE_FRAMES: int = 6
+    EVIDENCE_POST_FRAMES: int = 6
+    EVIDENCE_MAX_MB: int = 512  # Vượt quá thì xóa sự kiện cũ nhất
+    EVIDENCE_COOLDOWN: float = 5.0  # Giây giữa hai lần ghi cùng lý do
+    
+    # Video pre-roll H.264 (stream lores, mã hóa bởi Picamera2)
+    PREROLL_ENABLED: bool = True
+    PREROLL_PATH: str = "/home/khoi/Desktop/KHOI_LUANAN/clips"
+    PREROLL_SECONDS_BEFORE: float = 10.0
+    PREROLL_SECONDS_AFTER: float = 10.0
+    PREROLL_SIZE: tuple = (640, 480)
+    PREROLL_FPS: int = 30
+    PREROLL_BITRATE: int = 2_000_000
+    PREROLL_MAX_MB: int = 2048
+    
+    # Authentication mode: "sequential" (4 bước tuần tự) hoặc "parallel"
+    AUTH_MODE: str = "sequential"
+    PARALLEL_POLICY: str = "face+rfid+passcode"  # Phương án thay thế cách nhau bởi "|"
+    PARALLEL_WINDOW: float = 15.0  # Giây - các yếu tố phải hoàn tất trong cửa sổ này
+    
+    # State machine
+    STEP_TIMEOUT: float = 90.0  # Giây tối đa cho bước vân tay / RFID
+    FSM_TICK_MS: int = 20  # Chu kỳ xử lý hàng đợi sự kiện trên Tk thread
+    
+    # Face enrollment - chọn top-N mẫu từ luồng camera
+    ENROLL_TARGET: int = 20
+    ENROLL_MIN_SAMPLES: int = 15
+    ENROLL_MIN_QUALITY: float = 0.45  # Điểm chất lượng 0..1 (độ nét, góc mặt, độ sáng)
+    ENROLL_DUPLICATE_THRESHOLD: float = 0.95  # Độ tương đồng coi là ảnh trùng
+    ENROLL_MAX_FRAMES: int = 600
+    
+    # UX delays: "standard" (1.5s giữa các bước) hoặc "fast" (chuyển ngay)
+    TIMING_MODE: str = "standard"
+    TIMING_OVERRIDES: Dict[str, float] = None  # vd. {"face_verified": 0.5, "failure_restart": 2.0}
+    
+    # Degraded mode - yếu tố có thiết bị offline: "block" (thất bại ngay, mặc định) hoặc "skip" (bỏ qua bước).
+    # "skip" làm khóa mở với ít yếu tố hơn khi rút thiết bị - chỉ bật khi chấp nhận rủi ro đó
+    DEGRADED_MODE: Dict[str, str] = None
+    DEVICE_FAILURE_THRESHOLD: int = 3  # Số lỗi liên tiếp trước khi coi thiết bị offline
+    DEVICE_RECONNECT_BACKOFF: float = 1.0  # Giây, nhân đôi sau mỗi lần kết nối lại thất bại
+    DEVICE_RECONNECT_MAX_BACKOFF: float = 60.0
+    DEVICE_PROBE_INTERVAL: float = 15.0
+    
+    # Nhiều cửa trong một tiến trình - mỗi phần tử ghi đè Config cho một cửa, vd.
+    # [{"DOOR_ID": "front"}, {"DOOR_ID": "back", "CAMERA_INDEX": 1, "RELAY_GPIO": 6,
+    #   "BUZZER_GPIO": 27, "FINGERPRINT_PORT": "/dev/ttyUSB1", "RFID_I2C_BUS": 3}]
+    DOORS: List[Dict[str, Any]] = None
+    INFERENCE_MAX_BATCH: int = 3  # Frame tối đa mỗi lô suy luận (xen kẽ giữa các cửa)
+    INFERENCE_BATCH_WINDOW: float = 0.005  # Giây chờ gom frame của cửa khác vào cùng lô
+    
+    # Nhận diện trên máy chủ LAN (remote_recognition.py serve) - trống = chỉ dùng model trên thiết bị
+    RECOGNITION_SERVER_URL: str = ""  # vd. "http://192.168.1.50:8765"
+    RECOGNITION_TIMEOUT: float = 0.25  # Giây - chậm hơn thì xử lý frame trên thiết bị
+    RECOGNITION_RETRY_AFTER: float = 10.0  # Giây bỏ qua máy chủ sau khi lỗi liên tiếp
+    RECOGNITION_MAX_WIDTH: int = 640  # Thu nhỏ frame trước khi gửi
+    RECOGNITION_KEY_PATH: str = "/home/khoi/Desktop/KHOI_LUANAN/sync.key"  # Khóa cửa (credential_sync.py door-key)
+    
+    # Đồng bộ thẻ / vân tay / passcode / khuôn mặt từ máy chủ trung tâm (credential_sync.py serve)
+    SYNC_SERVER_URL: str = ""  # vd. "http://192.168.1.50:8766" - trống = chỉ quản lý tại cửa
+    SYNC_INTERVAL: float = 60.0
+    SYNC_STATE_PATH: str = "/home/khoi/Desktop/KHOI_LUANAN/sync_state.json"  # Phiên bản đã áp dụng
+    SYNC_KEY_PATH: str = "/home/khoi/Desktop/KHOI_LUANAN/sync.key"  # credential_sync.py door-key <khóa chủ> <DOOR_ID>
+    
     def __post_init__(self):
         if self.ADMIN_UID is None:
             self.ADMIN_UID = [0xe5, 0xa8, 0xbd, 0x2]
+        if self.TIMING_OVERRIDES is None:
+            self.TIMING_OVERRIDES = {}
+        if self.DEGRADED_MODE is None:
+            self.DEGRADED_MODE = {"fingerprint": "block", "rfid": "block"}
+        if self.DOORS is None:
+            self.DOORS = []
+        if self.LOCKOUT_THRESHOLDS is None:
+            self.LOCKOUT_THRESHOLDS = {}
         
         # Tạo thư mục nếu chưa có
         for path in [self.MODELS_PATH, self.FACE_DATA_PATH, self.ADMIN_DATA_PATH]:
             os.makedirs(path, exist_ok=True)
+    
+    def for_doors(self) -> List["Config"]:
+        """Config riêng cho từng cửa trong DOORS (ảnh bằng chứng / clip tách theo cửa)"""
+        if not self.DOORS:
+            return [self]
+        configs = []
+        for index, overrides in enumerate(self.DOORS):
+            overrides = dict(overrides)
+            door_id = str(overrides.pop("DOOR_ID", index + 1))
+            overrides.setdefault("EVIDENCE_PATH", os.path.join(self.EVIDENCE_PATH, door_id))
+            overrides.setdefault("PREROLL_PATH", os.path.join(self.PREROLL_PATH, door_id))
+            configs.append(replace(self, DOOR_ID=door_id, DOORS=[], **overrides))
+        return configs
 
-class AuthStep(Enum):
-    FACE = "face"
-    FINGERPRINT = "fingerprint"
-    RFID = "rfid"
-    PASSCODE = "passcode"
-    ADMIN = "admin"
+# Vị trí chỉ báo tiến trình trên GUI cho từng yếu tố
+FACTOR_STEPS = {
+    Factor.FACE: 1,
+    Factor.FINGERPRINT: 2,
+    Factor.RFID: 3,
+    Factor.PASSCODE: 4
+}
+
+# Thiết bị được giám sát của từng yếu tố (camera / bàn phím không qua supervisor)
+FACTOR_DEVICES = {
+    Factor.FINGERPRINT: "fingerprint",
+    Factor.RFID: "rfid"
+}
 
 # ==== LOGGING SETUP ====
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(message)s',
-    handlers=[
-        logging.FileHandler('/home/khoi/Desktop/KHOI_LUANAN/system.log'),
-        logging.StreamHandler()
-    ]
-)
+# Handler thật chạy trên luồng QueueListener - Tk thread / luồng thiết bị không chờ I/O thẻ nhớ
+_log_handlers = [
+    logging.handlers.RotatingFileHandler('/home/khoi/Desktop/KHOI_LUANAN/system.log',
+                                         maxBytes=5 * 1024 * 1024, backupCount=5, encoding='utf-8'),
+    logging.StreamHandler()
+]
+for _handler in _log_handlers:
+    _handler.setFormatter(logging.Formatter('%(asctime)s [%(levelname)s] %(message)s'))
+log_listener = start_queue_logging(_log_handlers)
+atexit.register(log_listener.stop)
 logger = logging.getLogger(__name__)
 
 # ==== ENHANCED GUI WITH AI FEATURES ====
@@ -159,7 +331,8 @@ class AIEnhancedSecurityGUI:
         self.fps_counter = 0
         self.fps_start_time = time.time()
         self.current_fps = 0
-        self.detection_stats = {"total": 0, "recognized": 0, "unknown": 0}
+        self.detection_stats = {"total": 0, "recognized": 0, "unknown": 0, "spoof": 0}
+        self.liveness_ms = 0.0  # Chi phí liveness trung bình mỗi frame
         
         self._setup_window()
         self._create_widgets()
@@ -374,7 +547,10 @@ class AIEnhancedSecurityGUI:
         self.time_label.config(text=current_time)
         self.root.after(1000, self._update_time)
     
-    def update_camera(self, frame: np.ndarray, detection_result: Optional[FaceDetectionResult] = None):
+    def record_spoof(self):
+        self.detection_stats["spoof"] = self.detection_stats.get("spoof", 0) + 1
+    
+    def update_camera(self, frame: "np.ndarray", detection_result: Optional["FaceDetectionResult"] = None):
         """Update camera display với AI feedback nâng cao"""
         try:
             # Calculate FPS
@@ -384,7 +560,8 @@ class AIEnhancedSecurityGUI:
                 self.current_fps = self.fps_counter
                 self.fps_counter = 0
                 self.fps_start_time = current_time
-                self.fps_label.config(text=f"FPS: {self.current_fps}")
+                self.fps_label.config(text=f"FPS: {self.current_fps}" +
+                                      (f" | 👁️ {self.liveness_ms:.1f} ms" if self.liveness_ms else ""))
             
             # Update detection statistics
             if detection_result:
@@ -394,8 +571,10 @@ class AIEnhancedSecurityGUI:
                 elif detection_result.detected:
                     self.detection_stats["unknown"] += 1
                 
+                spoof = self.detection_stats.get("spoof", 0)
                 self.detection_count_label.config(
-                    text=f"Total: {self.detection_stats['total']} | OK: {self.detection_stats['recognized']}"
+                    text=f"Total: {self.detection_stats['total']} | OK: {self.detection_stats['recognized']}" +
+                         (f" | Spoof: {spoof}" if spoof else "")
                 )
             
             # Resize frame for display
@@ -466,6 +645,20 @@ class AIEnhancedSecurityGUI:
                 indicator['circle'].config(bg=Colors.TEXT_SECONDARY)
                 indicator['label'].config(fg=Colors.TEXT_SECONDARY)
     
+    def update_factor_indicators(self, completed, armed):
+        """Chỉ báo tiến trình cho chế độ song song (không theo thứ tự)"""
+        for i in range(1, 5):
+            indicator = self.step_indicators[i]
+            if i in completed:
+                indicator['circle'].config(bg=Colors.SUCCESS)
+                indicator['label'].config(fg=Colors.TEXT_PRIMARY)
+            elif i in armed:
+                indicator['circle'].config(bg=Colors.WARNING)
+                indicator['label'].config(fg=Colors.TEXT_PRIMARY)
+            else:
+                indicator['circle'].config(bg=Colors.TEXT_SECONDARY)
+                indicator['label'].config(fg=Colors.TEXT_SECONDARY)
+    
     def update_status(self, message, color=None):
         if color is None:
             color = 'white'
@@ -481,82 +674,402 @@ class AIEnhancedSecurityGUI:
 
 # ==== AI ENHANCED SECURITY SYSTEM ====
 class AIEnhancedSecuritySystem:
-    def __init__(self):
-        self.config = Config()
-        logger.info("🤖 Khởi tạo AI Enhanced Security System...")
-        
-        self._init_hardware()
-        self._init_components()
-        self._init_gui()
-        
-        self.auth_state = {
-            "step": AuthStep.FACE,
-            "consecutive_face_ok": 0,
-            "fingerprint_attempts": 0,
-            "rfid_attempts": 0,
-            "pin_attempts": 0
-        }
+    def __init__(self, config: Optional[Config] = None, primary: Optional["AIEnhancedSecuritySystem"] = None):
+        """primary: cửa đầu tiên - cửa khác dùng chung cửa sổ gốc Tk, model nhận diện, dữ liệu admin và nhật ký"""
+        self.config = config or Config()
+        self.primary = primary
+        logger.info(f"🤖 Khởi tạo AI Enhanced Security System (cửa {self.config.DOOR_ID})...")
         
         self.running = True
-        self.face_thread = None
+        self.face_task = None
+        self.auth_session = None
+        self._parallel_pin_open = False
+        self.enrollment_task = None
+        self._startup_done = False
+        self._session_identities = {}
+        self._session_user: Optional[UserRecord] = None
+        self.liveness_detector = None  # Tạo ở frame đầu tiên cần kiểm tra (cv2 đã nạp)
+        self._liveness_warned = False
+        self.preroll = None
+        self.sync = None
+        
+        # cv2 / numpy / PIL / module của face backend nạp nền trong lúc relay và GUI khởi tạo
+        modules = ["numpy", "cv2", "PIL.ImageTk"]
+        if self.config.FACE_BACKEND != "improved":
+            modules += backend_modules(self.config.FACE_BACKEND)
+        preload(modules)
+        
+        with timed("relay + buzzer"):
+            self._init_hardware()
+        mark("relay locked")
+        with timed("device layer"):
+            self._init_devices()
+        with timed("admin data + policy"):
+            self._init_components()
+        with timed("gui"):
+            self._init_gui()
+        mark("lock screen ready")
+        self._init_state_machine()
+        self._init_startup()
         
         logger.info("✅ AI Enhanced Security System khởi tạo thành công!")
     
     def _init_hardware(self):
-        """Khởi tạo phần cứng"""
+        """Khởi tạo phần cứng an toàn (khóa cửa, buzzer) - camera/RFID/vân tay chạy song song sau"""
+        logger.info("🔧 Khởi tạo phần cứng...")
+        
+        # Buzzer (với mock nếu cần) - phát trên luồng riêng, beep() không chặn Tk thread
+        try:
+            self.buzzer = BackgroundBuzzer.wrap(EnhancedBuzzerManager(self.config.BUZZER_GPIO))
+        except:
+            logger.warning("⚠️ Buzzer mock mode")
+            self.buzzer = type('MockBuzzer', (), {'beep': lambda x, y: None})()
+        
+        # Relay (Door lock) - khóa ngay khi khởi động
         try:
-            logger.info("🔧 Khởi tạo phần cứng...")
-            
-            # Buzzer (với mock nếu cần)
-            try:
-                self.buzzer = EnhancedBuzzerManager(self.config.BUZZER_GPIO)
-            except:
-                logger.warning("⚠️ Buzzer mock mode")
-                self.buzzer = type('MockBuzzer', (), {'beep': lambda x, y: None})()
-            
-            # Camera
-            self.picam2 = Picamera2()
-            if hasattr(self.picam2, 'configure'):
-                self.picam2.configure(self.picam2.create_video_configuration(
-                    main={"format": 'XRGB8888', "size": (self.config.CAMERA_WIDTH, self.config.CAMERA_HEIGHT)}
-                ))
-                self.picam2.start()
-                time.sleep(2)
-            
-            # Relay (Door lock)
             self.relay = LED(self.config.RELAY_GPIO)
             self.relay.on()  # Locked by default
-            
-            # RFID
-            i2c = busio.I2C(board.SCL, board.SDA)
-            self.pn532 = PN532_I2C(i2c, debug=False)
-            self.pn532.SAM_configuration()
-            
-            # Fingerprint sensor
-            self.fingerprint = PyFingerprint('/dev/ttyUSB0', 57600, 0xFFFFFFFF, 0x00000000)
-            if not self.fingerprint.verifyPassword():
-                logger.warning("⚠️ Fingerprint sensor simulation mode")
-            
-            logger.info("✅ Tất cả phần cứng đã sẵn sàng")
-            
         except Exception as e:
-            logger.error(f"❌ Lỗi khởi tạo phần cứng: {e}")
-            logger.info("🔄 Continuing in simulation mode...")
+            logger.error(f"❌ Lỗi khởi tạo relay: {e}")
+            raise
+    
+    def _init_devices(self):
+        """Khởi tạo lớp thiết bị asyncio - driver được gắn vào khi từng thiết bị sẵn sàng"""
+        self.devices = AsyncDeviceLayer()
+        logger.info("⚡ Async device layer đã sẵn sàng")
+    
+    def _init_health(self):
+        """Giám sát RFID / vân tay - tự kết nối lại nền khi thiết bị lỗi"""
+        self.health = DeviceHealthSupervisor(
+            failure_threshold=self.config.DEVICE_FAILURE_THRESHOLD,
+            base_backoff=self.config.DEVICE_RECONNECT_BACKOFF,
+            max_backoff=self.config.DEVICE_RECONNECT_MAX_BACKOFF,
+            probe_interval=self.config.DEVICE_PROBE_INTERVAL
+        )
+        self.health.register("rfid", self._connect_rfid, self._attach_rfid,
+                             probe=lambda: self.devices.call_sync(
+                                 "rfid", lambda: self.pn532.firmware_version is not None, timeout=5))
+        self.health.register("fingerprint", self._connect_fingerprint, self._attach_fingerprint,
+                             probe=lambda: self.devices.call_sync(
+                                 "fingerprint", self.fingerprint.verifyPassword, timeout=5))
+        self.health.add_listener(lambda health: self.root.after(0, lambda: self._on_device_health_changed(health)))
+        self.health.start()
+    
+    def _init_startup(self):
+        """Khởi tạo camera, RFID, vân tay và model AI đồng thời"""
+        self._init_health()
+        if self.primary is None:
+            self._init_scheduler()
+        else:
+            self.scheduler = self.primary.scheduler
+        self.scheduler.register(self.config.DOOR_ID)
+        
+        self.startup = StartupOrchestrator()
+        self.startup.add("camera", self._init_camera)
+        self.startup.add("rfid", lambda: self.health.connect("rfid"))
+        self.startup.add("fingerprint", lambda: self.health.connect("fingerprint"))
+        self.startup.add("face_model", self._init_face_model)
+        self.startup.add("warmup", self._warmup_face_pipeline, deps=["camera", "face_model"])
+        self.startup.add("preroll", self._init_preroll, deps=["camera"])
+        
+        self.startup.add_listener(lambda component: self.root.after(0, self._show_startup_progress))
+        self.startup.when_ready(["warmup"], lambda ok: self.root.after(0, lambda: self._on_startup_ready(ok)))
+        self.startup.start()
+    
+    def _init_scheduler(self):
+        """Một model nhận diện cho mọi cửa - nạp và suy luận trên luồng của InferenceScheduler"""
+        self.scheduler = InferenceScheduler(max_batch=self.config.INFERENCE_MAX_BATCH,
+                                            batch_window=self.config.INFERENCE_BATCH_WINDOW)
+        self.scheduler.start()
+        self.scheduler.load(self._load_face_model)
+    
+    def _init_camera(self):
+        try:
+            Picamera2 = timed_import("picamera2").Picamera2
+        except ImportError as e:
+            logger.warning(f"⚠️ Camera simulation mode: {e}")
+            Picamera2 = MockPicamera2
+        
+        picam2 = Picamera2(self.config.CAMERA_INDEX)
+        if hasattr(picam2, 'configure'):
+            streams = {"main": {"format": 'XRGB8888', "size": (self.config.CAMERA_WIDTH, self.config.CAMERA_HEIGHT)}}
+            if self.config.PREROLL_ENABLED:
+                # Stream phụ YUV420 cho bộ mã hóa H.264 - không ảnh hưởng frame nhận diện
+                streams.update(lores={"format": 'YUV420', "size": self.config.PREROLL_SIZE}, encode="lores")
+            picam2.configure(picam2.create_video_configuration(**streams))
+            picam2.start()
+            time.sleep(2)  # Chờ cân bằng sáng - chạy song song với các thành phần khác
+        self.picam2 = self.devices.picam2 = picam2
+        return picam2
+    
+    def _connect_rfid(self):
+        try:
+            board = timed_import("board")
+            busio = timed_import("busio")
+            PN532_I2C = timed_import("adafruit_pn532.i2c").PN532_I2C
+        except ImportError as e:
+            logger.warning(f"⚠️ RFID simulation mode: {e}")
+            pn532 = MockPN532()
+        else:
+            if self.config.RFID_I2C_BUS == 1:
+                i2c = busio.I2C(board.SCL, board.SDA)
+            else:
+                # Bus phụ (dtoverlay i2c-gpio) cho cửa thứ hai trở đi
+                i2c = timed_import("adafruit_extended_bus").ExtendedI2C(self.config.RFID_I2C_BUS)
+            pn532 = PN532_I2C(i2c, debug=False)
+        pn532.SAM_configuration()
+        return pn532
+    
+    def _attach_rfid(self, pn532):
+        self.pn532 = self.devices.pn532 = pn532
+    
+    def _connect_fingerprint(self):
+        try:
+            PyFingerprint = timed_import("pyfingerprint.pyfingerprint").PyFingerprint
+        except ImportError as e:
+            logger.warning(f"⚠️ Fingerprint simulation mode: {e}")
+            PyFingerprint = lambda *args, **kwargs: MockFingerprint()
+        
+        fingerprint = PyFingerprint(self.config.FINGERPRINT_PORT, 57600, 0xFFFFFFFF, 0x00000000)
+        if not fingerprint.verifyPassword():
+            raise RuntimeError("Sai mật khẩu cảm biến vân tay")
+        return fingerprint
+    
+    def _attach_fingerprint(self, fingerprint):
+        self.fingerprint = self.devices.fingerprint = fingerprint
+    
+    def _load_face_model(self):
+        if self.config.FACE_BACKEND == "improved":
+            # AI Face Recognition - Enhanced (import kéo theo cv2 + model, chạy trên luồng suy luận)
+            ImprovedFaceRecognition = timed_import("improved_face_recognition").ImprovedFaceRecognition
+            local = ImprovedFaceRecognition(
+                models_path=self.config.MODELS_PATH,
+                face_data_path=self.config.FACE_DATA_PATH,
+                confidence_threshold=self.config.FACE_CONFIDENCE_THRESHOLD,
+                recognition_threshold=self.config.FACE_RECOGNITION_THRESHOLD
+            )
+        else:
+            local = self._load_face_backend()
+        if hasattr(local, "remove_person"):
+            self._unbind_after(local, "remove_person", lambda name: self.users.unbind(face=name))
+        if not self.config.RECOGNITION_SERVER_URL:
+            return local
+        try:
+            key = load_key(self.config.RECOGNITION_KEY_PATH)
+        except (OSError, ValueError) as e:
+            logger.error(f"❌ Không đọc được khóa {self.config.RECOGNITION_KEY_PATH}: {e} - chỉ nhận diện trên thiết bị")
+            return local
+        # Model cục bộ vẫn nạp - dùng khi máy chủ chậm / mất kết nối và cho đăng ký khuôn mặt
+        logger.info(f"🌐 Nhận diện qua máy chủ {self.config.RECOGNITION_SERVER_URL}")
+        return RemoteRecognizer(
+            self.config.RECOGNITION_SERVER_URL, local, key,
+            timeout=self.config.RECOGNITION_TIMEOUT,
+            retry_after=self.config.RECOGNITION_RETRY_AFTER,
+            max_width=self.config.RECOGNITION_MAX_WIDTH,
+            client=self.config.DOOR_ID
+        )
+    
+    def _load_face_backend(self) -> BackendRecognizer:
+        """Backend chọn trong FACE_BACKEND - mỗi bộ đặc trưng có file encoding riêng trong FACE_DATA_PATH"""
+        spec = resolve_backend(self.config.FACE_BACKEND)
+        threshold = self.config.FACE_BACKEND_THRESHOLD
+        if threshold is None and spec.endswith("+lbph"):
+            threshold = self.config.FACE_RECOGNITION_THRESHOLD  # Cùng thang khoảng cách LBPH
+        with timed(f"face backend {spec}"):
+            backend = create_backend(spec, self.config.MODELS_PATH, threshold,
+                                     confidence=self.config.FACE_CONFIDENCE_THRESHOLD)
+        gallery = gallery_path(os.path.join(self.config.FACE_DATA_PATH, "encodings.pickle"), spec)
+        return BackendRecognizer(backend, gallery)
+    
+    def _init_face_model(self):
+        """Chờ model dùng chung (chỉ cửa đầu tiên thực sự nạp)"""
+        self.face_recognizer = self.scheduler.model_ready.result()
+        return self.face_recognizer
+    
+    def _init_preroll(self):
+        """Vòng đệm video pre-roll - chỉ với camera thật"""
+        if not self.config.PREROLL_ENABLED or isinstance(self.picam2, MockPicamera2):
+            logger.info("🎞️ Pre-roll tắt (cấu hình hoặc camera mô phỏng)")
+            return None
+        preroll = PrerollRecorder(
+            self.picam2, self.config.PREROLL_PATH,
+            seconds_before=self.config.PREROLL_SECONDS_BEFORE,
+            seconds_after=self.config.PREROLL_SECONDS_AFTER,
+            fps=self.config.PREROLL_FPS,
+            bitrate=self.config.PREROLL_BITRATE,
+            max_bytes=self.config.PREROLL_MAX_MB * 1024 * 1024
+        )
+        preroll.start()
+        self.preroll = preroll
+        return preroll
+    
+    def _warmup_face_pipeline(self):
+        """Chạy thử một frame để frame xác thực đầu tiên không phải trả chi phí khởi động model"""
+        try:
+            self.scheduler.infer(self.config.DOOR_ID, self.picam2.capture_array()).result()
+        except Exception as e:
+            logger.warning(f"⚠️ Face pipeline warmup: {e}")
+    
+    def _show_startup_progress(self):
+        """Hiển thị thành phần nào đã sẵn sàng"""
+        if self._startup_done:
+            return
+        icons = {"pending": "⏸️", "starting": "⏳", "ready": "✅", "failed": "❌"}
+        lines = []
+        for component in self.startup.status().values():
+            duration = f" ({component.duration:.1f}s)" if component.duration is not None else ""
+            lines.append(f"{icons[component.state.value]} {component.name}{duration}")
+        self.gui.update_detail("🚀 Starting subsystems:\n" + "\n".join(lines), Colors.PRIMARY)
+    
+    def _on_startup_ready(self, ok: bool):
+        """Camera + model AI đã sẵn sàng - bắt đầu xác thực"""
+        mark("authentication ready")
+        logger.info("⏱️ Startup report:\n" + self.startup.report())
+        logger.info("⏱️ Import / init timeline:\n" + startup_report())
+        self._startup_done = ok
+        if not ok:
+            self.gui.update_status("STARTUP FAILED - CHECK CAMERA / AI MODELS", 'orange')
+            self._show_startup_progress()
+            self.buzzer.beep("error")
+            return
+        
+        self.gui.update_status("AI ENHANCED SECURITY SYSTEM v2.0 - READY!", 'lightgreen')
+        self.buzzer.beep("startup")
+        if self.config.IDENTITY_BINDING == "strict" and not self._binding_enforced():
+            logger.warning("⚠️ Chưa có người dùng trong USERS_PATH - các yếu tố đang được kiểm tra độc lập")
+        
+        # Show system info
+        face_info = self.face_recognizer.get_database_info()
+        self.gui.update_detail(f"📊 System Status:\n"
+                             f"👥 Registered faces: {face_info['total_people']}\n"
+                             f"👆 Fingerprints: {len(self.admin_data.get_fingerprint_ids())}\n"
+                             f"📱 RFID cards: {len(self.admin_data.get_rfid_uids())}\n"
+                             f"🔗 Users: {len(self.users)}\n"
+                             f"🗓️ Schedule rules: {len(self.schedule)}\n"
+                             f"🧍 Inside {self.config.DOOR_ZONE}: {self.occupancy.count(self.config.DOOR_ZONE)}\n"
+                             f"🤖 AI Status: Ready", Colors.SUCCESS)
+        
+        # Start authentication sau thời gian chờ khởi động
+        self.timers.schedule(self.timing.startup, self.start_authentication, tag=TimerManager.SYSTEM)
+        
+        if self.config.SYNC_SERVER_URL and self.primary is None:
+            self._start_credential_sync()
+    
+    def _start_credential_sync(self):
+        """Kéo thay đổi thông tin xác thực định kỳ - cửa phụ dùng chung dữ liệu của cửa đầu tiên"""
+        local = getattr(self.face_recognizer, "local", self.face_recognizer)
+        apply_faces = self._apply_face_changes if getattr(local, "store", None) is not None else None
+        try:
+            key = load_key(self.config.SYNC_KEY_PATH)
+        except (OSError, ValueError) as e:
+            logger.error(f"❌ Không đọc được khóa đồng bộ {self.config.SYNC_KEY_PATH}: {e} - tắt đồng bộ")
+            return
+        if apply_faces is None:
+            logger.warning("⚠️ Model khuôn mặt không có kho encoding tăng dần - chỉ đồng bộ thẻ / vân tay / passcode")
+        self.sync = CredentialSyncer(
+            HttpTransport(self.config.SYNC_SERVER_URL, key, self.config.DOOR_ID),
+            self.admin_data,
+            self.config.SYNC_STATE_PATH,
+            door=self.config.DOOR_ID,
+            apply_faces=apply_faces,
+            interval=self.config.SYNC_INTERVAL,
+            on_applied=lambda version, count: self.audit.admin_action(
+                "credential_sync", version=version, changes=count),
+            users=self.users
+        )
+        self.sync.start()
+        logger.info(f"🔄 Đồng bộ với {self.config.SYNC_SERVER_URL} từ phiên bản {self.sync.version}")
+    
+    def _apply_face_changes(self, records):
+        """Cập nhật thư viện khuôn mặt trên luồng suy luận - không đổi dữ liệu giữa lúc model đang so khớp"""
+        def apply():
+            local = getattr(self.face_recognizer, "local", self.face_recognizer)
+            local.store.apply(records)
+            if hasattr(local, "face_data"):
+                local.face_data = local.store.snapshot()
+        self.scheduler.call(apply).result()
+    
+    def _on_device_health_changed(self, health):
+        """Thiết bị đổi trạng thái - phiên song song đang dùng thiết bị offline được tạo lại ngay"""
+        self.audit.log(AuditEventType.DEVICE, health.state == DeviceState.ONLINE, health.name,
+                       state=health.state.value, error=health.last_error)
+        if not self._startup_done:
+            return
+        if health.state == DeviceState.ONLINE:
+            self.gui.update_status(f"{health.name.upper()} RECONNECTED", 'lightgreen')
+            return
+        
+        self.gui.update_status(f"{health.name.upper()} OFFLINE - DEGRADED MODE", 'orange')
+        session = self.auth_session
+        if (self.fsm.state == AuthState.PARALLEL and session is not None and not session.completed and
+                any(FACTOR_DEVICES.get(f) == health.name for f in session.policy.factors)):
+            logger.warning(f"🔌 {health.name} offline - khởi động lại phiên song song với chính sách rút gọn")
+            self.start_authentication()
+    
+    @staticmethod
+    def _unbind_after(owner, method: str, unbind):
+        """ImprovedAdminGUI xóa thẳng qua admin_data / model khuôn mặt - gỡ luôn khỏi sổ người dùng"""
+        remove = getattr(owner, method)
+        def remove_and_unbind(key, *args, **kwargs):
+            removed = remove(key, *args, **kwargs)
+            unbind(key)
+            return removed
+        setattr(owner, method, remove_and_unbind)
     
     def _init_components(self):
         """Khởi tạo các thành phần AI và data"""
         try:
             logger.info("🧠 Khởi tạo AI components...")
             
-            # Admin data manager
-            self.admin_data = AdminDataManager(self.config.ADMIN_DATA_PATH)
+            if self.primary is not None:
+                # Cửa phụ: chung dữ liệu admin, nhật ký và lịch sử, bản ghi mang mã cửa riêng
+                self.admin_data = self.primary.admin_data
+                self.users = self.primary.users
+                self.schedule = self.primary.schedule
+                self.lockout = self.primary.lockout
+                self.occupancy = self.primary.occupancy
+                self.history = self.primary.history
+                self.audit = self.primary.audit.for_door(self.config.DOOR_ID)
+            else:
+                # Admin data manager + người dùng (chỉ mục khuôn mặt / template / thẻ -> người)
+                self.admin_data = AdminDataManager(self.config.ADMIN_DATA_PATH)
+                self.users = UserRegistry(self.config.USERS_PATH)
+                self._unbind_after(self.admin_data, "remove_rfid", lambda uid: self.users.unbind(card=uid))
+                self._unbind_after(self.admin_data, "remove_fingerprint_id",
+                                   lambda template_id: self.users.unbind(fingerprint=template_id))
+                self.schedule = AccessSchedule(self.config.ACCESS_SCHEDULE_PATH,
+                                               default_allow=self.config.ACCESS_SCHEDULE_DEFAULT == "allow")
+                self.lockout = LockoutTracker(self.config.LOCKOUT_PATH, self.config.LOCKOUT_THRESHOLDS,
+                                              window=self.config.LOCKOUT_WINDOW, base=self.config.LOCKOUT_BASE,
+                                              max_lockout=self.config.LOCKOUT_MAX)
+                self.occupancy = OccupancyEngine(self.config.OCCUPANCY_PATH,
+                                                 self.config.OCCUPANCY_SNAPSHOT_INTERVAL)
+                
+                # Nhật ký kiểm toán (ghi nền, không chặn luồng gọi) + lịch sử ra vào có chỉ mục
+                self.history = AccessHistory(self.config.HISTORY_PATH)
+                self.audit = AuditLogger(
+                    self.config.AUDIT_LOG_PATH,
+                    door=self.config.DOOR_ID,
+                    max_bytes=self.config.AUDIT_MAX_BYTES,
+                    backup_count=self.config.AUDIT_BACKUP_COUNT,
+                    handlers=[AccessHistoryHandler(self.history)]
+                )
             
-            # AI Face Recognition - Enhanced
-            self.face_recognizer = ImprovedFaceRecognition(
-                models_path=self.config.MODELS_PATH,
-                face_data_path=self.config.FACE_DATA_PATH,
-                confidence_threshold=self.config.FACE_CONFIDENCE_THRESHOLD,
-                recognition_threshold=self.config.FACE_RECOGNITION_THRESHOLD
+            # Ảnh bằng chứng (mã hóa JPEG + ghi đĩa trên luồng nền)
+            self.evidence = EvidenceRecorder(
+                self.config.EVIDENCE_PATH,
+                ring_size=self.config.EVIDENCE_RING_SIZE,
+                pre_frames=self.config.EVIDENCE_PRE_FRAMES,
+                post_frames=self.config.EVIDENCE_POST_FRAMES,
+                max_bytes=self.config.EVIDENCE_MAX_MB * 1024 * 1024,
+                cooldown=self.config.EVIDENCE_COOLDOWN
+            )
+            
+            # Chính sách xác thực song song
+            self.auth_policy = AuthPolicy.parse(
+                self.config.PARALLEL_POLICY,
+                window_seconds=self.config.PARALLEL_WINDOW,
+                max_failures=self.config.MAX_ATTEMPTS
             )
             
             logger.info("✅ AI components đã sẵn sàng")
@@ -570,7 +1083,8 @@ class AIEnhancedSecuritySystem:
         try:
             logger.info("🎨 Khởi tạo GUI...")
             
-            self.root = tk.Tk()
+            # Mỗi cửa một cửa sổ, chung một Tk mainloop
+            self.root = tk.Tk() if self.primary is None else tk.Toplevel(self.primary.root)
             self.gui = AIEnhancedSecurityGUI(self.root)
             self.gui.set_system_reference(self)
             
@@ -583,12 +1097,207 @@ class AIEnhancedSecuritySystem:
             logger.error(f"❌ Lỗi khởi tạo GUI: {e}")
             raise
     
+    def _init_state_machine(self):
+        """Máy trạng thái xác thực - mọi chuyển bước đi qua một hàng đợi sự kiện"""
+        self.timing = TimingPolicy.from_mode(self.config.TIMING_MODE, self.config.TIMING_OVERRIDES)
+        self.timers = TimerManager(self.root)
+        
+        timeouts = self.timing.state_timeouts()
+        timeouts.update({
+            AuthState.FINGERPRINT: self.config.STEP_TIMEOUT,
+            AuthState.RFID: self.config.STEP_TIMEOUT,
+            AuthState.UNLOCKED: self.config.LOCK_OPEN_DURATION
+        })
+        
+        entry_state = AuthState.PARALLEL if self.config.AUTH_MODE == "parallel" else AuthState.FACE
+        self.fsm = AuthStateMachine(
+            entry_state=entry_state,
+            max_attempts=self.config.MAX_ATTEMPTS,
+            timeouts=timeouts
+        )
+        
+        # Timer của phiên trước không được bắn vào màn hình admin
+        self.fsm.on_enter(AuthState.ADMIN, lambda event, prev_state: self.timers.cancel_all())
+        
+        hooks = {
+            AuthState.FACE: self._begin_face_step,
+            AuthState.PARALLEL: self._start_parallel_authentication,
+            AuthState.FINGERPRINT: self._proceed_to_fingerprint,
+            AuthState.RFID: self._proceed_to_rfid,
+            AuthState.PASSCODE: self._proceed_to_passcode,
+            AuthState.ADMIN: self._admin_authentication,
+            AuthState.UNLOCKED: self._unlock_door,
+            AuthState.LOCKED: self._lock_door
+        }
+        for state, hook in hooks.items():
+            self.fsm.on_enter(state, lambda event, prev_state, hook=hook: hook())
+        self.fsm.on_enter(AuthState.FAILED, self._authentication_failed)
+        self.fsm.on_enter(AuthState.LOCKED_OUT, self._locked_out)
+        self.fsm.on_enter(AuthState.IDLE, self._suspend_authentication)
+        self.fsm.add_listener(self._audit_transition)
+        self.fsm.add_listener(self._capture_evidence)
+        self.fsm.add_listener(self._track_attempts)
+        
+        logger.info(f"🔁 Auth state machine ready (entry: {entry_state.value}, "
+                    f"timing: {self.config.TIMING_MODE}, success path wait: {self.timing.success_path_delay:.1f}s)")
+    
+    def _audit_transition(self, prev_state, event, new_state):
+        """Ghi sự kiện kiểm toán cho mỗi chuyển trạng thái (chế độ tuần tự + mở cửa / thất bại)"""
+        E = EventType
+        session = self.fsm.session
+        payload = event.payload
+        
+        if event.type == E.START:
+            self._session_identities = {}
+        elif event.type == E.FACE_OK:
+            self._session_identities[Factor.FACE.value] = payload
+            self.audit.face(payload, session=session)
+        elif event.type in (E.FINGER_OK, E.FINGER_FAIL) and payload is not None:
+            if event.type == E.FINGER_OK:
+                self._session_identities[Factor.FINGERPRINT.value] = payload
+            self.audit.fingerprint(payload, event.type == E.FINGER_OK, session=session)
+        elif event.type in (E.CARD_OK, E.CARD_FAIL) and payload is not None:
+            if event.type == E.CARD_OK:
+                # Cùng dạng với FactorResult của chế độ song song -> cùng subject / khóa thẻ / bản ghi
+                self._session_identities[Factor.RFID.value] = card_key(payload)
+            self.audit.rfid(payload, event.type == E.CARD_OK, session=session)
+        elif event.type == E.ADMIN_CARD:
+            self.audit.rfid(payload, True, session=session, admin=True)
+        elif event.type in (E.PIN_OK, E.PIN_FAIL):
+            self.audit.passcode(event.type == E.PIN_OK, session=session)
+        elif event.type == E.FACTOR_SKIPPED:
+            self.audit.log(AuditEventType.DEVICE, False, FACTOR_DEVICES[payload], session,
+                           state="offline", action="factor_skipped")
+        
+        if new_state == prev_state:
+            return
+        if new_state == AuthState.UNLOCKED:
+            identities = ({f.value: i for f, i in payload.items()} if event.type == E.FACTORS_OK
+                          else dict(self._session_identities))
+            user = (self.auth_session.user() if event.type == E.FACTORS_OK and self.auth_session
+                    else self._session_user.user_id if self._session_user else None)
+            if user is not None:
+                identities = {"user": user, **identities}
+            self.audit.unlock(identities, session=session)
+        elif new_state == AuthState.FAILED:
+            step = payload.value if isinstance(payload, Factor) else prev_state.value
+            self.audit.auth_failed(step, event.type.value, session=session)
+        elif new_state == AuthState.LOCKED_OUT:
+            self.audit.log(AuditEventType.AUTH_FAILED, False, None, session, action="lockout",
+                           step=prev_state.value, seconds=round(payload))
+    
+    def _capture_evidence(self, prev_state, event, new_state):
+        """Ghi ảnh bằng chứng khi mở cửa, thẻ sai hoặc xác thực thất bại"""
+        session = self.fsm.session
+        if event.type == EventType.CARD_FAIL and event.payload is not None:
+            self._trigger_evidence("invalid_rfid", None, session=session, uid=event.payload)
+            self._export_clip("invalid_rfid", session=session, uid=event.payload)
+        elif new_state != prev_state and new_state == AuthState.UNLOCKED:
+            identities = event.payload if event.type == EventType.FACTORS_OK else self._session_identities
+            identity = next((str(i) for i in identities.values() if i is not None), None)
+            self._trigger_evidence("unlock", identity, session=session)
+        elif new_state != prev_state and new_state == AuthState.FAILED:
+            self._trigger_evidence("auth_failed", None, session=session, step=prev_state.value,
+                                   cause=event.type.value)
+            self._export_clip("auth_failed", session=session, step=prev_state.value, cause=event.type.value)
+        elif new_state != prev_state and new_state == AuthState.LOCKED_OUT:
+            self._trigger_evidence("lockout", None, session=session, seconds=round(event.payload))
+            self._export_clip("lockout", session=session, seconds=round(event.payload))
+    
+    def _track_attempts(self, prev_state, event, new_state):
+        """Lần thử sai của mọi phiên cộng dồn vào bộ đếm khóa tạm. Mở cửa thành công chỉ xóa bộ đếm
+        của thẻ vừa xác thực - bộ đếm cửa / yếu tố tự hết hạn, người dò mã không được reset"""
+        E = EventType
+        if event.type == E.PIN_FAIL:
+            self._record_attempt(Factor.PASSCODE)
+        elif event.type == E.FINGER_FAIL and event.payload is not None:
+            self._record_attempt(Factor.FINGERPRINT)
+        elif event.type == E.CARD_FAIL and event.payload is not None:
+            self._record_attempt(Factor.RFID, event.payload)
+        elif new_state == AuthState.UNLOCKED and new_state != prev_state:
+            uid = (event.payload.get(Factor.RFID) if event.type == E.FACTORS_OK
+                   else self._session_identities.get(Factor.RFID.value))
+            if uid is not None:
+                self.lockout.success(card_lockout_key(uid))
+    
+    def _record_attempt(self, factor: Factor, uid=None):
+        """Ghi một lần thử sai - cửa / yếu tố vượt ngưỡng thì khóa tạm ngay (Tk thread)"""
+        self.lockout.failure(*lockout_keys(self.config.DOOR_ID, [factor.value], uid))
+        self._enforce_lockout()
+    
+    def _enforce_lockout(self) -> bool:
+        """Cửa hoặc một yếu tố của cửa đang bị khóa tạm -> trạng thái LOCKED_OUT (Tk thread)"""
+        remaining = self.lockout.remaining(*lockout_keys(self.config.DOOR_ID, [f.value for f in Factor]))
+        if remaining <= 0:
+            return False
+        if self.fsm.state != AuthState.LOCKED_OUT:
+            self._fire(EventType.LOCKOUT, remaining, timeout=remaining)
+        return True
+    
+    def _locked_out(self, event, prev_state):
+        """Không nhận yếu tố nào cho tới khi hết khóa - FSM tự quay lại bước đầu khi hết hạn"""
+        self.devices.cancel_all()
+        self.timers.cancel_all()
+        until = datetime.fromtimestamp(time.time() + event.payload).strftime("%H:%M:%S")
+        logger.warning(f"🔒 Cửa {self.config.DOOR_ID}: quá nhiều lần thử sai - khóa tới {until}")
+        self.gui.update_status(f"TOO MANY FAILED ATTEMPTS - LOCKED UNTIL {until}", 'orange')
+        self.gui.update_detail(f"🔒 Too many failed attempts at this door.\n"
+                               f"⏳ Authentication is disabled for {event.payload:.0f} seconds.", Colors.ERROR)
+        self.buzzer.beep("error")
+    
+    def _trigger_evidence(self, reason: str, identity: Optional[str] = None, **detail):
+        """Ghi bằng chứng - nếu vòng lặp camera không chạy thì tự lấy thêm frame sau sự kiện"""
+        if self.evidence.trigger(reason, identity, **detail) is None:
+            return
+        if self.face_task is None or self.face_task.done():
+            self.devices.submit(self._feed_evidence(self.config.EVIDENCE_POST_FRAMES))
+    
+    def _export_clip(self, reason: str, identity: Optional[str] = None, **detail):
+        """Xuất clip pre-roll + post-roll (không chặn - ghi trên luồng của recorder)"""
+        if self.preroll is not None:
+            self.preroll.export(reason, identity, **detail)
+    
+    async def _feed_evidence(self, count: int):
+        for _ in range(count):
+            try:
+                self.evidence.add_frame(await self.devices.next_frame())
+            except Exception as e:
+                logger.warning(f"⚠️ Evidence capture: {e}")
+                return
+            await asyncio.sleep(self.config.FACE_DETECTION_INTERVAL)
+    
+    def _audit_factor(self, result: FactorResult):
+        """Ghi kết quả một yếu tố của chế độ song song"""
+        session = self.fsm.session
+        if result.factor == Factor.FACE:
+            self.audit.face(result.identity, result.detail, result.success, session=session)
+        elif result.factor == Factor.FINGERPRINT:
+            self.audit.fingerprint(result.detail, result.success, session=session)
+        elif result.factor == Factor.RFID:
+            self.audit.rfid(result.detail, result.success, session=session)
+        else:
+            self.audit.passcode(result.success, session=session)
+    
+    def _fire(self, event_type, payload=None, timeout=None):
+        """Gửi sự kiện và xử lý ngay (chỉ gọi từ Tk thread)"""
+        self.fsm.post(event_type, payload, timeout=timeout)
+        self.fsm.process_pending()
+    
+    def _pump_events(self):
+        """Xử lý hàng đợi sự kiện và timeout của máy trạng thái trên Tk thread"""
+        self.fsm.process_pending()
+        if self.running:
+            self.root.after(self.config.FSM_TICK_MS, self._pump_events)
+    
     def _force_admin_mode(self):
         """Chế độ admin nhanh bằng phím *"""
         dialog = EnhancedNumpadDialog(self.root, "🔧 AI ADMIN ACCESS", 
                                     "Nhập mật khẩu admin:", True, self.buzzer)
         password = dialog.show()
         
+        if password is not None:
+            self.audit.admin_action("login", password == self.config.ADMIN_PASS, via="keypad")
+        
         if password == self.config.ADMIN_PASS:
             self.gui.update_status("AI ADMIN MODE ACTIVATED", 'lightgreen')
             self.gui.update_detail("✅ Admin authentication successful! Opening control panel...", Colors.SUCCESS)
@@ -601,50 +1310,71 @@ class AIEnhancedSecuritySystem:
     
     def start_authentication(self):
         """Bắt đầu quy trình xác thực AI"""
+        if not self._startup_done:
+            logger.info("⏳ Camera / model AI chưa sẵn sàng - bỏ qua yêu cầu xác thực")
+            return
+        if self._enforce_lockout():
+            return
+        # Sổ người dùng có thể đã sửa bằng CLI (user_registry.py) - một lần stat mỗi phiên
+        self.users.refresh()
         logger.info("🚀 Bắt đầu quy trình xác thực AI")
+        self._fire(EventType.START)
+    
+    def _suspend_authentication(self, event, prev_state):
+        """Tạm dừng xác thực - nhường camera cho tác vụ khác"""
+        self.devices.cancel_all()
+        self.timers.cancel_all()
+        if prev_state == AuthState.UNLOCKED:
+            self.relay.on()  # Không để cửa mở khi thoát khỏi luồng xác thực
+        logger.info(f"⏸️ Xác thực tạm dừng (từ {prev_state.value})")
+    
+    def _reset_session(self):
+        """Dọn dẹp phiên trước khi vào bước đầu tiên"""
+        # Hủy ngay các bước đang chờ thiết bị và timer của phiên trước
+        self.devices.cancel_all()
+        self.timers.cancel_all()
+        self.auth_session = None
+        self._session_user = None
+        self._reset_liveness()
         
-        self.auth_state = {
-            "step": AuthStep.FACE,
-            "consecutive_face_ok": 0,
-            "fingerprint_attempts": 0,
-            "rfid_attempts": 0,
-            "pin_attempts": 0
-        }
+        # Reset detection stats
+        self.gui.detection_stats = {"total": 0, "recognized": 0, "unknown": 0, "spoof": 0}
+    
+    def _begin_face_step(self):
+        """Bước 1 - AI face recognition"""
+        self._reset_session()
         
         self.gui.update_step(1, "🤖 AI FACE RECOGNITION", "Neural network đang phân tích...", Colors.PRIMARY)
         self.gui.update_status("AI ANALYZING FACES - PLEASE LOOK AT CAMERA", 'white')
         self.gui.update_detail("🤖 AI neural networks đang quét và phân tích khuôn mặt.\n👁️ Nhìn thẳng vào camera và giữ nguyên vị trí.", Colors.PRIMARY)
         
-        # Reset detection stats
-        self.gui.detection_stats = {"total": 0, "recognized": 0, "unknown": 0}
-        
-        if self.face_thread and self.face_thread.is_alive():
-            return
-        
-        self.face_thread = threading.Thread(target=self._ai_face_loop, daemon=True)
-        self.face_thread.start()
+        self.face_task = self.devices.submit(self._ai_face_loop())
     
-    def _ai_face_loop(self):
+    async def _ai_face_loop(self):
         """AI Face recognition loop với enhanced performance"""
         logger.info("👁️ Bắt đầu AI face recognition loop")
+        session = self.fsm.session
         consecutive_count = 0
         
-        while self.running and self.auth_state["step"] == AuthStep.FACE:
+        while self.running and self.fsm.session == session and self.fsm.state == AuthState.FACE:
             try:
                 # Capture frame
-                frame = self.picam2.capture_array()
+                frame = await self.devices.next_frame()
                 if frame is None:
                     continue
+                self.evidence.add_frame(frame)
                 
                 # AI Processing
-                annotated_frame, result = self.face_recognizer.process_frame(frame)
+                annotated_frame, result = await self.scheduler.ainfer(self.config.DOOR_ID, frame)
                 
                 # Update GUI với kết quả AI
                 self.root.after(0, lambda: self.gui.update_camera(annotated_frame, result))
                 
+                verdict = None
                 if result.recognized:
-                    consecutive_count += 1
-                    self.auth_state["consecutive_face_ok"] = consecutive_count
+                    consecutive_count = min(consecutive_count + 1, self.config.FACE_REQUIRED_CONSECUTIVE)
+                    verdict = self._check_liveness(frame, result)
+                    alive = self._liveness_gate(verdict, result, session)
                     
                     progress = consecutive_count / self.config.FACE_REQUIRED_CONSECUTIVE * 100
                     msg = f"AI confirmed ({consecutive_count}/{self.config.FACE_REQUIRED_CONSECUTIVE}) - {progress:.0f}%"
@@ -656,17 +1386,33 @@ class AIEnhancedSecuritySystem:
                         f"📊 Confidence: {result.confidence:.1f}/100", 
                         Colors.SUCCESS))
                     
-                    if consecutive_count >= self.config.FACE_REQUIRED_CONSECUTIVE:
+                    if alive is False:
+                        consecutive_count = 0
+                        self.root.after(0, lambda: self.gui.update_detail(
+                            "🎭 Liveness check failed - photo or screen suspected.\n"
+                            "👤 Please present your real face to the camera.", Colors.ERROR))
+                    elif (consecutive_count >= self.config.FACE_REQUIRED_CONSECUTIVE and
+                            not self._check_binding(Factor.FACE, self.users.by_face(result.person_name))):
+                        consecutive_count = 0
+                        self.root.after(0, lambda: self.gui.update_detail(
+                            f"🔗 {result.person_name} is not linked to a registered user.\n"
+                            "👤 Please contact the administrator.", Colors.WARNING))
+                    elif consecutive_count >= self.config.FACE_REQUIRED_CONSECUTIVE and alive is None:
+                        self.root.after(0, lambda: self.gui.update_detail(
+                            f"🎯 Identity: {result.person_name}\n"
+                            "👁️ Liveness check - please blink or turn your head slightly.", Colors.WARNING))
+                    elif consecutive_count >= self.config.FACE_REQUIRED_CONSECUTIVE:
                         logger.info(f"✅ AI Face recognition thành công: {result.person_name}")
                         self.buzzer.beep("success")
                         self.root.after(0, lambda: self.gui.update_status(f"AI FACE VERIFIED: {result.person_name.upper()}!", 'lightgreen'))
-                        self.root.after(1500, self._proceed_to_fingerprint)
+                        self.fsm.post(EventType.FACE_OK, result.person_name, session)
                         break
                         
                 elif result.detected:
                     # Phát hiện khuôn mặt nhưng không nhận diện được
                     consecutive_count = 0
-                    self.auth_state["consecutive_face_ok"] = 0
+                    self._reset_liveness()
+                    self.evidence.trigger("unknown_face", session=session, confidence=result.confidence)
                     self.root.after(0, lambda: self.gui.update_step(1, "⚠️ AI DETECTION", "Unknown face detected", Colors.WARNING))
                     self.root.after(0, lambda: self.gui.update_detail(
                         "🚫 AI detected a face but it's not in the authorized database.\n"
@@ -676,164 +1422,299 @@ class AIEnhancedSecuritySystem:
                 else:
                     # Không phát hiện khuôn mặt
                     consecutive_count = 0
-                    self.auth_state["consecutive_face_ok"] = 0
+                    self._reset_liveness()
                     self.root.after(0, lambda: self.gui.update_step(1, "🔍 AI SCANNING", "Searching for faces...", Colors.PRIMARY))
                 
-                time.sleep(self.config.FACE_DETECTION_INTERVAL)
+                # Liveness chạy trong khoảng nghỉ giữa hai frame - không làm giảm FPS nhận diện
+                await asyncio.sleep(self._frame_pause(verdict))
                 
             except Exception as e:
                 logger.error(f"❌ Lỗi AI face loop: {e}")
                 self.root.after(0, lambda: self.gui.update_detail(f"❌ AI Error: {str(e)}", Colors.ERROR))
-                time.sleep(1)
+                await asyncio.sleep(1)
+    
+    def _check_liveness(self, frame, result) -> Optional["liveness.LivenessVerdict"]:
+        """Liveness chỉ trên frame đã nhận diện được danh tính (luồng thiết bị)"""
+        if self.config.LIVENESS_MODE == "off":
+            return None
+        if self.liveness_detector is None:
+            texture = (liveness.TextureModel.load(self.config.LIVENESS_TEXTURE_MODEL)
+                       if self.config.LIVENESS_TEXTURE_MODEL else None)
+            self.liveness_detector = liveness.LivenessDetector(
+                threshold=self.config.LIVENESS_THRESHOLD,
+                min_frames=self.config.FACE_REQUIRED_CONSECUTIVE,
+                max_frames=self.config.LIVENESS_MAX_FRAMES,
+                budget_ms=self.config.FACE_DETECTION_INTERVAL * self.config.LIVENESS_BUDGET * 1000,
+                texture=texture)
+        verdict = self.liveness_detector.update(frame, getattr(result, "bbox", None), result.person_name)
+        self.gui.liveness_ms = self.liveness_detector.cost_ms
+        if not verdict.checked and not self._liveness_warned:
+            self._liveness_warned = True
+            if self.config.LIVENESS_MODE == "enforce":
+                logger.error("❌ Kết quả nhận diện không có bbox - không kiểm tra được liveness, "
+                             "khuôn mặt bị từ chối (dùng LIVENESS_MODE=\"monitor\" hoặc \"off\" với model này)")
+            else:
+                logger.warning("⚠️ Kết quả nhận diện không có bbox - bỏ qua kiểm tra liveness")
+        return verdict
+    
+    def _liveness_gate(self, verdict, result, session: Optional[int] = None) -> Optional[bool]:
+        """True = người thật, False = giả mạo, None = chờ thêm frame.
+        Không kiểm tra được (thiếu bbox): chỉ "monitor" cho qua, "enforce" từ chối"""
+        if verdict is None:
+            return True
+        if not verdict.checked:
+            return self.config.LIVENESS_MODE != "enforce"
+        if verdict.live:
+            return True
+        if not verdict.decided:
+            return None
+        logger.warning(f"🎭 Nghi giả mạo khuôn mặt {result.person_name}: điểm {verdict.score:.2f} "
+                       f"(chuyển động {verdict.motion:.2f}, kết cấu {verdict.texture:.2f}, {verdict.frames} frame)")
+        self.liveness_detector.reset()
+        self.root.after(0, self.gui.record_spoof)
+        self.evidence.trigger("spoof", result.person_name, session=session, score=round(verdict.score, 2))
+        self.audit.face(result.person_name, result.confidence, False, session=session)
+        return self.config.LIVENESS_MODE != "enforce"  # "monitor": chỉ ghi nhận
+    
+    def _reset_liveness(self):
+        if self.liveness_detector is not None:
+            self.liveness_detector.reset()
+    
+    def _frame_pause(self, verdict) -> float:
+        """Khoảng nghỉ tới frame sau, trừ đi thời gian liveness đã dùng"""
+        spent = verdict.cost_ms / 1000 if verdict is not None else 0.0
+        return max(self.config.FACE_DETECTION_INTERVAL - spent, 0.0)
+    
+    def _binding_enforced(self) -> bool:
+        return self.config.IDENTITY_BINDING == "strict" and len(self.users) > 0
+    
+    def _check_binding(self, factor: Factor, user: Optional[UserRecord]) -> bool:
+        """Chế độ tuần tự: yếu tố đầu tiên xác định người dùng, các yếu tố sau phải thuộc cùng người"""
+        if not self._binding_enforced():
+            return True
+        if user is None:
+            logger.warning(f"🔗 {factor.value}: chưa gắn với người dùng nào")
+            return False
+        if self._session_user is None:
+            self._session_user = user
+        elif user.user_id != self._session_user.user_id:
+            logger.warning(f"🔗 {factor.value} thuộc {user.user_id}, không phải {self._session_user.user_id}")
+            return False
+        return True
+    
+    def _factor_user(self, factor: Factor, user: Optional[UserRecord]) -> Tuple[bool, Optional[str]]:
+        """Chế độ song song: (yếu tố được chấp nhận, người dùng) - phiên kiểm tra tính nhất quán"""
+        if not self._binding_enforced():
+            return True, None
+        if user is None:
+            logger.warning(f"🔗 {factor.value}: chưa gắn với người dùng nào")
+            return False, None
+        return True, user.user_id
+    
+    def _session_subject(self) -> Optional[str]:
+        """Danh tính của phiên: user_id, không có sổ người dùng thì tên khuôn mặt, rồi UID thẻ"""
+        session = self.auth_session
+        if session is not None:
+            identities = {factor.value: identity for factor, identity in session.identities().items()}
+            user_id = session.user()
+        else:
+            identities = self._session_identities
+            user_id = self._session_user.user_id if self._session_user else None
+        return user_id or identities.get(Factor.FACE.value) or identities.get(Factor.RFID.value)
+    
+    def _access_allowed(self) -> bool:
+        """Lịch ra vào + anti-passback ngay trước khi mở cửa - đều tra cứu O(1) (Tk thread)"""
+        subject = self._session_subject()
+        self.schedule.refresh()
+        if len(self.schedule) and not self.schedule.allowed(subject):
+            logger.warning(f"🗓️ {subject or 'unknown'}: ngoài khung giờ cho phép")
+            self._fire(EventType.SCHEDULE_DENIED, subject)
+            return False
+        
+        zone = self.config.DOOR_ZONE
+        if self.config.ANTI_PASSBACK != "off" and not self.occupancy.allows(subject, zone, self.config.DOOR_DIRECTION):
+            logger.warning(f"🔁 {subject} đã ở trong {zone} và chưa ra (anti-passback {self.config.ANTI_PASSBACK})")
+            if self.config.ANTI_PASSBACK == "hard":
+                self._fire(EventType.PASSBACK_DENIED, subject)
+                return False
+        return True
+    
+    def _handle_unavailable_factor(self, factor: Factor, session: Optional[int] = None):
+        """Thiết bị của yếu tố offline - bỏ qua hoặc thất bại ngay theo DEGRADED_MODE (Tk thread)"""
+        if session is not None and session != self.fsm.session:
+            return
+        device = FACTOR_DEVICES[factor]
+        reason = self.health.snapshot()[device].last_error
+        if self.config.DEGRADED_MODE.get(factor.value) == "skip":
+            logger.warning(f"⏭️ {device} offline ({reason}) - bỏ qua bước {factor.value}")
+            self.gui.update_detail(f"⚠️ {factor.value.capitalize()} device offline\n"
+                                   f"⏭️ Step skipped - reconnecting in background...", Colors.WARNING)
+            self._fire(EventType.FACTOR_SKIPPED, factor)
+        else:
+            logger.warning(f"🔌 {device} offline ({reason}) - không thể xác thực {factor.value}")
+            self._fire(EventType.FACTOR_UNAVAILABLE, factor)
+    
+    def _device_failed(self, factor: Factor, error, session: int) -> bool:
+        """Báo lỗi thiết bị cho supervisor, trả về True nếu thiết bị vừa chuyển sang offline"""
+        device = FACTOR_DEVICES[factor]
+        self.health.report_failure(device, error)
+        if self.health.is_available(device):
+            return False
+        self.root.after(0, lambda: self._handle_unavailable_factor(factor, session))
+        return True
     
     def _proceed_to_fingerprint(self):
         """Chuyển sang bước vân tay"""
+        if not self.health.is_available("fingerprint"):
+            self._handle_unavailable_factor(Factor.FINGERPRINT)
+            return
         logger.info("👆 Chuyển sang xác thực vân tay")
-        self.auth_state["step"] = AuthStep.FINGERPRINT
-        self.auth_state["fingerprint_attempts"] = 0
         
         self.gui.update_step(2, "👆 FINGERPRINT SCAN", "Place finger on sensor", Colors.WARNING)
         self.gui.update_status("WAITING FOR FINGERPRINT...", 'yellow')
         self.gui.update_detail("👆 Please place your registered finger on the biometric sensor.\n🔍 Sensor is ready for scanning.", Colors.WARNING)
         
-        threading.Thread(target=self._fingerprint_loop, daemon=True).start()
+        self.devices.submit(self._fingerprint_loop())
     
-    def _fingerprint_loop(self):
+    async def _fingerprint_loop(self):
         """Fingerprint verification loop"""
-        while (self.auth_state["fingerprint_attempts"] < self.config.MAX_ATTEMPTS and 
-               self.auth_state["step"] == AuthStep.FINGERPRINT):
+        session = self.fsm.session
+        attempts = 0
+        while (attempts < self.config.MAX_ATTEMPTS and self.fsm.session == session and
+               self.fsm.state == AuthState.FINGERPRINT):
             
             try:
-                self.auth_state["fingerprint_attempts"] += 1
-                attempt_msg = f"Attempt {self.auth_state['fingerprint_attempts']}/{self.config.MAX_ATTEMPTS}"
+                attempts += 1
+                attempt_msg = f"Attempt {attempts}/{self.config.MAX_ATTEMPTS}"
                 
                 self.root.after(0, lambda: self.gui.update_step(2, "👆 FINGERPRINT", attempt_msg, Colors.WARNING))
                 self.root.after(0, lambda: self.gui.update_detail(
-                    f"👆 Scanning fingerprint... (Attempt {self.auth_state['fingerprint_attempts']}/{self.config.MAX_ATTEMPTS})\n"
+                    f"👆 Scanning fingerprint... (Attempt {attempts}/{self.config.MAX_ATTEMPTS})\n"
                     "🔍 Please hold finger steady on sensor.", 
                     Colors.WARNING))
                 
                 timeout = 10
-                start_time = time.time()
-                
-                while time.time() - start_time < timeout:
-                    if self.fingerprint.readImage():
-                        self.fingerprint.convertImage(0x01)
-                        result = self.fingerprint.searchTemplate()
-                        
-                        if result[0] != -1:
-                            # Success
-                            logger.info(f"✅ Fingerprint verified: ID {result[0]}")
-                            self.buzzer.beep("success")
-                            self.root.after(0, lambda: self.gui.update_status("FINGERPRINT VERIFIED! PROCEEDING TO RFID...", 'lightgreen'))
-                            self.root.after(0, lambda: self.gui.update_detail(f"✅ Fingerprint authentication successful!\n🆔 Template ID: {result[0]}\n📊 Match score: {result[1]}", Colors.SUCCESS))
-                            self.root.after(1500, self._proceed_to_rfid)
-                            return
-                        else:
-                            # Wrong fingerprint
-                            self.buzzer.beep("error")
-                            remaining = self.config.MAX_ATTEMPTS - self.auth_state["fingerprint_attempts"]
-                            if remaining > 0:
-                                self.root.after(0, lambda: self.gui.update_detail(
-                                    f"❌ Fingerprint not recognized!\n🔄 {remaining} attempts remaining\n👆 Please try again with a registered finger.", Colors.ERROR))
-                                time.sleep(2)
-                                break
-                    time.sleep(0.1)
                 
-                if time.time() - start_time >= timeout:
+                finger = await self.devices.wait_for_finger(timeout)
+                self.health.report_success("fingerprint")
+                if finger:
+                    # Đã biết người dùng từ bước khuôn mặt -> so 1:1 với template của người đó
+                    user = self._session_user if self._binding_enforced() else None
+                    result = await self.devices.match_finger(user.fingerprints if user else None)
+                    
+                    if result[0] != -1 and self._check_binding(Factor.FINGERPRINT, self.users.by_template(result[0])):
+                        # Success
+                        logger.info(f"✅ Fingerprint verified: ID {result[0]}")
+                        self.buzzer.beep("success")
+                        self.root.after(0, lambda: self.gui.update_status("FINGERPRINT VERIFIED! PROCEEDING TO RFID...", 'lightgreen'))
+                        self.root.after(0, lambda: self.gui.update_detail(f"✅ Fingerprint authentication successful!\n🆔 Template ID: {result[0]}\n📊 Match score: {result[1]}", Colors.SUCCESS))
+                        self.fsm.post(EventType.FINGER_OK, result[0], session)
+                        return
+                    else:
+                        # Wrong fingerprint
+                        self.buzzer.beep("error")
+                        self.fsm.post(EventType.FINGER_FAIL, result[0], session)
+                        remaining = self.config.MAX_ATTEMPTS - attempts
+                        if remaining > 0:
+                            self.root.after(0, lambda: self.gui.update_detail(
+                                f"❌ Fingerprint not recognized!\n🔄 {remaining} attempts remaining\n👆 Please try again with a registered finger.", Colors.ERROR))
+                            await asyncio.sleep(2)
+                else:
                     # Timeout
-                    remaining = self.config.MAX_ATTEMPTS - self.auth_state["fingerprint_attempts"]
+                    self.fsm.post(EventType.FINGER_FAIL, None, session)
+                    remaining = self.config.MAX_ATTEMPTS - attempts
                     if remaining > 0:
                         self.root.after(0, lambda: self.gui.update_detail(
                             f"⏰ Scan timeout!\n🔄 {remaining} attempts remaining\n👆 Please place finger properly on sensor.", Colors.WARNING))
-                        time.sleep(1)
+                        await asyncio.sleep(1)
                 
             except Exception as e:
                 logger.error(f"❌ Fingerprint error: {e}")
+                if self._device_failed(Factor.FINGERPRINT, e, session):
+                    return
+                self.fsm.post(EventType.FINGER_FAIL, None, session)
                 self.root.after(0, lambda: self.gui.update_detail(f"❌ Sensor error: {str(e)}", Colors.ERROR))
-                time.sleep(1)
-        
-        # Out of attempts
-        logger.warning("⚠️ Fingerprint: Hết lượt thử")
-        self.root.after(0, lambda: self.gui.update_status("FINGERPRINT FAILED - RESTARTING AUTHENTICATION", 'orange'))
-        self.root.after(0, lambda: self.gui.update_detail("⚠️ Maximum fingerprint attempts exceeded.\n🔄 Restarting authentication process...", Colors.ERROR))
-        self.buzzer.beep("error")
-        self.root.after(3000, self.start_authentication)
+                await asyncio.sleep(1)
     
     def _proceed_to_rfid(self):
         """Chuyển sang bước RFID"""
+        if not self.health.is_available("rfid"):
+            self._handle_unavailable_factor(Factor.RFID)
+            return
         logger.info("📱 Chuyển sang xác thực RFID")
-        self.auth_state["step"] = AuthStep.RFID
-        self.auth_state["rfid_attempts"] = 0
         
         self.gui.update_step(3, "📱 RFID SCAN", "Present card to reader", Colors.ACCENT)
         self.gui.update_status("WAITING FOR RFID CARD...", 'lightblue')
         self.gui.update_detail("📱 Please present your RFID card near the reader.\n📡 Reader is active and scanning for cards.", Colors.ACCENT)
         
-        threading.Thread(target=self._rfid_loop, daemon=True).start()
+        self.devices.submit(self._rfid_loop())
     
-    def _rfid_loop(self):
+    async def _rfid_loop(self):
         """RFID verification loop"""
-        while (self.auth_state["rfid_attempts"] < self.config.MAX_ATTEMPTS and 
-               self.auth_state["step"] == AuthStep.RFID):
+        session = self.fsm.session
+        attempts = 0
+        while (attempts < self.config.MAX_ATTEMPTS and self.fsm.session == session and
+               self.fsm.state == AuthState.RFID):
             
             try:
-                self.auth_state["rfid_attempts"] += 1
-                attempt_msg = f"Attempt {self.auth_state['rfid_attempts']}/{self.config.MAX_ATTEMPTS}"
+                attempts += 1
+                attempt_msg = f"Attempt {attempts}/{self.config.MAX_ATTEMPTS}"
                 
                 self.root.after(0, lambda: self.gui.update_step(3, "📱 RFID SCAN", attempt_msg, Colors.ACCENT))
                 self.root.after(0, lambda: self.gui.update_detail(
-                    f"📱 Scanning for RFID card... (Attempt {self.auth_state['rfid_attempts']}/{self.config.MAX_ATTEMPTS})\n"
+                    f"📱 Scanning for RFID card... (Attempt {attempts}/{self.config.MAX_ATTEMPTS})\n"
                     "📡 Hold card within 2-5cm of reader.", 
                     Colors.ACCENT))
                 
-                uid = self.pn532.read_passive_target(timeout=8)
+                uid = await self.devices.wait_for_card(timeout=8)
+                self.health.report_success("rfid")
                 
                 if uid:
-                    uid_list = list(uid)
+                    uid_list = uid
                     logger.info(f"📱 RFID detected: {uid_list}")
                     
                     # Check admin card
                     if uid_list == self.config.ADMIN_UID:
-                        self.root.after(0, lambda: self._admin_authentication())
+                        self.fsm.post(EventType.ADMIN_CARD, uid_list, session)
                         return
                     
-                    # Check regular cards
+                    # Check regular cards (thẻ đang bị khóa tạm bị từ chối ngay)
                     valid_uids = self.admin_data.get_rfid_uids()
-                    if uid_list in valid_uids:
+                    locked = self.lockout.remaining(*lockout_keys(self.config.DOOR_ID, uid=uid_list))
+                    if (not locked and uid_list in valid_uids and
+                            self._check_binding(Factor.RFID, self.users.by_card(uid_list))):
                         logger.info(f"✅ RFID verified: {uid_list}")
                         self.buzzer.beep("success")
                         self.root.after(0, lambda: self.gui.update_status("RFID VERIFIED! ENTER PASSCODE...", 'lightgreen'))
                         self.root.after(0, lambda: self.gui.update_detail(f"✅ RFID card authentication successful!\n🆔 Card UID: {uid_list}\n🔑 Proceeding to final passcode step.", Colors.SUCCESS))
-                        self.root.after(1500, self._proceed_to_passcode)
+                        self.fsm.post(EventType.CARD_OK, uid_list, session)
                         return
                     else:
                         # Invalid card
                         self.buzzer.beep("error")
-                        remaining = self.config.MAX_ATTEMPTS - self.auth_state["rfid_attempts"]
+                        self.fsm.post(EventType.CARD_FAIL, uid_list, session)
+                        remaining = self.config.MAX_ATTEMPTS - attempts
                         if remaining > 0:
+                            reason = f"🔒 Card locked for {locked:.0f}s" if locked else "❌ Unauthorized RFID card!"
                             self.root.after(0, lambda: self.gui.update_detail(
-                                f"❌ Unauthorized RFID card!\n🆔 UID: {uid_list}\n🔄 {remaining} attempts remaining", Colors.ERROR))
-                            time.sleep(2)
+                                f"{reason}\n🆔 UID: {uid_list}\n🔄 {remaining} attempts remaining", Colors.ERROR))
+                            await asyncio.sleep(2)
                 else:
                     # No card detected
-                    remaining = self.config.MAX_ATTEMPTS - self.auth_state["rfid_attempts"]
+                    self.fsm.post(EventType.CARD_FAIL, None, session)
+                    remaining = self.config.MAX_ATTEMPTS - attempts
                     if remaining > 0:
                         self.root.after(0, lambda: self.gui.update_detail(
                             f"⏰ No card detected!\n🔄 {remaining} attempts remaining\n📱 Please present card closer to reader.", Colors.WARNING))
-                        time.sleep(1)
+                        await asyncio.sleep(1)
                 
             except Exception as e:
                 logger.error(f"❌ RFID error: {e}")
+                if self._device_failed(Factor.RFID, e, session):
+                    return
+                self.fsm.post(EventType.CARD_FAIL, None, session)
                 self.root.after(0, lambda: self.gui.update_detail(f"❌ RFID reader error: {str(e)}", Colors.ERROR))
-                time.sleep(1)
-        
-        # Out of attempts
-        logger.warning("⚠️ RFID: Hết lượt thử")
-        self.root.after(0, lambda: self.gui.update_status("RFID FAILED - RESTARTING AUTHENTICATION", 'orange'))
-        self.root.after(0, lambda: self.gui.update_detail("⚠️ Maximum RFID attempts exceeded.\n🔄 Restarting authentication process...", Colors.ERROR))
-        self.buzzer.beep("error")
-        self.root.after(3000, self.start_authentication)
+                await asyncio.sleep(1)
     
     def _admin_authentication(self):
         """Admin authentication via RFID"""
@@ -841,6 +1722,9 @@ class AIEnhancedSecuritySystem:
                                     "Admin card detected. Enter password:", True, self.buzzer)
         password = dialog.show()
         
+        if password is not None:
+            self.audit.admin_action("login", password == self.config.ADMIN_PASS, via="rfid")
+        
         if password == self.config.ADMIN_PASS:
             logger.info("✅ Admin RFID authentication successful")
             self.gui.update_status("ADMIN RFID VERIFIED! OPENING CONTROL PANEL", 'lightgreen')
@@ -859,8 +1743,6 @@ class AIEnhancedSecuritySystem:
     def _proceed_to_passcode(self):
         """Chuyển sang bước cuối - passcode"""
         logger.info("🔑 Chuyển sang bước passcode cuối cùng")
-        self.auth_state["step"] = AuthStep.PASSCODE
-        self.auth_state["pin_attempts"] = 0
         
         self.gui.update_step(4, "🔑 FINAL PASSCODE", "Enter system passcode", Colors.SUCCESS)
         self.gui.update_status("ENTER FINAL PASSCODE...", 'lightgreen')
@@ -869,48 +1751,299 @@ class AIEnhancedSecuritySystem:
     
     def _request_passcode(self):
         """Passcode input với retry logic"""
-        if self.auth_state["pin_attempts"] >= self.config.MAX_ATTEMPTS:
-            logger.warning("⚠️ Passcode: Hết lượt thử")
-            self.gui.update_status("PASSCODE FAILED - RESTARTING", 'orange')
-            self.gui.update_detail("⚠️ Maximum passcode attempts exceeded.\n🔄 Restarting authentication process...", Colors.ERROR)
-            self.buzzer.beep("error")
-            self.root.after(3000, self.start_authentication)
+        if self.fsm.state != AuthState.PASSCODE:
             return
         
-        self.auth_state["pin_attempts"] += 1
-        attempt_msg = f"Attempt {self.auth_state['pin_attempts']}/{self.config.MAX_ATTEMPTS}"
+        attempt = self.fsm.attempts(AuthState.PASSCODE) + 1
+        attempt_msg = f"Attempt {attempt}/{self.config.MAX_ATTEMPTS}"
         
         self.gui.update_step(4, "🔑 PASSCODE", attempt_msg, Colors.SUCCESS)
-        self.gui.update_detail(f"🔑 Enter system passcode... (Attempt {self.auth_state['pin_attempts']}/{self.config.MAX_ATTEMPTS})\n🔢 Use the numeric keypad to enter your code.", Colors.SUCCESS)
+        self.gui.update_detail(f"🔑 Enter system passcode... (Attempt {attempt}/{self.config.MAX_ATTEMPTS})\n🔢 Use the numeric keypad to enter your code.", Colors.SUCCESS)
         
         dialog = EnhancedNumpadDialog(self.root, "🔑 FINAL AUTHENTICATION", 
                                     "Enter system passcode to unlock:", True, self.buzzer)
         pin = dialog.show()
         
         if pin == self.admin_data.get_passcode():
+            if not self._access_allowed():
+                return
             logger.info("✅ Passcode verified - Authentication complete!")
             self.gui.update_status("AUTHENTICATION COMPLETE! UNLOCKING DOOR...", 'lightgreen')
             self.gui.update_detail("🎉 All authentication steps completed successfully!\n🚪 Door unlocking now...", Colors.SUCCESS)
             self.buzzer.beep("success")
-            self._unlock_door()
+            self._fire(EventType.PIN_OK)
         elif pin is not None:
-            remaining = self.config.MAX_ATTEMPTS - self.auth_state["pin_attempts"]
+            remaining = self.config.MAX_ATTEMPTS - attempt
             if remaining > 0:
                 self.gui.update_detail(f"❌ Incorrect passcode!\n🔄 {remaining} attempts remaining\n🔢 Please try again.", Colors.ERROR)
                 self.buzzer.beep("error")
-                self.root.after(1500, self._request_passcode)
-            else:
-                self.gui.update_status("PASSCODE FAILED - RESTARTING", 'orange')
-                self.gui.update_detail("⚠️ Maximum passcode attempts exceeded.\n🔄 Restarting authentication process...", Colors.ERROR)
-                self.buzzer.beep("error")
-                self.root.after(3000, self.start_authentication)
+                self.timers.schedule(self.timing.retry, self._request_passcode)
+            self._fire(EventType.PIN_FAIL)
         else:
             self.start_authentication()
     
+    def _authentication_failed(self, event, prev_state):
+        """Hết lượt thử hoặc quá thời gian - máy trạng thái tự khởi động lại sau timeout FAILED"""
+        self.devices.cancel_all()
+        self.timers.cancel_all()
+        step = event.payload.value if isinstance(event.payload, Factor) else prev_state.value
+        
+        logger.warning(f"⚠️ {step}: Hết lượt thử")
+        self.gui.update_status(f"{step.upper()} FAILED - RESTARTING AUTHENTICATION", 'orange')
+        if event.type == EventType.TIMEOUT:
+            self.gui.update_detail(f"⏰ {step.capitalize()} step timed out.\n🔄 Restarting authentication process...", Colors.ERROR)
+        elif event.type == EventType.FACTOR_UNAVAILABLE:
+            self.gui.update_detail(f"🔌 {step.capitalize()} device offline - reconnecting in background.\n"
+                                   f"🔄 Restarting authentication process...", Colors.ERROR)
+        elif event.type == EventType.SCHEDULE_DENIED:
+            self.gui.update_status("ACCESS DENIED - OUTSIDE SCHEDULE", 'orange')
+            self.gui.update_detail(f"🗓️ {event.payload or 'This user'} is not allowed to enter at this time.\n"
+                                   f"🔄 Restarting authentication process...", Colors.ERROR)
+        elif event.type == EventType.PASSBACK_DENIED:
+            self.gui.update_status("ACCESS DENIED - ANTI-PASSBACK", 'orange')
+            self.gui.update_detail(f"🔁 {event.payload} is already inside {self.config.DOOR_ZONE}.\n"
+                                   f"🚪 Exit through an exit reader before entering again.", Colors.ERROR)
+        else:
+            self.gui.update_detail(f"⚠️ Maximum {step} attempts exceeded.\n🔄 Restarting authentication process...", Colors.ERROR)
+        self.buzzer.beep("error")
+    
+    # ==== PARALLEL MULTI-FACTOR MODE ====
+    def _start_parallel_authentication(self):
+        """Kích hoạt đồng thời mọi yếu tố theo chính sách cấu hình"""
+        self._reset_session()
+        
+        # Loại phương án cần thiết bị offline - phương án còn lại thay thế ngay
+        offline = {f for f, device in FACTOR_DEVICES.items() if not self.health.is_available(device)}
+        policy = self.auth_policy.without(offline)
+        if not policy.alternatives:
+            self._fire(EventType.FACTOR_UNAVAILABLE, min(offline & self.auth_policy.factors, key=lambda f: f.value))
+            return
+        
+        session = MultiFactorSession(policy)
+        self.auth_session = session
+        factors = policy.factors
+        armed = {FACTOR_STEPS[f] for f in factors}
+        
+        logger.info(f"⚡ Parallel authentication: {self._format_policy(policy)} (window {self.config.PARALLEL_WINDOW:.0f}s)")
+        if offline & self.auth_policy.factors:
+            logger.warning("🔌 Degraded mode - offline: " + ", ".join(sorted(f.value for f in offline)))
+        self.gui.update_step(1, "⚡ PARALLEL AUTHENTICATION", "All factors armed - any order", Colors.PRIMARY)
+        self.gui.update_factor_indicators(set(), armed)
+        self.gui.update_status("PRESENT FACE / FINGER / CARD IN ANY ORDER", 'white')
+        self.gui.update_detail(f"⚡ Required: {self._format_policy(policy)}\n"
+                               f"⏱️ Complete within {self.config.PARALLEL_WINDOW:.0f} seconds", Colors.PRIMARY)
+        
+        if Factor.FACE in factors:
+            self.face_task = self.devices.submit(self._parallel_face_task(session))
+        if Factor.FINGERPRINT in factors:
+            self.devices.submit(self._parallel_fingerprint_task(session))
+        if Factor.RFID in factors:
+            self.devices.submit(self._parallel_rfid_task(session))
+        
+        self._check_parallel_progress(session)
+    
+    def _format_policy(self, policy: AuthPolicy):
+        return " | ".join("+".join(sorted(f.value.upper() for f in option))
+                          for option in policy.alternatives)
+    
+    def _report_factor(self, session, result: FactorResult):
+        """Ghi nhận kết quả của một yếu tố (gọi từ bất kỳ luồng nào)"""
+        if session is not self.auth_session:
+            return
+        
+        is_new = session.submit(result)
+        if is_new or not result.success:
+            self._audit_factor(result)
+        
+        if is_new:
+            logger.info(f"✅ Factor {result.factor.value} satisfied" +
+                        (f": {result.identity}" if result.identity else ""))
+            self.buzzer.beep("success")
+        elif not result.success:
+            logger.info(f"❌ Factor {result.factor.value} failed "
+                        f"({session.failures(result.factor)}/{session.policy.max_failures})")
+            self.buzzer.beep("error")
+            if result.factor != Factor.FACE:
+                uid = result.detail if result.factor == Factor.RFID else None
+                self.root.after(0, lambda: self._record_attempt(result.factor, uid))
+            if session.exhausted(result.factor):
+                self.root.after(0, lambda: self._parallel_failed(session, result.factor))
+                return
+        
+        self.root.after(0, lambda: self._check_parallel_progress(session))
+    
+    def _check_parallel_progress(self, session):
+        """Mở cửa ngay khi một phương án được thỏa mãn (chạy trên Tk thread)"""
+        if session is not self.auth_session or session.completed:
+            return
+        
+        completed = {FACTOR_STEPS[f] for f in session.satisfied_factors()}
+        armed = {FACTOR_STEPS[f] for f in session.policy.factors}
+        self.gui.update_factor_indicators(completed, armed)
+        
+        if session.is_satisfied():
+            if session.complete():
+                self.devices.cancel_all()
+                if not self._access_allowed():
+                    return
+                identities = ", ".join(i for i in session.identities().values() if i)
+                logger.info(f"✅ Parallel authentication complete {identities}")
+                self.gui.update_status("AUTHENTICATION COMPLETE! UNLOCKING DOOR...", 'lightgreen')
+                self._fire(EventType.FACTORS_OK, session.identities())
+            return
+        
+        missing = session.missing()
+        if missing == {Factor.PASSCODE}:
+            if not self._parallel_pin_open:
+                self._request_parallel_passcode(session)
+            return
+        
+        self.gui.update_detail("⏳ Waiting for: " + ", ".join(sorted(f.value.upper() for f in missing)) +
+                               f"\n✅ Done: {len(completed)}/{len(armed)}", Colors.WARNING)
+    
+    def _request_parallel_passcode(self, session):
+        """Passcode là yếu tố cuối khi các yếu tố còn lại đã xong"""
+        self._parallel_pin_open = True
+        self.gui.update_step(4, "🔑 PASSCODE", "Other factors verified", Colors.SUCCESS)
+        self.gui.update_status("ENTER PASSCODE TO UNLOCK...", 'lightgreen')
+        
+        dialog = EnhancedNumpadDialog(self.root, "🔑 FINAL AUTHENTICATION",
+                                    "Enter system passcode to unlock:", True, self.buzzer)
+        pin = dialog.show()
+        self._parallel_pin_open = False
+        
+        if session is not self.auth_session:
+            return
+        if pin is None:
+            self.start_authentication()
+            return
+        
+        ok = pin == self.admin_data.get_passcode()
+        if not ok:
+            remaining = session.policy.max_failures - session.failures(Factor.PASSCODE) - 1
+            self.gui.update_detail(f"❌ Incorrect passcode!\n🔄 {remaining} attempts remaining", Colors.ERROR)
+        self._report_factor(session, FactorResult(Factor.PASSCODE, ok))
+    
+    def _parallel_failed(self, session, factor: Factor):
+        """Một yếu tố hết lượt thử - reset toàn bộ phiên"""
+        if session is not self.auth_session or not session.complete():
+            return
+        self._fire(EventType.FACTOR_EXHAUSTED, factor)
+    
+    def _parallel_admin_card(self, session):
+        if session is not self.auth_session or not session.complete():
+            return
+        self.devices.cancel_all()
+        self._fire(EventType.ADMIN_CARD)
+    
+    async def _parallel_face_task(self, session):
+        """Face reader trong chế độ song song"""
+        consecutive_count = 0
+        while self.running and not session.completed:
+            try:
+                frame = await self.devices.next_frame()
+                if frame is None:
+                    continue
+                self.evidence.add_frame(frame)
+                
+                annotated_frame, result = await self.scheduler.ainfer(self.config.DOOR_ID, frame)
+                self.root.after(0, lambda: self.gui.update_camera(annotated_frame, result))
+                
+                verdict = None
+                if result.recognized:
+                    consecutive_count = min(consecutive_count + 1, self.config.FACE_REQUIRED_CONSECUTIVE)
+                    verdict = self._check_liveness(frame, result)
+                    alive = self._liveness_gate(verdict, result)
+                    if alive is False:
+                        consecutive_count = 0
+                    elif consecutive_count >= self.config.FACE_REQUIRED_CONSECUTIVE and alive:
+                        # Báo lại liên tục để làm mới thời điểm trong cửa sổ
+                        bound, user = self._factor_user(Factor.FACE, self.users.by_face(result.person_name))
+                        if bound:
+                            self._report_factor(session, FactorResult(Factor.FACE, True, result.person_name,
+                                                                      result.confidence, user=user))
+                        consecutive_count = 0
+                else:
+                    consecutive_count = 0
+                    self._reset_liveness()
+                    if result.detected:
+                        self.evidence.trigger("unknown_face", confidence=result.confidence)
+                
+                await asyncio.sleep(self._frame_pause(verdict))
+            
+            except Exception as e:
+                logger.error(f"❌ Lỗi parallel face task: {e}")
+                await asyncio.sleep(1)
+    
+    async def _parallel_fingerprint_task(self, session):
+        """Fingerprint reader trong chế độ song song"""
+        while self.running and not session.completed:
+            try:
+                finger = await self.devices.wait_for_finger(session.policy.window_seconds)
+                self.health.report_success("fingerprint")
+                if not finger:
+                    continue
+                
+                # Khuôn mặt / thẻ đã xác định người dùng -> so 1:1
+                user_id = session.user() if self._binding_enforced() else None
+                known = self.users.get(user_id) if user_id else None
+                result = await self.devices.match_finger(known.fingerprints if known else None)
+                bound, user = self._factor_user(Factor.FINGERPRINT, self.users.by_template(result[0]))
+                matched = result[0] != -1
+                self._report_factor(session, FactorResult(Factor.FINGERPRINT, matched and bound,
+                                                          result[0] if matched else None, result[0], user=user))
+                
+                # Chờ nhấc tay trước khi đọc lần tiếp theo
+                await asyncio.sleep(1.5)
+            
+            except Exception as e:
+                logger.error(f"❌ Parallel fingerprint error: {e}")
+                self.health.report_failure("fingerprint", e)
+                if not self.health.is_available("fingerprint"):
+                    return  # _on_device_health_changed tạo lại phiên không cần vân tay
+                await asyncio.sleep(1)
+    
+    async def _parallel_rfid_task(self, session):
+        """RFID reader trong chế độ song song"""
+        while self.running and not session.completed:
+            try:
+                uid_list = await self.devices.wait_for_card(timeout=session.policy.window_seconds)
+                self.health.report_success("rfid")
+                if not uid_list:
+                    continue
+                
+                logger.info(f"📱 RFID detected: {uid_list}")
+                if uid_list == self.config.ADMIN_UID:
+                    self.root.after(0, lambda: self._parallel_admin_card(session))
+                    return
+                
+                bound, user = self._factor_user(Factor.RFID, self.users.by_card(uid_list))
+                locked = self.lockout.remaining(*lockout_keys(self.config.DOOR_ID, uid=uid_list))
+                valid = not locked and uid_list in self.admin_data.get_rfid_uids() and bound
+                self._report_factor(session, FactorResult(Factor.RFID, valid, card_key(uid_list), uid_list,
+                                                          user=user))
+                if not valid:
+                    self.evidence.trigger("invalid_rfid", uid=uid_list)
+                    self._export_clip("invalid_rfid", uid=uid_list)
+                    self.root.after(0, lambda: self.gui.update_detail(
+                        f"❌ Unauthorized RFID card!\n🆔 UID: {uid_list}", Colors.ERROR))
+                
+                # Tránh đọc lặp cùng một thẻ
+                await asyncio.sleep(1.5)
+            
+            except Exception as e:
+                logger.error(f"❌ Parallel RFID error: {e}")
+                self.health.report_failure("rfid", e)
+                if not self.health.is_available("rfid"):
+                    return  # _on_device_health_changed tạo lại phiên không cần RFID
+                await asyncio.sleep(1)
+    
     def _unlock_door(self):
         """Mở khóa cửa với countdown"""
         try:
             logger.info(f"🚪 Unlocking door for {self.config.LOCK_OPEN_DURATION} seconds")
+            self.occupancy.record(self._session_subject(), self.config.DOOR_ZONE, self.config.DOOR_DIRECTION,
+                                  self.config.DOOR_ID)
             
             self.gui.update_step(4, "✅ COMPLETED", "🚪 DOOR UNLOCKED", Colors.SUCCESS)
             self.gui.update_status(f"DOOR OPEN - AUTO LOCK IN {self.config.LOCK_OPEN_DURATION}S", 'lightgreen')
@@ -920,17 +2053,15 @@ class AIEnhancedSecuritySystem:
             
             # Countdown với hiệu ứng
             for i in range(self.config.LOCK_OPEN_DURATION, 0, -1):
-                self.root.after((self.config.LOCK_OPEN_DURATION - i) * 1000, 
-                               lambda t=i: self.gui.update_detail(f"🚪 Door is open - Auto lock in {t} seconds\n✅ Please enter and close the door", Colors.SUCCESS))
-                self.root.after((self.config.LOCK_OPEN_DURATION - i) * 1000,
-                               lambda t=i: self.gui.update_status(f"DOOR OPEN - LOCK IN {t}S", 'lightgreen'))
+                self.timers.schedule(self.config.LOCK_OPEN_DURATION - i,
+                                     lambda t=i: self.gui.update_detail(f"🚪 Door is open - Auto lock in {t} seconds\n✅ Please enter and close the door", Colors.SUCCESS))
+                self.timers.schedule(self.config.LOCK_OPEN_DURATION - i,
+                                     lambda t=i: self.gui.update_status(f"DOOR OPEN - LOCK IN {t}S", 'lightgreen'))
                 
                 # Warning beeps for last 3 seconds
                 if i <= 3:
-                    self.root.after((self.config.LOCK_OPEN_DURATION - i) * 1000,
-                                   lambda: self.buzzer.beep("click"))
-            
-            self.root.after(self.config.LOCK_OPEN_DURATION * 1000, self._lock_door)
+                    self.timers.schedule(self.config.LOCK_OPEN_DURATION - i,
+                                         lambda: self.buzzer.beep("click"))
             
         except Exception as e:
             logger.error(f"❌ Door unlock error: {e}")
@@ -948,9 +2079,7 @@ class AIEnhancedSecuritySystem:
             self.buzzer.beep("click")
             
             # Reset detection stats
-            self.gui.detection_stats = {"total": 0, "recognized": 0, "unknown": 0}
-            
-            self.root.after(2000, self.start_authentication)
+            self.gui.detection_stats = {"total": 0, "recognized": 0, "unknown": 0, "spoof": 0}
             
         except Exception as e:
             logger.error(f"❌ Door lock error: {e}")
@@ -958,126 +2087,146 @@ class AIEnhancedSecuritySystem:
             self.buzzer.beep("error")
     
     def add_face_training_mode(self, person_name: str):
-        """AI Face training mode với UI feedback"""
+        """AI Face training mode - pipeline chạy nền, GUI chỉ nhận tiến trình"""
+        if self.enrollment_task is not None and not self.enrollment_task.done():
+            logger.warning("⚠️ Đang có phiên training khác")
+            return False
+        if not self.startup.is_ready("camera", "face_model"):
+            EnhancedMessageBox.show_error(self.root, "❌ NOT READY",
+                                        "❌ Camera or AI models are still starting.\n\n"
+                                        "⏳ Please try again in a few seconds.",
+                                        self.buzzer)
+            return False
+        
+        logger.info(f"👤 Bắt đầu training khuôn mặt cho: {person_name}")
+        
+        # Show training instruction
+        EnhancedMessageBox.show_info(self.root, "🤖 AI FACE TRAINING", 
+                                   f"Starting AI training for: {person_name}\n\n"
+                                   f"📸 The system will keep the {self.config.ENROLL_TARGET} best images\n"
+                                   "👁️ Please look at camera and move head slightly\n"
+                                   "🔄 Blurry, dark and duplicate shots are skipped automatically", 
+                                   self.buzzer)
+        
+        # Camera dành cho pipeline trong lúc training
+        self._fire(EventType.SUSPEND)
+        
+        pipeline = face_enrollment.FaceEnrollmentPipeline(
+            lambda frame: self.face_recognizer.capture_training_images(frame, 1),
+            target=self.config.ENROLL_TARGET,
+            min_samples=self.config.ENROLL_MIN_SAMPLES,
+            min_quality=self.config.ENROLL_MIN_QUALITY,
+            duplicate_threshold=self.config.ENROLL_DUPLICATE_THRESHOLD,
+            max_frames=self.config.ENROLL_MAX_FRAMES
+        )
+        
+        self.gui.update_status(f"AI TRAINING MODE: {person_name.upper()}", 'purple')
+        self.gui.update_step(1, "🤖 AI TRAINING", "Progress: 0%", Colors.WARNING)
+        self.enrollment_task = self.devices.submit(self._enrollment_loop(person_name, pipeline))
+        return True
+    
+    async def _enrollment_loop(self, person_name: str, pipeline: "face_enrollment.FaceEnrollmentPipeline"):
+        """Đọc frame liên tục, chấm điểm và train trên luồng compute"""
+        started = time.monotonic()
+        last_kept = -1
         try:
-            logger.info(f"👤 Bắt đầu training khuôn mặt cho: {person_name}")
-            
-            # Show training instruction
-            EnhancedMessageBox.show_info(self.root, "🤖 AI FACE TRAINING", 
-                                       f"Starting AI training for: {person_name}\n\n"
-                                       "📸 The system will capture 20 images\n"
-                                       "👁️ Please look at camera and move head slightly\n"
-                                       "🔄 This will create multiple angles for better recognition", 
-                                       self.buzzer)
-            
-            captured_images = []
-            training_target = 20
-            
-            self.gui.update_status(f"AI TRAINING MODE: {person_name.upper()}", 'purple')
-            
-            for i in range(training_target):
-                self.gui.update_detail(f"📸 Capturing training image {i+1}/{training_target}\n"
-                                     f"👤 Subject: {person_name}\n"
-                                     f"🤖 Please hold position and look at camera", Colors.WARNING)
-                
-                # Capture frame
-                frame = self.picam2.capture_array()
-                if frame is None:
-                    continue
+            while self.running and not pipeline.done:
+                frame = await self.devices.next_frame()
+                progress = await self.scheduler.acall(pipeline.offer, frame)
                 
-                # Get training images
-                training_images = self.face_recognizer.capture_training_images(frame, 1)
-                
-                if training_images:
-                    captured_images.extend(training_images)
-                    self.buzzer.beep("click")
-                    
-                    # Show progress
-                    progress = ((i + 1) / training_target) * 100
-                    self.gui.update_step(1, "🤖 AI TRAINING", f"Progress: {progress:.0f}%", Colors.SUCCESS)
-                    
-                    time.sleep(0.8)  # Pause between captures
-                else:
-                    self.gui.update_detail(f"❌ No face detected in image {i+1}\n"
-                                         "🔄 Retrying... Please look at camera", Colors.ERROR)
-                    i -= 1  # Retry this capture
-                    time.sleep(1)
+                if progress.kept != last_kept:
+                    if progress.kept > last_kept >= 0:
+                        self.buzzer.beep("click")
+                    last_kept = progress.kept
+                    self.root.after(0, lambda p=progress: self._show_enrollment_progress(person_name, p))
             
-            # Process training data
-                if len(captured_images) >= 15:  # Minimum threshold
-                    self.gui.update_detail(f"🧠 Processing {len(captured_images)} training images...\n"
-                                     "⚡ AI neural network learning...", Colors.PRIMARY)
+            saved = False
+            if pipeline.succeeded:
+                images = pipeline.images()
+                self.root.after(0, lambda: self.gui.update_detail(
+                    f"🧠 Processing {len(images)} training images...\n"
+                    "⚡ AI neural network learning...", Colors.PRIMARY))
+                saved = await self.scheduler.acall(self.face_recognizer.add_person, person_name, images)
+            
+            elapsed = time.monotonic() - started
+            logger.info(f"📸 Enrollment {person_name}: {len(pipeline.samples)} mẫu / {pipeline.frames} frame, "
+                        f"{pipeline.duplicates} trùng, {pipeline.rejected} kém, {elapsed:.1f}s")
+            self.root.after(0, lambda: self._finish_enrollment(person_name, pipeline, saved, elapsed))
+        except asyncio.CancelledError:
+            logger.info(f"🛑 Training {person_name} đã bị hủy")
+            raise
+        except Exception as e:
+            logger.error(f"❌ AI training error: {e}")
+            self.root.after(0, lambda: self._finish_enrollment(person_name, pipeline, False, 0.0, str(e)))
+    
+    def _show_enrollment_progress(self, person_name: str, progress):
+        self.gui.update_step(1, "🤖 AI TRAINING", f"Progress: {progress.percent:.0f}%", Colors.SUCCESS)
+        self.gui.update_detail(f"📸 Good images: {progress.kept}/{progress.target}\n"
+                             f"👤 Subject: {person_name}\n"
+                             f"🔍 Frames: {progress.frames} | Duplicates: {progress.duplicates} | Low quality: {progress.rejected}\n"
+                             f"🤖 Please move your head slightly", Colors.WARNING)
+    
+    def _finish_enrollment(self, person_name: str, pipeline: "face_enrollment.FaceEnrollmentPipeline",
+                           saved: bool, elapsed: float, error: Optional[str] = None):
+        """Hiển thị kết quả training trên Tk thread"""
+        try:
+            kept = len(pipeline.samples)
+            self.audit.admin_action("enroll_face", saved, person_name, images=kept, error=error)
+            if error:
+                EnhancedMessageBox.show_error(self.root, "❌ TRAINING ERROR", 
+                                            f"❌ AI training failed!\n\nError: {error}", 
+                                            self.buzzer)
+            elif saved:
+                logger.info(f"✅ AI training successful for {person_name}")
+                EnhancedMessageBox.show_success(self.root, "🎉 AI TRAINING SUCCESS", 
+                                              f"✅ AI training completed successfully!\n\n"
+                                              f"👤 Name: {person_name}\n"
+                                              f"📸 Training images: {kept} (quality {pipeline.mean_quality():.2f})\n"
+                                              f"⏱️ Time: {elapsed:.1f}s\n"
+                                              f"🔐 Access authorized for future authentication", 
+                                              self.buzzer)
                 
-                if self.face_recognizer.add_person(person_name, captured_images):
-                    logger.info(f"✅ AI training successful for {person_name}")
-                    EnhancedMessageBox.show_success(self.root, "🎉 AI TRAINING SUCCESS", 
-                                                  f"✅ AI training completed successfully!\n\n"
-                                                  f"👤 Name: {person_name}\n"
-                                                  f"📸 Training images: {len(captured_images)}\n"
-                                                  f"🤖 Neural network updated\n"
-                                                  f"🔐 Access authorized for future authentication", 
-                                                  self.buzzer)
-                    
-                    # Show updated stats
-                    face_info = self.face_recognizer.get_database_info()
-                    self.gui.update_detail(f"📊 Database updated!\n"
-                                         f"👥 Total people: {face_info['total_people']}\n"
-                                         f"📸 Total training images: {sum(p['face_count'] for p in face_info['people'].values())}", 
-                                         Colors.SUCCESS)
-                    return True
-                else:
-                    EnhancedMessageBox.show_error(self.root, "❌ TRAINING FAILED", 
-                                                "❌ Failed to save training data!\n\n"
-                                                "🔧 Please check system permissions\n"
-                                                "💾 Ensure sufficient storage space", 
-                                                self.buzzer)
+                # Show updated stats
+                face_info = self.face_recognizer.get_database_info()
+                self.gui.update_detail(f"📊 Database updated!\n"
+                                     f"👥 Total people: {face_info['total_people']}\n"
+                                     f"📸 Total training images: {sum(p['face_count'] for p in face_info['people'].values())}", 
+                                     Colors.SUCCESS)
+            elif pipeline.succeeded:
+                EnhancedMessageBox.show_error(self.root, "❌ TRAINING FAILED", 
+                                            "❌ Failed to save training data!\n\n"
+                                            "🔧 Please check system permissions\n"
+                                            "💾 Ensure sufficient storage space", 
+                                            self.buzzer)
             else:
                 EnhancedMessageBox.show_error(self.root, "❌ INSUFFICIENT DATA", 
                                             f"❌ Training failed - insufficient data!\n\n"
-                                            f"📸 Captured: {len(captured_images)} images\n"
-                                            f"📊 Required: minimum 15 images\n"
+                                            f"📸 Good images: {kept}\n"
+                                            f"📊 Required: minimum {pipeline.min_samples} images\n"
                                             f"💡 Please ensure good lighting and clear face visibility", 
                                             self.buzzer)
-            
-            return False
-            
-        except Exception as e:
-            logger.error(f"❌ AI training error: {e}")
-            EnhancedMessageBox.show_error(self.root, "❌ TRAINING ERROR", 
-                                        f"❌ AI training failed!\n\nError: {str(e)}", 
-                                        self.buzzer)
-            return False
         finally:
             # Return to normal mode
             self.gui.update_status("RETURNING TO NORMAL MODE...", 'white')
-            self.root.after(2000, self.start_authentication)
+            self.timers.schedule(self.timing.relock_restart, self.start_authentication, tag=TimerManager.SYSTEM)
+    
+    def start(self):
+        """Hiện GUI và bơm sự kiện - mainloop do run() / MultiDoorController chạy"""
+        # GUI hiện ngay, xác thực bắt đầu khi camera + model AI sẵn sàng
+        self.gui.update_status("AI ENHANCED SECURITY SYSTEM v2.0 - STARTING...", 'white')
+        self._show_startup_progress()
+        
+        # Setup cleanup
+        self.root.protocol("WM_DELETE_WINDOW", self.cleanup)
+        
+        # Event pump cho máy trạng thái
+        self._pump_events()
     
     def run(self):
         """Chạy hệ thống chính"""
         try:
             logger.info("🚀 Starting AI Enhanced Security System")
-            
-            # Startup effects
-            self.gui.update_status("AI ENHANCED SECURITY SYSTEM v2.0 - READY!", 'lightgreen')
-            self.gui.update_detail("🤖 AI neural networks loaded and ready\n"
-                                 "🔐 4-layer security system active\n"
-                                 "⚡ Enhanced performance for Raspberry Pi 5", Colors.SUCCESS)
-            
-            self.buzzer.beep("startup")
-            
-            # Show system info
-            face_info = self.face_recognizer.get_database_info()
-            self.gui.update_detail(f"📊 System Status:\n"
-                                 f"👥 Registered faces: {face_info['total_people']}\n"
-                                 f"👆 Fingerprints: {len(self.admin_data.get_fingerprint_ids())}\n"
-                                 f"📱 RFID cards: {len(self.admin_data.get_rfid_uids())}\n"
-                                 f"🤖 AI Status: Ready", Colors.SUCCESS)
-            
-            # Start authentication after 3 seconds
-            self.root.after(3000, self.start_authentication)
-            
-            # Setup cleanup
-            self.root.protocol("WM_DELETE_WINDOW", self.cleanup)
+            self.start()
             
             # Start main loop
             self.root.mainloop()
@@ -1093,6 +2242,43 @@ class AIEnhancedSecuritySystem:
         self.running = False
         
         try:
+            if hasattr(self, 'startup'):
+                self.startup.shutdown()
+            
+            if hasattr(self, 'timers'):
+                self.timers.cancel_all(tag=None)
+            
+            if hasattr(self, 'health'):
+                self.health.stop()
+            
+            if self.sync is not None:
+                self.sync.stop()
+            
+            if hasattr(self, 'evidence'):
+                self.evidence.close()
+            
+            if self.preroll is not None:
+                self.preroll.stop()
+            
+            if hasattr(self, 'audit'):
+                self.audit.close()
+            
+            if hasattr(self, 'history') and self.primary is None:
+                self.history.close()
+                self.lockout.close()
+                self.occupancy.close()
+            
+            if hasattr(self, 'scheduler') and self.primary is None:
+                self.scheduler.stop()
+                logger.info(f"🧠 Inference: {self.scheduler.report()}")
+                if isinstance(self.scheduler.model, RemoteRecognizer):
+                    logger.info(f"🌐 Recognition: {self.scheduler.model.report()}")
+                    self.scheduler.model.close()
+            
+            if hasattr(self, 'devices'):
+                self.devices.close()
+                logger.info("⚡ Async device layer stopped")
+            
             if hasattr(self, 'picam2'):
                 self.picam2.stop()
                 logger.info("📹 Camera stopped")
@@ -1101,7 +2287,9 @@ class AIEnhancedSecuritySystem:
                 self.relay.on()  # Ensure door is locked
                 logger.info("🔒 Door locked")
                 
-            if hasattr(self, 'buzzer') and hasattr(self.buzzer, 'buzzer') and self.buzzer.buzzer:
+            if hasattr(self, 'buzzer') and hasattr(self.buzzer, 'close'):
+                self.buzzer.close()
+            elif hasattr(self, 'buzzer') and hasattr(self.buzzer, 'buzzer') and self.buzzer.buzzer:
                 self.buzzer.buzzer.off()
                 logger.info("🔇 Buzzer stopped")
                 
@@ -1113,6 +2301,35 @@ class AIEnhancedSecuritySystem:
         
         logger.info("✅ Cleanup completed")
 
+class MultiDoorController:
+    """Nhiều cửa trong một tiến trình: mỗi cửa có camera, đầu đọc, relay và máy trạng thái
+    riêng; model nhận diện nạp một lần, frame các camera được suy luận theo lô xen kẽ"""
+    
+    def __init__(self, configs: List[Config]):
+        self.doors: List[AIEnhancedSecuritySystem] = []
+        for config in configs:
+            primary = self.doors[0] if self.doors else None
+            door = AIEnhancedSecuritySystem(config, primary)
+            door.root.title(f"🤖 HỆ THỐNG KHÓA BẢO MẬT AI - CỬA {config.DOOR_ID}")
+            self.doors.append(door)
+        logger.info(f"🚪 {len(self.doors)} cửa: {', '.join(d.config.DOOR_ID for d in self.doors)}")
+    
+    def run(self):
+        try:
+            logger.info("🚀 Starting multi-door AI Enhanced Security System")
+            for door in self.doors:
+                door.start()
+            self.doors[0].root.mainloop()
+        except KeyboardInterrupt:
+            logger.info("System stopped by user request")
+        finally:
+            self.cleanup()
+    
+    def cleanup(self):
+        # Cửa đầu tiên sau cùng - nó giữ model, nhật ký và lịch sử dùng chung
+        for door in reversed(self.doors):
+            door.cleanup()
+
 # ==== MAIN EXECUTION ====
 if __name__ == "__main__":
     try:
@@ -1163,20 +2380,21 @@ if __name__ == "__main__":
         
         for icon, component in hardware_components:
             print(f"   {icon} {component}")
-            time.sleep(0.2)
         
         print()
         print("🚀 KHỞI TẠO HỆ THỐNG AI...")
         print("=" * 100)
         
-        # Initialize and run system
-        system = AIEnhancedSecuritySystem()
+        # Initialize and run system (nhiều cửa nếu Config.DOORS có hơn một cửa)
+        door_configs = Config().for_doors()
+        if len(door_configs) > 1:
+            system = MultiDoorController(door_configs)
+        else:
+            system = AIEnhancedSecuritySystem(door_configs[0])
         
         print()
-        print("✅ TẤT CẢ THÀNH PHẦN ĐÃ SẴN SÀNG!")
-        print("🎨 Đang khởi động giao diện AI...")
-        print("📡 Kết nối hardware thành công!")
-        print("🤖 AI neural networks đã được load!")
+        print("✅ GIAO DIỆN ĐÃ SẴN SÀNG!")
+        print("📡 Camera, RFID, vân tay và AI models đang khởi tạo song song...")
         print("=" * 100)
         print("🎯 HỆ THỐNG SẴN SÀNG! BẮT ĐẦU SỬ DỤNG...")
         print("=" * 100)
@@ -4,9 +4,6 @@ Hệ thống khóa bảo mật 4 lớp - Phiên bản tối ưu cuối cùng
 Cải thiện: Điều khiển bàn phím số, GUI lớn hơn, dễ nhìn hơn
 """
 
-import cv2
-import face_recognition
-import pickle
 import time
 import json
 import os
@@ -14,22 +11,31 @@ import logging
 import threading
 import tkinter as tk
 from tkinter import ttk, font
-from PIL import Image, ImageTk
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 from dataclasses import dataclass
 from enum import Enum
 import sys
-import numpy as np
 
-# Hardware imports
+from buzzer_player import BackgroundBuzzer
+from face_backends import backend_modules, create_backend, gallery_path, resolve_backend
+from face_model_store import IncrementalFaceStore
+from lazy_imports import lazy_attr, lazy_module, mark, preload, startup_report, timed
+
+# Module nặng - chỉ import khi dùng lần đầu hoặc được nạp trước trên luồng nền
+cv2 = lazy_module("cv2")
+np = lazy_module("numpy")
+Image = lazy_module("PIL.Image")
+ImageTk = lazy_module("PIL.ImageTk")
+
+# Hardware imports - gpiozero cần ngay cho relay, các driver khác import khi khởi tạo
+Picamera2 = lazy_attr("picamera2", "Picamera2")
+PyFingerprint = lazy_attr("pyfingerprint.pyfingerprint", "PyFingerprint")
+PN532_I2C = lazy_attr("adafruit_pn532.i2c", "PN532_I2C")
+board = lazy_module("board")
+busio = lazy_module("busio")
 try:
-    from picamera2 import Picamera2
     from gpiozero import LED, PWMOutputDevice
-    from pyfingerprint.pyfingerprint import PyFingerprint
-    import board
-    import busio
-    from adafruit_pn532.i2c import PN532_I2C
 except ImportError as e:
     logging.error(f"Không thể import thư viện phần cứng: {e}")
     sys.exit(1)
@@ -46,9 +52,13 @@ class Config:
     ADMIN_DATA_FILE: str = "/home/khoi/Desktop/Centek/admin_data.json"
     
     # Face Recognition
+    FACE_BACKEND: str = "hog"  # face_backends: "hog" (HOG + dlib), "yunet+onnx", "ssd+lbph"... (xem: face_backends.py list)
+    FACE_MODELS_PATH: str = "/home/khoi/Desktop/Centek/models"  # File model của backend ssd / yunet / onnx
     FACE_TOLERANCE: float = 0.3
+    FACE_BACKEND_THRESHOLD: Optional[float] = None  # Ngưỡng của backend không dùng dlib (None = mặc định của backend)
     FACE_REQUIRED_CONSECUTIVE: int = 3
     FACE_DETECTION_INTERVAL: float = 0.05
+    FACE_COMPACT_EVERY: int = 50  # Số thay đổi trong file delta trước khi gộp vào encodings.pickle
     
     # Camera
     CAMERA_WIDTH: int = 640
@@ -92,29 +102,13 @@ logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
 logger = logging.getLogger(__name__)
 
 # ==== ENHANCED BUZZER WITH CLICK SOUND ====
-class EnhancedBuzzerManager:
-    def __init__(self, gpio_pin: int):
-        self.buzzer = PWMOutputDevice(gpio_pin)
-        self.buzzer.off()
-    
-    def beep(self, pattern: str):
-        patterns = {
-            "success": [(2000, 0.5, 0.3), (2500, 0.5, 0.3)],
-            "error": [(400, 0.8, 0.8)],
-            "click": [(1500, 0.3, 0.1)],  # Click sound for keypad
-            "warning": [(800, 0.6, 0.2), (600, 0.6, 0.2)]
-        }
-        
-        if pattern in patterns:
-            try:
-                for freq, volume, duration in patterns[pattern]:
-                    self.buzzer.frequency = freq
-                    self.buzzer.value = volume
-                    time.sleep(duration)
-                    self.buzzer.off()
-                    time.sleep(0.05)
-            except:
-                pass
+class EnhancedBuzzerManager(BackgroundBuzzer):
+    """Phát âm báo trên luồng riêng - beep() trả về ngay, không chặn Tk thread (buzzer_player.py)"""
+    
+    def __init__(self, gpio_pin: int, max_queue: int = 4):
+        device = PWMOutputDevice(gpio_pin)
+        device.off()
+        super().__init__(device, max_queue=max_queue)
 
 # ==== ENHANCED NUMPAD WITH FULL KEYBOARD NAVIGATION ====
 class EnhancedNumpadDialog:
@@ -483,8 +477,13 @@ class AdminDataManager:
         try:
             if data is None:
                 data = self.data
-            with open(self.config.ADMIN_DATA_FILE, 'w') as f:
+            # Ghi file tạm rồi thay thế - mất điện không để lại file JSON dở dang
+            tmp_path = self.config.ADMIN_DATA_FILE + ".tmp"
+            with open(tmp_path, 'w') as f:
                 json.dump(data, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.config.ADMIN_DATA_FILE)
             return True
         except:
             return False
@@ -526,38 +525,84 @@ class AdminDataManager:
             return self._save_data()
         return False
 
-# ==== FACE RECOGNITION (UNCHANGED) ====
+# ==== FACE RECOGNITION ====
 class FaceRecognition:
-    def __init__(self, encodings_file: str, tolerance: float = 0.3):
-        self.encodings_file = encodings_file
+    def __init__(self, encodings_file: str, tolerance: float = 0.3, compact_every: int = 50,
+                 backend: str = "hog", models_path: str = ".", threshold: Optional[float] = None):
+        backend = resolve_backend(backend)
+        # Encoding của bộ đặc trưng khác dlib nằm trong file riêng (encodings.<tên>.pickle)
+        self.encodings_file = gallery_path(encodings_file, backend)
         self.tolerance = tolerance
+        self.compact_every = compact_every
+        self.backend = create_backend(backend, models_path,
+                                      tolerance if threshold is None and backend.endswith("+dlib") else threshold)
+        self.store = None
         self.face_data = None
         self._load_encodings()
     
     def _load_encodings(self):
         try:
-            with open(self.encodings_file, "rb") as f:
-                self.face_data = pickle.load(f)
+            self.store = IncrementalFaceStore(self.encodings_file, compact_every=self.compact_every)
+            self._refresh()
         except Exception as e:
             logger.error(f"Lỗi load encodings: {e}")
             raise
     
+    def _refresh(self):
+        self.face_data = self.store.snapshot()
+        self.backend.set_gallery(self.face_data["encodings"], self.face_data["names"])
+    
+    def _encode_images(self, images) -> List["np.ndarray"]:
+        encodings = []
+        for image in images:
+            height, width = image.shape[:2]
+            # Ảnh đã cắt sẵn khuôn mặt thì dùng cả khung hình
+            boxes = self.backend.detect(image) or [(0, 0, width, height)]
+            found = self.backend.embed(image, boxes[:1])
+            if found:
+                encodings.append(found[0])
+        return encodings
+    
+    def add_person(self, person_name: str, captured_images) -> bool:
+        """Thêm người mới - chỉ ghi encoding của người đó vào file delta"""
+        try:
+            encodings = self._encode_images(captured_images)
+            if not encodings:
+                logger.warning(f"Không tạo được encoding cho {person_name}")
+                return False
+            self.store.add_person(person_name, encodings)
+            self._refresh()
+            logger.info(f"Đã thêm {len(encodings)} encoding cho {person_name}")
+            return True
+        except Exception as e:
+            logger.error(f"Lỗi thêm khuôn mặt: {e}")
+            return False
+    
+    def remove_person(self, person_name: str) -> bool:
+        """Xóa mọi encoding của một người"""
+        try:
+            removed = self.store.remove_person(person_name)
+            self._refresh()
+            if removed:
+                logger.info(f"Đã xóa {removed} encoding của {person_name}")
+            return removed > 0
+        except Exception as e:
+            logger.error(f"Lỗi xóa khuôn mặt: {e}")
+            return False
+    
     def recognize(self, frame):
         try:
-            small_frame = cv2.resize(frame, (0, 0), fx=0.5, fy=0.5)
-            rgb_small = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-            
-            face_locations = face_recognition.face_locations(rgb_small)
+            # Backend hog tự thu nhỏ frame 0.5 trước khi phát hiện
+            face_locations = self.backend.detect(frame)
             if len(face_locations) == 0:
                 return {"recognized": False, "message": "Không phát hiện khuôn mặt"}
             
-            face_encodings = face_recognition.face_encodings(rgb_small, face_locations)
+            face_encodings = self.backend.embed(frame, face_locations)
             
             for face_encoding in face_encodings:
-                matches = face_recognition.compare_faces(
-                    self.face_data["encodings"], face_encoding, tolerance=self.tolerance)
+                name, _ = self.backend.match(face_encoding)
                 
-                if True in matches:
+                if name is not None:
                     return {"recognized": True, "message": "Nhận diện thành công"}
             
             return {"recognized": False, "message": "Khuôn mặt không khớp"}
@@ -1144,10 +1189,18 @@ class LargeFontSecurityGUI:
 class SecuritySystem:
     def __init__(self):
         self.config = Config()
-        self._init_hardware()
+        
+        # cv2 / numpy / PIL / module của face backend nạp nền trong lúc relay và GUI khởi tạo
+        preload(["numpy", "cv2", "PIL.ImageTk"] + backend_modules(self.config.FACE_BACKEND))
+        
+        with timed("relay + buzzer"):
+            self._init_safety()
+        mark("relay locked")
         
         self.admin_data = AdminDataManager(self.config)
-        self.face_recognizer = FaceRecognition(self.config.ENCODINGS_FILE, self.config.FACE_TOLERANCE)
+        self.face_recognizer = None
+        self.hardware_thread = None
+        self.hardware_ready = False
         
         self.auth_state = {
             "step": AuthStep.FACE,
@@ -1162,39 +1215,73 @@ class SecuritySystem:
         self.gui = LargeFontSecurityGUI(self.root)
         self.gui.set_system_reference(self)
         self.admin_gui = ImprovedAdminGUI(self.root, self)
+        mark("lock screen ready")
         
         self.running = True
         self.face_thread = None
         
         logger.info("✅ Hệ thống khởi tạo thành công")
     
+    def _init_safety(self):
+        """Relay (khóa cửa) và buzzer - khởi tạo trước mọi thứ khác"""
+        self.relay = LED(self.config.RELAY_GPIO)
+        self.relay.on()  # Locked
+        self.buzzer = EnhancedBuzzerManager(self.config.BUZZER_GPIO)
+    
     def _init_hardware(self):
+        """Camera, RFID, vân tay và encodings - chạy trên luồng nền sau khi GUI đã hiện"""
         try:
-            self.buzzer = EnhancedBuzzerManager(self.config.BUZZER_GPIO)
+            with timed("face encodings"):
+                self.face_recognizer = FaceRecognition(self.config.ENCODINGS_FILE, self.config.FACE_TOLERANCE,
+                                                       self.config.FACE_COMPACT_EVERY, self.config.FACE_BACKEND,
+                                                       self.config.FACE_MODELS_PATH, self.config.FACE_BACKEND_THRESHOLD)
             
-            self.picam2 = Picamera2()
-            self.picam2.configure(self.picam2.create_video_configuration(
-                main={"format": 'XRGB8888', "size": (self.config.CAMERA_WIDTH, self.config.CAMERA_HEIGHT)}
-            ))
-            self.picam2.start()
-            time.sleep(2)
-            
-            self.relay = LED(self.config.RELAY_GPIO)
-            self.relay.on()  # Locked
-            
-            i2c = busio.I2C(board.SCL, board.SDA)
-            self.pn532 = PN532_I2C(i2c, debug=False)
-            self.pn532.SAM_configuration()
+            with timed("camera"):
+                self.picam2 = Picamera2()
+                self.picam2.configure(self.picam2.create_video_configuration(
+                    main={"format": 'XRGB8888', "size": (self.config.CAMERA_WIDTH, self.config.CAMERA_HEIGHT)}
+                ))
+                self.picam2.start()
+                time.sleep(2)
             
-            self.fingerprint = PyFingerprint('/dev/ttyUSB0', 57600, 0xFFFFFFFF, 0x00000000)
-            if not self.fingerprint.verifyPassword():
-                raise ValueError('Cảm biến vân tay không phản hồi')
+            with timed("rfid + fingerprint"):
+                i2c = busio.I2C(board.SCL, board.SDA)
+                self.pn532 = PN532_I2C(i2c, debug=False)
+                self.pn532.SAM_configuration()
+                
+                self.fingerprint = PyFingerprint('/dev/ttyUSB0', 57600, 0xFFFFFFFF, 0x00000000)
+                if not self.fingerprint.verifyPassword():
+                    raise ValueError('Cảm biến vân tay không phản hồi')
             
             logger.info("✅ Hardware khởi tạo thành công")
+            self.root.after(0, self._on_hardware_ready)
             
         except Exception as e:
             logger.error(f"❌ Lỗi khởi tạo hardware: {e}")
-            raise
+            self.root.after(0, lambda: self._on_hardware_failed(str(e)))
+    
+    def _on_hardware_ready(self):
+        self.hardware_ready = True
+        mark("authentication ready")
+        logger.info("⏱️ Thời gian khởi động:\n" + startup_report())
+        
+        self.gui.update_status("HỆ THỐNG KHỞI ĐỘNG THÀNH CÔNG!", 'lightgreen')
+        self.gui.update_detail("🎯 Hệ thống khóa bảo mật 4 lớp đã sẵn sàng. Bắt đầu quá trình xác thực...", Colors.SUCCESS)
+        
+        # Khởi động camera status
+        self.gui.update_camera_status("Camera sẵn sàng", Colors.SUCCESS)
+        
+        # Hiệu ứng khởi động
+        self.buzzer.beep("success")
+        
+        self.start_authentication()
+    
+    def _on_hardware_failed(self, error: str):
+        logger.info("⏱️ Thời gian khởi động:\n" + startup_report())
+        self.gui.update_status("LỖI KHỞI TẠO PHẦN CỨNG", 'orange')
+        self.gui.update_detail(f"❌ {error}\n🔧 Kiểm tra kết nối camera, RFID và cảm biến vân tay rồi khởi động lại.", Colors.ERROR)
+        self.gui.update_camera_status("Camera chưa sẵn sàng", Colors.ERROR)
+        self.buzzer.beep("error")
     
     def _force_admin_mode(self):
         """Chế độ admin nhanh bằng phím *"""
@@ -1213,6 +1300,10 @@ class SecuritySystem:
     
     def start_authentication(self):
         """Bắt đầu xác thực từ đầu"""
+        if not self.hardware_ready:
+            logger.info("⏳ Phần cứng chưa sẵn sàng - bỏ qua yêu cầu xác thực")
+            return
+        
         self.auth_state = {
             "step": AuthStep.FACE,
             "consecutive_face_ok": 0,
@@ -1529,16 +1620,13 @@ class SecuritySystem:
     def run(self):
         """Chạy hệ thống chính"""
         try:
-            self.gui.update_status("HỆ THỐNG KHỞI ĐỘNG THÀNH CÔNG!", 'lightgreen')
-            self.gui.update_detail("🎯 Hệ thống khóa bảo mật 4 lớp đã sẵn sàng. Bắt đầu quá trình xác thực...", Colors.SUCCESS)
+            self.gui.update_status("ĐANG KHỞI ĐỘNG PHẦN CỨNG...", 'white')
+            self.gui.update_detail("⏳ Camera, RFID, vân tay và dữ liệu khuôn mặt đang được khởi tạo...", Colors.PRIMARY)
+            self.gui.update_camera_status("Đang khởi động camera...", Colors.WARNING)
             
-            # Khởi động camera status
-            self.gui.update_camera_status("Camera sẵn sàng", Colors.SUCCESS)
-            
-            # Hiệu ứng khởi động
-            self.buzzer.beep("success")
-            
-            self.start_authentication()
+            # Lock screen đã hiện, phần cứng chậm khởi tạo nền
+            self.hardware_thread = threading.Thread(target=self._init_hardware, name="hardware-init", daemon=True)
+            self.hardware_thread.start()
             
             self.root.protocol("WM_DELETE_WINDOW", self.cleanup)
             self.root.mainloop()
@@ -1563,7 +1651,7 @@ class SecuritySystem:
                 logger.info("Cửa đã được khóa")
                 
             if hasattr(self, 'buzzer'):
-                self.buzzer.buzzer.off()
+                self.buzzer.close()
                 logger.info("Buzzer đã tắt")
                 
         except Exception as e:
@@ -1615,7 +1703,6 @@ if __name__ == "__main__":
         
         for icon, desc in hardware_list:
             print(f"   {icon} {desc}")
-            time.sleep(0.3)  # Loading effect
         
         print("=" * 70)
         print("🚀 Đang khởi tạo hệ thống...")
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+LỊCH SỬ RA VÀO CÓ CHỈ MỤC
+Sự kiện kiểm toán được lưu vào các file SQLite chia theo tháng
+(history/2025-01.sqlite), có chỉ mục theo danh tính / UID, loại + kết quả và
+cửa. Truy vấn chỉ mở các tháng nằm trong khoảng thời gian nên vẫn trả kết quả
+trong vài mili giây với dữ liệu cả năm.
+
+Ví dụ:
+    python3 access_history.py query history --door 3 --since 2025-01-16 --until 2025-01-17 --hours 02:00-04:00 --type unlock
+    python3 access_history.py query history --identity e5a8bd02 --type rfid --failed --since 2025-01-01
+    python3 access_history.py import history audit/audit.jsonl
+    python3 access_history.py bench
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from audit_log import AuditEvent, AuditEventType, format_event, read_events
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    ts REAL NOT NULL,
+    type TEXT NOT NULL,
+    ok INTEGER NOT NULL,
+    identity TEXT,
+    door TEXT,
+    session INTEGER,
+    detail TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_events_ts ON events (ts);
+CREATE INDEX IF NOT EXISTS idx_events_identity ON events (identity, ts);
+CREATE INDEX IF NOT EXISTS idx_events_type_ok ON events (type, ok, ts);
+CREATE INDEX IF NOT EXISTS idx_events_door ON events (door, ts);
+"""
+
+
+def partition_key(ts: float) -> str:
+    return time.strftime("%Y-%m", time.localtime(ts))
+
+
+def _month_range(since: float, until: float) -> List[str]:
+    """Các khóa tháng từ since đến until (bao gồm hai đầu)"""
+    start, end = datetime.fromtimestamp(since), datetime.fromtimestamp(until)
+    year, month = start.year, start.month
+    keys = []
+    while (year, month) <= (end.year, end.month):
+        keys.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return keys
+
+
+class AccessHistory:
+    """Kho lịch sử ra vào chia theo tháng (ghi từ một luồng, đọc từ mọi luồng)"""
+    
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._writers: Dict[str, sqlite3.Connection] = {}
+        self._lock = threading.Lock()
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.sqlite")
+    
+    def partitions(self) -> List[str]:
+        return sorted(name[:-7] for name in os.listdir(self.root) if name.endswith(".sqlite"))
+    
+    # ---- Write ----
+    def _writer(self, key: str) -> sqlite3.Connection:
+        conn = self._writers.get(key)
+        if conn is None:
+            conn = sqlite3.connect(self._path(key), check_same_thread=False)
+            # WAL: đọc không chặn ghi, commit không fsync toàn bộ file trên thẻ nhớ
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._writers[key] = conn
+        return conn
+    
+    @staticmethod
+    def _row(event: AuditEvent) -> Tuple:
+        detail = json.dumps(event.detail, ensure_ascii=False, separators=(",", ":"), default=str) if event.detail else None
+        return (event.ts, event.type.value, int(event.ok), event.identity, event.door, event.session, detail)
+    
+    def add(self, event: AuditEvent):
+        self.add_many([event])
+    
+    def add_many(self, events: Iterable[AuditEvent]) -> int:
+        """Ghi theo lô - một transaction cho mỗi tháng"""
+        by_month: Dict[str, List[Tuple]] = {}
+        for event in events:
+            by_month.setdefault(partition_key(event.ts), []).append(self._row(event))
+        with self._lock:
+            for key, rows in by_month.items():
+                conn = self._writer(key)
+                with conn:
+                    conn.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        return sum(len(rows) for rows in by_month.values())
+    
+    def close(self):
+        with self._lock:
+            for conn in self._writers.values():
+                conn.close()
+            self._writers.clear()
+    
+    # ---- Query ----
+    def query(self, since: Optional[float] = None, until: Optional[float] = None,
+              types: Optional[Iterable[AuditEventType]] = None, identity: Optional[str] = None,
+              ok: Optional[bool] = None, door: Optional[str] = None,
+              hours: Optional[Tuple[str, str]] = None, limit: Optional[int] = None) -> List[AuditEvent]:
+        """Sự kiện khớp mọi điều kiện, theo thứ tự thời gian. hours=("02:00", "04:00") lọc giờ trong ngày"""
+        keys = self.partitions()
+        if not keys:
+            return []
+        if since is not None or until is not None:
+            wanted = set(_month_range(since if since is not None else 0,
+                                      until if until is not None else time.time()))
+            keys = [key for key in keys if key in wanted]
+        
+        clauses, params = [], []
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts <= ?")
+            params.append(until)
+        if types:
+            types = list(types)
+            clauses.append(f"type IN ({', '.join('?' for _ in types)})")
+            params.extend(t.value for t in types)
+        if identity is not None:
+            clauses.append("identity = ?")
+            params.append(identity)
+        if ok is not None:
+            clauses.append("ok = ?")
+            params.append(int(ok))
+        if door is not None:
+            clauses.append("door = ?")
+            params.append(door)
+        if hours is not None:
+            # Khoảng qua nửa đêm (22:00-02:00) được hỗ trợ
+            start, end = (int(h.replace(":", "")) for h in hours)
+            op = "AND" if start <= end else "OR"
+            clauses.append(f"(CAST(strftime('%H%M', ts, 'unixepoch', 'localtime') AS INTEGER) >= ? {op} "
+                           f"CAST(strftime('%H%M', ts, 'unixepoch', 'localtime') AS INTEGER) < ?)")
+            params.extend([start, end])
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        
+        results: List[AuditEvent] = []
+        for key in keys:
+            remaining = None if limit is None else limit - len(results)
+            if remaining is not None and remaining <= 0:
+                break
+            sql = f"SELECT ts, type, ok, identity, door, session, detail FROM events {where} ORDER BY ts"
+            if remaining is not None:
+                sql += f" LIMIT {int(remaining)}"
+            conn = sqlite3.connect(f"file:{self._path(key)}?mode=ro", uri=True)
+            try:
+                rows = conn.execute(sql, params).fetchall()
+            finally:
+                conn.close()
+            for ts, type_, ok_, ident, door_, session, detail in rows:
+                results.append(AuditEvent(AuditEventType(type_), bool(ok_), ident,
+                                          json.loads(detail) if detail else {}, ts, session, door_))
+        return results
+    
+    def import_audit_log(self, path: str, batch_size: int = 5000) -> int:
+        """Nạp lại từ file audit JSON lines (vd. khi tạo kho lần đầu)"""
+        total, batch = 0, []
+        for event in read_events(path):
+            batch.append(event)
+            if len(batch) >= batch_size:
+                total += self.add_many(batch)
+                batch = []
+        return total + self.add_many(batch)
+
+
+class AccessHistoryHandler(logging.Handler):
+    """Handler cho QueueListener của AuditLogger - ghi sự kiện vào kho trên luồng nền"""
+    
+    def __init__(self, history: AccessHistory):
+        super().__init__()
+        self.history = history
+    
+    def emit(self, record: logging.LogRecord):
+        event = getattr(record, "audit_event", None)
+        if event is None:
+            return
+        try:
+            self.history.add(event)
+        except Exception:
+            self.handleError(record)
+
+
+def benchmark(days: int = 365, events_per_day: int = 1500) -> Dict[str, float]:
+    """Tạo dữ liệu một năm và đo thời gian các truy vấn điển hình"""
+    import random
+    import tempfile
+    
+    rng = random.Random(0)
+    uids = [f"{rng.getrandbits(32):08x}" for _ in range(300)]
+    doors = [str(d) for d in range(1, 6)]
+    types = [AuditEventType.FACE, AuditEventType.FINGERPRINT, AuditEventType.RFID,
+             AuditEventType.PASSCODE, AuditEventType.UNLOCK]
+    end = time.time()
+    start = end - days * 86400
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        history = AccessHistory(tmp)
+        started = time.perf_counter()
+        for day in range(days):
+            batch = [AuditEvent(rng.choice(types), rng.random() > 0.1, rng.choice(uids), {},
+                                start + day * 86400 + rng.random() * 86400, day, rng.choice(doors))
+                     for _ in range(events_per_day)]
+            history.add_many(batch)
+        insert = time.perf_counter() - started
+        history.close()
+        
+        def timed_query(**kwargs) -> Tuple[float, int]:
+            t = time.perf_counter()
+            count = len(history.query(**kwargs))
+            return (time.perf_counter() - t) * 1000, count
+        
+        night = end - 30 * 86400
+        door_ms, door_count = timed_query(since=night, until=night + 86400, door="3",
+                                          types=[AuditEventType.UNLOCK], hours=("02:00", "04:00"))
+        uid_ms, uid_count = timed_query(since=end - 30 * 86400, identity=uids[0],
+                                        types=[AuditEventType.RFID], ok=False)
+        year_ms, year_count = timed_query(identity=uids[1])
+    
+    return {"events": days * events_per_day, "insert_s": insert,
+            "door_night_ms": door_ms, "door_night_rows": door_count,
+            "uid_failed_month_ms": uid_ms, "uid_failed_month_rows": uid_count,
+            "identity_year_ms": year_ms, "identity_year_rows": year_count}
+
+
+def _parse_time(value: str) -> float:
+    return datetime.fromisoformat(value).timestamp()
+
+
+def _parse_hours(value: str) -> Tuple[str, str]:
+    start, end = value.split("-")
+    return start.strip(), end.strip()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Lịch sử ra vào có chỉ mục")
+    sub = parser.add_subparsers(dest="command", required=True)
+    
+    q = sub.add_parser("query", help="Tra cứu sự kiện")
+    q.add_argument("root", help="Thư mục lịch sử")
+    q.add_argument("--since", type=_parse_time, help="Từ thời điểm (ISO, vd. 2025-01-16T02:00)")
+    q.add_argument("--until", type=_parse_time, help="Đến thời điểm (ISO)")
+    q.add_argument("--hours", type=_parse_hours, help="Giờ trong ngày, vd. 02:00-04:00")
+    q.add_argument("--type", action="append", choices=[t.value for t in AuditEventType], help="Loại sự kiện")
+    q.add_argument("--identity", help="Tên / template ID / UID thẻ (hex)")
+    q.add_argument("--door", help="Mã cửa")
+    result = q.add_mutually_exclusive_group()
+    result.add_argument("--failed", action="store_true", help="Chỉ sự kiện thất bại")
+    result.add_argument("--ok", action="store_true", help="Chỉ sự kiện thành công")
+    q.add_argument("--limit", type=int, help="Số bản ghi tối đa")
+    q.add_argument("--json", action="store_true", help="In JSON lines thay vì bảng")
+    
+    imp = sub.add_parser("import", help="Nạp từ file audit JSON lines")
+    imp.add_argument("root", help="Thư mục lịch sử")
+    imp.add_argument("audit_path", help="File audit (vd. audit.jsonl)")
+    
+    sub.add_parser("bench", help="Đo tốc độ truy vấn với dữ liệu một năm")
+    args = parser.parse_args(argv)
+    
+    if args.command == "bench":
+        print("📊 Access history benchmark:")
+        for key, value in benchmark().items():
+            print(f"   {key}: {value:.2f}" if isinstance(value, float) else f"   {key}: {value}")
+        return 0
+    
+    history = AccessHistory(args.root)
+    if args.command == "import":
+        count = history.import_audit_log(args.audit_path)
+        history.close()
+        print(f"✅ Đã nạp {count} sự kiện vào {args.root}")
+        return 0
+    
+    started = time.perf_counter()
+    types = [AuditEventType(t) for t in args.type] if args.type else None
+    ok = False if args.failed else True if args.ok else None
+    events = history.query(args.since, args.until, types, args.identity, ok, args.door, args.hours, args.limit)
+    for event in events:
+        if args.json:
+            print(event.to_json())
+        else:
+            print(format_event(event))
+    print(f"📊 {len(events)} sự kiện ({(time.perf_counter() - started) * 1000:.1f} ms)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main())
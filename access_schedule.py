@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""
+LỊCH RA VÀO THEO KHUNG GIỜ
+Quy tắc theo người dùng / nhóm (ca làm theo thứ, ngày lễ, khung giờ tạm cho
+nhà thầu) được biên dịch thành bitmap theo phút cho tuần hiện tại: mỗi người
+một số nguyên 7 x 1440 bit. Kiểm tra ở cửa chỉ là một phép dịch bit - O(1)
+dù có hàng nghìn người và nhiều quy tắc. Sửa quy tắc / nhóm chỉ biên dịch lại
+quy tắc đó và những người bị ảnh hưởng.
+
+    python3 access_schedule.py add-rule schedules.json ca-sang --subject group:staff --days 0-4 --start 07:00 --end 17:30
+    python3 access_schedule.py group schedules.json staff khoi lan
+    python3 access_schedule.py check schedules.json khoi --at "2026-10-19 08:15"
+    python3 access_schedule.py bench
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, field, replace
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+MINUTES_PER_DAY = 24 * 60
+WEEK_MINUTES = 7 * MINUTES_PER_DAY
+ALL_WEEK = (1 << WEEK_MINUTES) - 1
+EVERYONE = "*"
+GROUP_PREFIX = "group:"
+
+
+@dataclass
+class ScheduleRule:
+    rule_id: str
+    subjects: List[str]  # user_id, "group:<tên>" hoặc "*"
+    weekdays: List[int] = field(default_factory=lambda: list(range(7)))  # 0 = thứ Hai
+    start: str = "00:00"
+    end: str = "24:00"  # end <= start: khung giờ qua nửa đêm (ca đêm)
+    valid_from: Optional[str] = None  # "YYYY-MM-DD" - khung tạm cho nhà thầu
+    valid_until: Optional[str] = None
+    holidays: bool = False  # Quy tắc cho phép có áp dụng cả ngày lễ không
+    deny: bool = False  # Quy tắc cấm luôn thắng quy tắc cho phép
+
+
+def _minutes(hhmm: str) -> int:
+    hours, minutes = hhmm.split(":")
+    value = int(hours) * 60 + int(minutes)
+    if not 0 <= value <= MINUTES_PER_DAY:
+        raise ValueError(f"Giờ không hợp lệ: {hhmm}")
+    return value
+
+
+def _week_monday(now: float) -> date:
+    today = date.fromtimestamp(now)
+    return today - timedelta(days=today.weekday())
+
+
+class AccessSchedule:
+    """Quy tắc + bitmap theo phút của tuần hiện tại cho từng người, lưu JSON, thread-safe"""
+    
+    def __init__(self, path: Optional[str] = None, default_allow: bool = True):
+        self.path = path
+        self.default_allow = default_allow  # Người không có quy tắc cho phép nào
+        self.compiled_users = 0  # Số lần dựng bitmap người dùng (đo biên dịch tăng dần)
+        
+        self._rules: Dict[str, ScheduleRule] = {}
+        self._groups: Dict[str, Set[str]] = {}
+        self._holidays: Set[date] = set()
+        self._subject_rules: Dict[str, Set[str]] = {}  # subject -> rule_id
+        self._user_groups: Dict[str, Set[str]] = {}
+        
+        self._rule_masks: Dict[str, int] = {}
+        self._masks: Dict[str, int] = {}
+        self._fallback = ALL_WEEK if default_allow else 0
+        self._monday = _week_monday(time.time())
+        self._week_start = self._week_end = 0.0
+        self._mtime: Optional[float] = None
+        self._lock = threading.RLock()
+        
+        if path is not None:
+            self.load()
+        else:
+            self.compile()
+    
+    # ---- Lookup (O(1)) ----
+    def __len__(self) -> int:
+        return len(self._rules)
+    
+    def allowed(self, user_id: Optional[str], now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        if not self._week_start <= now < self._week_end:
+            self.compile(now)  # Sang tuần mới
+        local = time.localtime(now)
+        minute = local.tm_wday * MINUTES_PER_DAY + local.tm_hour * 60 + local.tm_min
+        return bool(self._masks.get(user_id, self._fallback) >> minute & 1)
+    
+    def windows(self, user_id: Optional[str]) -> List[str]:
+        """Các khung giờ được phép trong tuần hiện tại ("Mon 07:00-17:30", ...)"""
+        def label(minute: int) -> str:
+            day = self._monday + timedelta(days=minute // MINUTES_PER_DAY)
+            return f"{day:%a %d/%m} {minute % MINUTES_PER_DAY // 60:02d}:{minute % 60:02d}"
+        
+        mask = self._masks.get(user_id, self._fallback)
+        result, minute = [], 0
+        while minute < WEEK_MINUTES:
+            if not mask >> minute & 1:
+                minute += 1
+                continue
+            end = minute
+            while end < WEEK_MINUTES and mask >> end & 1:
+                end += 1
+            result.append(f"{label(minute)} -> {label(end)}")
+            minute = end
+        return result
+    
+    # ---- Compile ----
+    def compile(self, now: Optional[float] = None):
+        """Biên dịch toàn bộ cho tuần chứa thời điểm now"""
+        now = time.time() if now is None else now
+        with self._lock:
+            self._monday = _week_monday(now)
+            self._rule_masks = {rule_id: self._compile_rule(rule) for rule_id, rule in self._rules.items()}
+            self._recompute(None)
+            self._week_start = time.mktime(self._monday.timetuple())
+            self._week_end = time.mktime((self._monday + timedelta(days=7)).timetuple())
+        logger.debug(f"🗓️ Lịch tuần {self._monday}: {len(self._rules)} quy tắc, {len(self._masks)} người")
+    
+    def _compile_rule(self, rule: ScheduleRule) -> int:
+        start, end = _minutes(rule.start), _minutes(rule.end)
+        if end <= start:
+            end += MINUTES_PER_DAY
+        valid_from = date.fromisoformat(rule.valid_from) if rule.valid_from else date.min
+        valid_until = date.fromisoformat(rule.valid_until) if rule.valid_until else date.max
+        weekdays = set(rule.weekdays)
+        mask = 0
+        # Từ Chủ nhật tuần trước - ca đêm qua nửa đêm tràn sang sáng thứ Hai
+        for offset in range(-1, 7):
+            day = self._monday + timedelta(days=offset)
+            if day.weekday() not in weekdays or not valid_from <= day <= valid_until:
+                continue
+            if day in self._holidays and not rule.holidays and not rule.deny:
+                continue
+            low = max(offset * MINUTES_PER_DAY + start, 0)
+            high = min(offset * MINUTES_PER_DAY + end, WEEK_MINUTES)
+            if high > low:
+                mask |= ((1 << (high - low)) - 1) << low
+        return mask
+    
+    def _user_mask(self, rule_ids: Iterable[str]) -> int:
+        allow = deny = 0
+        covered = False
+        for rule_id in rule_ids:
+            if self._rules[rule_id].deny:
+                deny |= self._rule_masks[rule_id]
+            else:
+                allow |= self._rule_masks[rule_id]
+                covered = True
+        if not covered:
+            allow = ALL_WEEK if self.default_allow else 0
+        return allow & ~deny
+    
+    def _rules_for(self, user_id: str) -> Set[str]:
+        rule_ids = set(self._subject_rules.get(user_id, ()))
+        for group in self._user_groups.get(user_id, ()):
+            rule_ids |= self._subject_rules.get(GROUP_PREFIX + group, set())
+        return rule_ids | self._subject_rules.get(EVERYONE, set())
+    
+    def _recompute(self, users: Optional[Set[str]]):
+        """Dựng lại bitmap cho các người dùng đã cho (None = tất cả)"""
+        everyone = self._subject_rules.get(EVERYONE, set())
+        self._fallback = self._user_mask(everyone)
+        if users is None:
+            users = {subject for subject in self._subject_rules
+                     if subject != EVERYONE and not subject.startswith(GROUP_PREFIX)}
+            users |= set(self._user_groups)
+            masks = {}
+        else:
+            masks = dict(self._masks)
+        for user_id in users:
+            rule_ids = self._rules_for(user_id)
+            if rule_ids == everyone:
+                masks.pop(user_id, None)  # Giống người không tên trong lịch
+            else:
+                masks[user_id] = self._user_mask(rule_ids)
+        self.compiled_users += len(users)
+        self._masks = masks  # Thay một lần - luồng tra cứu không thấy bitmap dở dang
+    
+    def _members(self, subjects: Iterable[str]) -> Optional[Set[str]]:
+        """Người dùng bị ảnh hưởng bởi các subject (None = mọi người)"""
+        users: Set[str] = set()
+        for subject in subjects:
+            if subject == EVERYONE:
+                return None
+            if subject.startswith(GROUP_PREFIX):
+                users |= self._groups.get(subject[len(GROUP_PREFIX):], set())
+            else:
+                users.add(subject)
+        return users
+    
+    # ---- Incremental updates ----
+    def _set_rule(self, rule: ScheduleRule):
+        previous = self._rules.get(rule.rule_id)
+        self._rule_masks[rule.rule_id] = self._compile_rule(rule)  # Lỗi định dạng -> chưa thay gì
+        self._unlink(previous)
+        self._rules[rule.rule_id] = rule
+        for subject in rule.subjects:
+            self._subject_rules.setdefault(subject, set()).add(rule.rule_id)
+        self._recompute(self._members(rule.subjects + (previous.subjects if previous else [])))
+    
+    def _remove_rule(self, rule_id: str) -> bool:
+        rule = self._rules.pop(rule_id, None)
+        if rule is None:
+            return False
+        self._unlink(rule)
+        self._rule_masks.pop(rule_id, None)
+        self._recompute(self._members(rule.subjects))
+        return True
+    
+    def _unlink(self, rule: Optional[ScheduleRule]):
+        if rule is None:
+            return
+        for subject in rule.subjects:
+            rule_ids = self._subject_rules.get(subject)
+            if rule_ids is not None:
+                rule_ids.discard(rule.rule_id)
+                if not rule_ids:
+                    del self._subject_rules[subject]
+    
+    def _set_group(self, name: str, members: Iterable[str]):
+        members = set(members)
+        previous = self._groups.get(name, set())
+        for user_id in previous - members:
+            self._user_groups[user_id].discard(name)
+            if not self._user_groups[user_id]:
+                del self._user_groups[user_id]
+        for user_id in members - previous:
+            self._user_groups.setdefault(user_id, set()).add(name)
+        if members:
+            self._groups[name] = members
+        else:
+            self._groups.pop(name, None)
+        self._recompute(previous ^ members)
+    
+    def set_rule(self, rule: ScheduleRule):
+        with self._lock:
+            self._set_rule(rule)
+            self.save()
+    
+    def remove_rule(self, rule_id: str) -> bool:
+        with self._lock:
+            removed = self._remove_rule(rule_id)
+            if removed:
+                self.save()
+            return removed
+    
+    def set_group(self, name: str, members: Iterable[str]):
+        with self._lock:
+            self._set_group(name, members)
+            self.save()
+    
+    def set_holidays(self, days: Iterable[str]):
+        """Ngày lễ đổi bitmap của mọi quy tắc trong tuần - biên dịch lại toàn bộ"""
+        with self._lock:
+            self._holidays = {date.fromisoformat(day) for day in days}
+            self.compile()
+            self.save()
+    
+    def _reset(self, rules: Dict[str, ScheduleRule], groups: Dict[str, Set[str]], holidays: Set[date]):
+        """Thay toàn bộ quy tắc / nhóm / ngày lễ và biên dịch lại từ đầu"""
+        self._rules, self._groups, self._holidays = rules, groups, holidays
+        self._subject_rules, self._user_groups = {}, {}
+        for rule in rules.values():
+            for subject in rule.subjects:
+                self._subject_rules.setdefault(subject, set()).add(rule.rule_id)
+        for name, members in groups.items():
+            for user_id in members:
+                self._user_groups.setdefault(user_id, set()).add(name)
+        self.compile()
+    
+    # ---- Persistence ----
+    def load(self):
+        """Đọc file; lần đầu biên dịch toàn bộ, các lần sau chỉ áp dụng phần thay đổi"""
+        with self._lock:
+            data = {}
+            if self.path and os.path.exists(self.path):
+                self._mtime = os.path.getmtime(self.path)
+                with open(self.path, encoding="utf-8") as f:
+                    data = json.load(f)
+            rules = {record["rule_id"]: ScheduleRule(**record) for record in data.get("rules", [])}
+            groups = {name: set(members) for name, members in data.get("groups", {}).items()}
+            holidays = {date.fromisoformat(day) for day in data.get("holidays", [])}
+            
+            if self._week_end == 0.0 or holidays != self._holidays:
+                self._reset(rules, groups, holidays)
+            else:
+                for name in set(self._groups) | set(groups):
+                    if self._groups.get(name, set()) != groups.get(name, set()):
+                        self._set_group(name, groups.get(name, set()))
+                for rule_id in set(self._rules) - set(rules):
+                    self._remove_rule(rule_id)
+                for rule_id, rule in rules.items():
+                    if self._rules.get(rule_id) != rule:
+                        self._set_rule(rule)
+        logger.info(f"🗓️ {len(self._rules)} quy tắc lịch ra vào, {len(self._groups)} nhóm ({self.path})")
+    
+    def refresh(self) -> bool:
+        """Nạp lại nếu file đã đổi (một lần stat)"""
+        if not self.path:
+            return False
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return False
+        if mtime == self._mtime:
+            return False
+        self.load()
+        return True
+    
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            data = {"holidays": sorted(day.isoformat() for day in self._holidays),
+                    "groups": {name: sorted(members) for name, members in sorted(self._groups.items())},
+                    "rules": [asdict(rule) for rule in self._rules.values()]}
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self._mtime = os.path.getmtime(self.path)
+
+
+def benchmark(users: int = 5000, groups: int = 50, rules: int = 400, lookups: int = 200_000) -> Dict[str, float]:
+    """Biên dịch toàn bộ, sửa một quy tắc nhóm và tra cứu với dữ liệu giả"""
+    member_sets = {f"g{index}": {f"u{user}" for user in range(index, users, groups)} for index in range(groups)}
+    rule_set = {}
+    for index in range(rules):
+        subject = f"{GROUP_PREFIX}g{index % groups}" if index % 4 else f"u{index * 7 % users}"
+        rule_set[f"r{index}"] = ScheduleRule(
+            f"r{index}", [subject], weekdays=[index % 7, (index + 1) % 7, (index + 3) % 7],
+            start=f"{index % 10 + 6:02d}:{index % 4 * 15:02d}", end=f"{(index % 10 + 15) % 24:02d}:00",
+            deny=index % 17 == 0)
+    holidays = {_week_monday(time.time()) + timedelta(days=2)}
+    
+    schedule = AccessSchedule(default_allow=False)
+    started = time.perf_counter()
+    schedule._reset(rule_set, member_sets, holidays)
+    full = time.perf_counter() - started
+    
+    schedule.compiled_users = 0
+    started = time.perf_counter()
+    schedule._set_rule(replace(rule_set["r1"], end="19:00"))
+    incremental = time.perf_counter() - started
+    touched = schedule.compiled_users
+    
+    now = time.time()
+    started = time.perf_counter()
+    granted = sum(schedule.allowed(f"u{index % users}", now + index % 600) for index in range(lookups))
+    lookup = time.perf_counter() - started
+    return {"users": users, "rules": rules, "full_compile_ms": full * 1000,
+            "rule_update_ms": incremental * 1000, "users_recompiled": touched,
+            "lookup_us": lookup / lookups * 1e6, "granted_ratio": granted / lookups}
+
+
+def _days(text: str) -> List[int]:
+    """"0-4" / "5,6" -> [0, 1, 2, 3, 4] / [5, 6]"""
+    days: List[int] = []
+    for part in text.split(","):
+        low, _, high = part.partition("-")
+        days.extend(range(int(low), int(high or low) + 1))
+    return days
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Lịch ra vào theo khung giờ")
+    sub = parser.add_subparsers(dest="command", required=True)
+    
+    p = sub.add_parser("add-rule", help="Thêm / thay quy tắc")
+    p.add_argument("path")
+    p.add_argument("rule_id")
+    p.add_argument("--subject", action="append", required=True, help="user_id, group:<tên> hoặc *")
+    p.add_argument("--days", default="0-6", help="0 = thứ Hai, vd. 0-4 hoặc 5,6")
+    p.add_argument("--start", default="00:00")
+    p.add_argument("--end", default="24:00")
+    p.add_argument("--from", dest="valid_from")
+    p.add_argument("--until", dest="valid_until")
+    p.add_argument("--holidays", action="store_true", help="Áp dụng cả ngày lễ")
+    p.add_argument("--deny", action="store_true", help="Quy tắc cấm")
+    p = sub.add_parser("remove-rule", help="Xóa quy tắc")
+    p.add_argument("path")
+    p.add_argument("rule_id")
+    p = sub.add_parser("group", help="Đặt thành viên nhóm (không có thành viên = xóa nhóm)")
+    p.add_argument("path")
+    p.add_argument("name")
+    p.add_argument("members", nargs="*")
+    p = sub.add_parser("holidays", help="Đặt danh sách ngày lễ (YYYY-MM-DD)")
+    p.add_argument("path")
+    p.add_argument("days", nargs="*")
+    p = sub.add_parser("check", help="Kiểm tra quyền ra vào và khung giờ tuần này")
+    p.add_argument("path")
+    p.add_argument("user_id")
+    p.add_argument("--at", help="YYYY-MM-DD HH:MM (mặc định: bây giờ)")
+    p.add_argument("--deny-unlisted", action="store_true", help="Người không có quy tắc bị từ chối")
+    sub.add_parser("bench", help="Đo biên dịch và tra cứu")
+    args = parser.parse_args(argv)
+    
+    if args.command == "bench":
+        print("📊 Access schedule benchmark:")
+        for key, value in benchmark().items():
+            print(f"   {key}: {value:.3f}" if isinstance(value, float) else f"   {key}: {value}")
+        return 0
+    
+    schedule = AccessSchedule(args.path, default_allow=not getattr(args, "deny_unlisted", False))
+    try:
+        if args.command == "add-rule":
+            schedule.set_rule(ScheduleRule(args.rule_id, args.subject, _days(args.days), args.start, args.end,
+                                           args.valid_from, args.valid_until, args.holidays, args.deny))
+        elif args.command == "remove-rule":
+            if not schedule.remove_rule(args.rule_id):
+                raise KeyError(args.rule_id)
+        elif args.command == "group":
+            schedule.set_group(args.name, args.members)
+        elif args.command == "holidays":
+            schedule.set_holidays(args.days)
+        elif args.command == "check":
+            now = datetime.strptime(args.at, "%Y-%m-%d %H:%M").timestamp() if args.at else time.time()
+            print(f"{'✅' if schedule.allowed(args.user_id, now) else '⛔'} {args.user_id}")
+            for window in schedule.windows(args.user_id):
+                print(f"   {window}")
+    except (KeyError, ValueError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main())
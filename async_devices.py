@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+LỚP THIẾT BỊ BẤT ĐỒNG BỘ (asyncio) - Camera, Vân tay, RFID
+Một event loop duy nhất chạy nền, mỗi thiết bị có một executor riêng 1 luồng
+để driver blocking không bị gọi song song. Các bước xác thực là coroutine
+nên có thể hủy ngay lập tức khi reset thay vì chờ hết timeout 8-10s.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDeviceLayer:
+    """Bọc các driver blocking (Picamera2, PyFingerprint, PN532) thành awaitable"""
+    
+    DEVICES = ("camera", "fingerprint", "rfid", "compute")
+    
+    def __init__(self, picam2=None, fingerprint=None, pn532=None,
+                 poll_interval: float = 0.1, rfid_poll_timeout: float = 0.2):
+        self.picam2 = picam2
+        self.fingerprint = fingerprint
+        self.pn532 = pn532
+        self.poll_interval = poll_interval
+        self.rfid_poll_timeout = rfid_poll_timeout
+        
+        # Mỗi thiết bị một luồng cố định - không tạo thread mới cho mỗi bước
+        self._executors: Dict[str, ThreadPoolExecutor] = {
+            name: ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"dev-{name}")
+            for name in self.DEVICES
+        }
+        self._tasks: set = set()
+        self._tasks_lock = threading.Lock()
+        
+        self.loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run_loop, name="device-loop", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+    
+    def _run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self._ready.set)
+        self.loop.run_forever()
+    
+    # ---- Executor helpers ----
+    async def call(self, device: str, func: Callable, *args) -> Any:
+        """Chạy hàm blocking trên executor của thiết bị"""
+        return await self.loop.run_in_executor(self._executors[device], func, *args)
+    
+    async def compute(self, func: Callable, *args) -> Any:
+        """Chạy tác vụ CPU (AI inference) ngoài event loop"""
+        return await self.call("compute", func, *args)
+    
+    def call_sync(self, device: str, func: Callable, *args, timeout: Optional[float] = None) -> Any:
+        """Gọi blocking từ luồng khác (vd. kiểm tra sức khỏe) mà vẫn tuần tự với các bước đang chạy"""
+        return self._executors[device].submit(func, *args).result(timeout=timeout)
+    
+    # ---- Awaitable device API ----
+    async def next_frame(self):
+        """Lấy frame tiếp theo từ camera"""
+        if self.picam2 is None:
+            raise RuntimeError("Camera chưa được khởi tạo")
+        return await self.call("camera", self.picam2.capture_array)
+    
+    async def wait_for_finger(self, timeout: float = 10.0) -> bool:
+        """Chờ ngón tay đặt lên cảm biến, trả về False nếu hết thời gian"""
+        if self.fingerprint is None:
+            raise RuntimeError("Cảm biến vân tay chưa được khởi tạo")
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if await self.call("fingerprint", self.fingerprint.readImage):
+                return True
+            await asyncio.sleep(self.poll_interval)
+        return False
+    
+    async def search_finger(self) -> Tuple[int, int]:
+        """Chuyển ảnh vân tay vừa đọc thành template và tìm 1:N"""
+        def _search():
+            self.fingerprint.convertImage(0x01)
+            return self.fingerprint.searchTemplate()
+        return await self.call("fingerprint", _search)
+    
+    async def verify_finger(self, template_ids: List[int]) -> Tuple[int, int]:
+        """So khớp 1:1 ảnh vừa đọc với các template của một người (không quét cả thư viện)"""
+        def _verify():
+            self.fingerprint.convertImage(0x01)
+            for template_id in template_ids:
+                # Nạp template vào bộ đệm 2 rồi so với đặc trưng ở bộ đệm 1
+                self.fingerprint.loadTemplate(template_id, 0x02)
+                score = self.fingerprint.compareCharacteristics()
+                if score > 0:
+                    return template_id, score
+            return -1, 0
+        return await self.call("fingerprint", _verify)
+    
+    async def match_finger(self, template_ids: Optional[List[int]] = None) -> Tuple[int, int]:
+        """1:1 khi đã biết template của người dùng, ngược lại tìm 1:N"""
+        started = time.perf_counter()
+        if template_ids:
+            result = await self.verify_finger(template_ids)
+        else:
+            result = await self.search_finger()
+        logger.debug(f"👆 {'1:1' if template_ids else '1:N'} match {result} "
+                     f"({(time.perf_counter() - started) * 1000:.0f} ms)")
+        return result
+    
+    async def wait_for_card(self, timeout: float = 8.0) -> Optional[List[int]]:
+        """Chờ thẻ RFID, poll từng lát ngắn để có thể hủy ngay"""
+        if self.pn532 is None:
+            raise RuntimeError("Đầu đọc RFID chưa được khởi tạo")
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            slice_timeout = min(self.rfid_poll_timeout, max(deadline - time.monotonic(), 0.01))
+            uid = await self.call("rfid", lambda: self.pn532.read_passive_target(timeout=slice_timeout))
+            if uid:
+                return list(uid)
+        return None
+    
+    # ---- Task management (thread-safe) ----
+    def submit(self, coro: Coroutine) -> Future:
+        """Lên lịch coroutine từ bất kỳ luồng nào (Tk, worker)"""
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        with self._tasks_lock:
+            self._tasks.add(future)
+        future.add_done_callback(self._on_task_done)
+        return future
+    
+    def _on_task_done(self, future: Future):
+        with self._tasks_lock:
+            self._tasks.discard(future)
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(f"❌ Device task lỗi: {future.exception()}")
+    
+    def cancel_all(self):
+        """Hủy mọi bước đang chờ thiết bị (dùng khi reset/admin)"""
+        with self._tasks_lock:
+            pending = list(self._tasks)
+        for future in pending:
+            future.cancel()
+        if pending:
+            logger.info(f"🛑 Đã hủy {len(pending)} device task")
+    
+    @property
+    def pending_count(self) -> int:
+        with self._tasks_lock:
+            return len(self._tasks)
+    
+    async def _shutdown(self):
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    def close(self):
+        """Dừng event loop và giải phóng executor"""
+        self.cancel_all()
+        if self.loop.is_running():
+            try:
+                asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result(timeout=2)
+            except Exception as e:
+                logger.warning(f"⚠️ Device loop shutdown: {e}")
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=2)
+        for executor in self._executors.values():
+            executor.shutdown(wait=False, cancel_futures=True)
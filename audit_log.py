@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+NHẬT KÝ KIỂM TOÁN CÓ CẤU TRÚC (AUDIT LOG)
+Sự kiện truy cập (khuôn mặt, vân tay, RFID, passcode, mở cửa, admin) được ghi
+thành bản ghi JSON lines gọn qua QueueHandler/QueueListener - luồng Tk và
+luồng thiết bị không bao giờ chờ I/O thẻ nhớ. File xoay vòng theo dung lượng
+và theo ngày.
+
+Truy vấn nhanh:
+    python3 audit_log.py audit.jsonl --since 2025-01-16 --type rfid --failed
+    python3 audit_log.py audit.jsonl --identity khoi --limit 20
+"""
+
+import argparse
+import copy
+import glob
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AuditEventType(Enum):
+    FACE = "face"
+    FINGERPRINT = "fingerprint"
+    RFID = "rfid"
+    PASSCODE = "passcode"
+    UNLOCK = "unlock"
+    AUTH_FAILED = "auth_failed"
+    ADMIN = "admin"
+    DEVICE = "device"
+
+
+@dataclass
+class AuditEvent:
+    type: AuditEventType
+    ok: bool = True
+    identity: Optional[str] = None
+    detail: Dict[str, Any] = field(default_factory=dict)
+    ts: float = field(default_factory=time.time)
+    session: Optional[int] = None
+    door: Optional[str] = None
+    
+    def to_json(self) -> str:
+        record = {"ts": round(self.ts, 3), "type": self.type.value, "ok": self.ok}
+        if self.identity is not None:
+            record["id"] = self.identity
+        if self.session is not None:
+            record["s"] = self.session
+        if self.door is not None:
+            record["door"] = self.door
+        if self.detail:
+            record["d"] = self.detail
+        return json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str)
+    
+    @classmethod
+    def from_json(cls, line: str) -> "AuditEvent":
+        record = json.loads(line)
+        return cls(AuditEventType(record["type"]), record.get("ok", True), record.get("id"),
+                   record.get("d", {}), record["ts"], record.get("s"), record.get("door"))
+
+
+def format_event(event: AuditEvent) -> str:
+    """Một dòng dễ đọc cho CLI"""
+    stamp = datetime.fromtimestamp(event.ts).strftime("%Y-%m-%d %H:%M:%S")
+    detail = " ".join(f"{k}={v}" for k, v in event.detail.items() if v is not None)
+    return (f"{stamp}  {'✅' if event.ok else '❌'} {event.type.value:<12} "
+            f"{event.identity or '-':<20} {event.door or '':<8} {detail}")
+
+
+def format_uid(uid: Optional[Iterable[int]]) -> Optional[str]:
+    """UID thẻ [0xe5, 0xa8, ...] -> "e5a8..." (dạng chuẩn để tìm kiếm)"""
+    if uid is None:
+        return None
+    return "".join(f"{byte:02x}" for byte in uid)
+
+
+class _AuditFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        event = getattr(record, "audit_event", None)
+        return event.to_json() if event is not None else super().format(record)
+
+
+class SizeTimedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Xoay file khi vượt max_bytes hoặc sang ngày mới (file.1, file.2, ... cũ dần)"""
+    
+    def __init__(self, filename: str, max_bytes: int = 5 * 1024 * 1024, backup_count: int = 30,
+                 rotate_daily: bool = True, encoding: str = "utf-8"):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding=encoding)
+        self.rotate_daily = rotate_daily
+        self._day = self._current_day()
+    
+    @staticmethod
+    def _current_day():
+        return time.localtime().tm_yday
+    
+    def shouldRollover(self, record: logging.LogRecord) -> bool:
+        if self.rotate_daily and self._current_day() != self._day:
+            return os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) > 0
+        return bool(super().shouldRollover(record))
+    
+    def doRollover(self):
+        super().doRollover()
+        self._day = self._current_day()
+
+
+def start_queue_logging(handlers: List[logging.Handler], target: Optional[logging.Logger] = None,
+                        level: int = logging.INFO) -> logging.handlers.QueueListener:
+    """Gắn QueueHandler vào logger, các handler thật ghi trên luồng riêng của QueueListener"""
+    target = target or logging.getLogger()
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+    target.setLevel(level)
+    target.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+class AuditLogger:
+    """Ghi sự kiện kiểm toán không chặn (thread-safe)"""
+    
+    def __init__(self, path: str, door: Optional[str] = None, max_bytes: int = 5 * 1024 * 1024,
+                 backup_count: int = 30, rotate_daily: bool = True,
+                 handlers: Optional[List[logging.Handler]] = None):
+        """handlers: handler bổ sung nhận mọi sự kiện trên luồng ghi (vd. kho lịch sử có chỉ mục)"""
+        self.path = path
+        self.door = door
+        self._shared = False
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        
+        handler = SizeTimedRotatingFileHandler(path, max_bytes, backup_count, rotate_daily)
+        handler.setFormatter(_AuditFormatter())
+        
+        self._logger = logging.getLogger(f"audit.{os.path.abspath(path)}")
+        self._logger.propagate = False  # Không lẫn vào system.log
+        self._handlers = [handler] + list(handlers or [])
+        self._listener = start_queue_logging(self._handlers, self._logger)
+    
+    def for_door(self, door: str) -> "AuditLogger":
+        """Cùng file và luồng ghi, bản ghi mang mã cửa khác (close() của bản này không đóng file)"""
+        view = copy.copy(self)
+        view.door = door
+        view._shared = True
+        return view
+    
+    def record(self, event: AuditEvent):
+        if event.door is None:
+            event.door = self.door
+        self._logger.info(event.type.value, extra={"audit_event": event})
+    
+    def log(self, event_type: AuditEventType, ok: bool = True, identity: Optional[str] = None,
+            session: Optional[int] = None, **detail):
+        self.record(AuditEvent(event_type, ok, identity, detail, session=session))
+    
+    # ---- Typed helpers ----
+    def face(self, name: Optional[str], confidence: Optional[float] = None, ok: bool = True,
+             session: Optional[int] = None):
+        self.log(AuditEventType.FACE, ok, name, session, confidence=confidence)
+    
+    def fingerprint(self, template_id: Optional[int], ok: bool, score: Optional[int] = None,
+                    session: Optional[int] = None):
+        identity = str(template_id) if template_id is not None and template_id >= 0 else None
+        self.log(AuditEventType.FINGERPRINT, ok, identity, session, template=template_id, score=score)
+    
+    def rfid(self, uid: Optional[Iterable[int]], ok: bool, session: Optional[int] = None, **detail):
+        self.log(AuditEventType.RFID, ok, format_uid(uid), session, **detail)
+    
+    def passcode(self, ok: bool, session: Optional[int] = None):
+        self.log(AuditEventType.PASSCODE, ok, session=session)
+    
+    def unlock(self, identities: Dict[str, Any], session: Optional[int] = None):
+        """identities: {yếu tố: danh tính} của phiên vừa mở cửa"""
+        primary = next((str(v) for v in identities.values() if v is not None), None)
+        self.log(AuditEventType.UNLOCK, True, primary, session, factors=identities)
+    
+    def auth_failed(self, step: str, reason: str, session: Optional[int] = None):
+        self.log(AuditEventType.AUTH_FAILED, False, session=session, step=step, reason=reason)
+    
+    def admin_action(self, action: str, ok: bool = True, identity: Optional[str] = None, **detail):
+        self.log(AuditEventType.ADMIN, ok, identity, action=action, **detail)
+    
+    def close(self):
+        """Ghi nốt hàng đợi rồi đóng file (gọi nhiều lần không sao)"""
+        if self._listener is None or self._shared:
+            return
+        self._listener.stop()
+        self._listener = None
+        for handler in self._handlers:
+            handler.close()
+
+
+# ==== QUERY ====
+def log_files(path: str) -> List[str]:
+    """File hiện tại + file đã xoay, cũ nhất trước"""
+    rotated = [p for p in glob.glob(path + ".*") if p.rsplit(".", 1)[-1].isdigit()]
+    rotated.sort(key=lambda p: int(p.rsplit(".", 1)[-1]), reverse=True)
+    return rotated + ([path] if os.path.exists(path) else [])
+
+
+def read_events(path: str, since: Optional[float] = None, until: Optional[float] = None,
+                types: Optional[Iterable[AuditEventType]] = None, identity: Optional[str] = None,
+                ok: Optional[bool] = None) -> Iterator[AuditEvent]:
+    """Đọc sự kiện theo thứ tự thời gian, bỏ qua cả file nằm ngoài khoảng thời gian"""
+    type_values = {t.value for t in types} if types else None
+    for file_path in log_files(path):
+        # mtime = bản ghi cuối cùng của file - file cũ hơn 'since' không cần mở
+        if since is not None and os.path.getmtime(file_path) < since:
+            continue
+        with open(file_path, encoding="utf-8") as f:
+            for line in f:
+                # Lọc chuỗi thô trước khi parse JSON
+                if type_values and not any(f'"type":"{t}"' in line for t in type_values):
+                    continue
+                if identity is not None and identity not in line:
+                    continue
+                try:
+                    event = AuditEvent.from_json(line)
+                except (ValueError, KeyError):
+                    continue
+                if since is not None and event.ts < since:
+                    continue
+                if until is not None and event.ts > until:
+                    return
+                if identity is not None and event.identity != identity:
+                    continue
+                if ok is not None and event.ok != ok:
+                    continue
+                yield event
+
+
+def _parse_time(value: str) -> float:
+    return datetime.fromisoformat(value).timestamp()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Tra cứu nhật ký kiểm toán")
+    parser.add_argument("path", help="File audit (vd. audit.jsonl)")
+    parser.add_argument("--since", type=_parse_time, help="Từ thời điểm (ISO, vd. 2025-01-16T02:00)")
+    parser.add_argument("--until", type=_parse_time, help="Đến thời điểm (ISO)")
+    parser.add_argument("--type", action="append", choices=[t.value for t in AuditEventType], help="Loại sự kiện")
+    parser.add_argument("--identity", help="Tên / template ID / UID thẻ (hex)")
+    result = parser.add_mutually_exclusive_group()
+    result.add_argument("--failed", action="store_true", help="Chỉ sự kiện thất bại")
+    result.add_argument("--ok", action="store_true", help="Chỉ sự kiện thành công")
+    parser.add_argument("--limit", type=int, help="Số bản ghi tối đa")
+    parser.add_argument("--json", action="store_true", help="In JSON lines thay vì bảng")
+    args = parser.parse_args(argv)
+    
+    started = time.perf_counter()
+    types = [AuditEventType(t) for t in args.type] if args.type else None
+    ok = False if args.failed else True if args.ok else None
+    count = 0
+    for event in read_events(args.path, args.since, args.until, types, args.identity, ok):
+        if args.json:
+            print(event.to_json())
+        else:
+            print(format_event(event))
+        count += 1
+        if args.limit and count >= args.limit:
+            break
+    print(f"📊 {count} sự kiện ({(time.perf_counter() - started) * 1000:.1f} ms)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+CHÍNH SÁCH XÁC THỰC ĐA YẾU TỐ SONG SONG
+Các yếu tố (face, fingerprint, RFID, passcode) được kích hoạt cùng lúc,
+kết quả được gom lại khi đến và cửa mở ngay khi một tập yếu tố yêu cầu
+được thỏa mãn trong cửa sổ thời gian cho phép.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Dict, FrozenSet, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Factor(Enum):
+    FACE = "face"
+    FINGERPRINT = "fingerprint"
+    RFID = "rfid"
+    PASSCODE = "passcode"
+
+
+@dataclass
+class FactorResult:
+    factor: Factor
+    success: bool
+    identity: Optional[str] = None
+    detail: Any = None
+    timestamp: float = field(default_factory=time.monotonic)
+    user: Optional[str] = None  # Người dùng gắn với yếu tố (UserRegistry), None = không ràng buộc
+
+
+@dataclass
+class AuthPolicy:
+    """Tập các phương án yếu tố, chỉ cần thỏa mãn một phương án"""
+    alternatives: List[FrozenSet[Factor]]
+    window_seconds: float = 15.0
+    max_failures: int = 5
+    
+    @classmethod
+    def parse(cls, spec: str, window_seconds: float = 15.0, max_failures: int = 5) -> "AuthPolicy":
+        """Đọc chuỗi cấu hình dạng 'face+rfid+passcode|face+fingerprint'"""
+        alternatives = []
+        for option in spec.split("|"):
+            names = [name.strip().lower() for name in option.split("+") if name.strip()]
+            if not names:
+                continue
+            alternatives.append(frozenset(Factor(name) for name in names))
+        if not alternatives:
+            raise ValueError(f"Chính sách xác thực rỗng: {spec!r}")
+        return cls(alternatives, window_seconds, max_failures)
+    
+    @property
+    def factors(self) -> FrozenSet[Factor]:
+        """Mọi yếu tố cần được kích hoạt"""
+        return frozenset().union(*self.alternatives)
+    
+    def without(self, factors) -> "AuthPolicy":
+        """Chỉ giữ các phương án không cần yếu tố bị loại (vd. thiết bị đang offline)"""
+        excluded = frozenset(factors)
+        return AuthPolicy([option for option in self.alternatives if not option & excluded],
+                          self.window_seconds, self.max_failures)
+
+
+class MultiFactorSession:
+    """Gom kết quả từ các đầu đọc chạy song song (thread-safe)"""
+    
+    def __init__(self, policy: AuthPolicy):
+        self.policy = policy
+        self.started_at = time.monotonic()
+        self._successes: Dict[Factor, FactorResult] = {}
+        self._failures: Dict[Factor, int] = {factor: 0 for factor in Factor}
+        self._lock = threading.Lock()
+        self.completed = False
+    
+    def _prune(self, now: float):
+        window = self.policy.window_seconds
+        for factor in [f for f, r in self._successes.items() if now - r.timestamp > window]:
+            logger.info(f"⌛ Kết quả {factor.value} đã hết hạn cửa sổ {window:.0f}s")
+            del self._successes[factor]
+    
+    def submit(self, result: FactorResult) -> bool:
+        """Ghi nhận kết quả, trả về True nếu yếu tố vừa được thỏa mãn lần đầu"""
+        with self._lock:
+            if self.completed:
+                return False
+            self._prune(result.timestamp)
+            if not result.success:
+                self._failures[result.factor] += 1
+                return False
+            is_new = result.factor not in self._successes
+            self._successes[result.factor] = result
+            return is_new
+    
+    def satisfied_alternative(self) -> Optional[FrozenSet[Factor]]:
+        """Phương án đã được thỏa mãn (nếu có)"""
+        with self._lock:
+            self._prune(time.monotonic())
+            done = set(self._successes)
+            for option in self.policy.alternatives:
+                if option <= done and len(self._users(option)) <= 1:
+                    return option
+            return None
+    
+    def _users(self, factors) -> set:
+        """Người dùng của các yếu tố đã thỏa mãn - khác nhau thì phương án chưa hợp lệ"""
+        return {self._successes[f].user for f in factors
+                if f in self._successes and self._successes[f].user is not None}
+    
+    def user(self) -> Optional[str]:
+        """Người dùng chung của các yếu tố đã thỏa mãn (None nếu chưa có hoặc không nhất quán)"""
+        with self._lock:
+            users = self._users(self._successes)
+            return next(iter(users)) if len(users) == 1 else None
+    
+    def is_satisfied(self) -> bool:
+        return self.satisfied_alternative() is not None
+    
+    def missing(self) -> FrozenSet[Factor]:
+        """Các yếu tố còn thiếu của phương án gần hoàn thành nhất"""
+        with self._lock:
+            self._prune(time.monotonic())
+            done = set(self._successes)
+            return min((option - done for option in self.policy.alternatives), key=len)
+    
+    def satisfied_factors(self) -> FrozenSet[Factor]:
+        with self._lock:
+            self._prune(time.monotonic())
+            return frozenset(self._successes)
+    
+    def failures(self, factor: Factor) -> int:
+        with self._lock:
+            return self._failures[factor]
+    
+    def exhausted(self, factor: Factor) -> bool:
+        """Yếu tố đã thất bại quá số lần cho phép"""
+        return self.failures(factor) >= self.policy.max_failures
+    
+    def identities(self) -> Dict[Factor, Optional[str]]:
+        with self._lock:
+            return {factor: result.identity for factor, result in self._successes.items()}
+    
+    def complete(self) -> bool:
+        """Đánh dấu phiên đã hoàn tất, chỉ lần gọi đầu tiên trả về True"""
+        with self._lock:
+            if self.completed:
+                return False
+            self.completed = True
+            return True
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+MÁY TRẠNG THÁI XÁC THỰC (EVENT-DRIVEN)
+Thay thế dict auth_state + chuỗi root.after(...) bằng bảng chuyển trạng thái,
+sự kiện có kiểu, timeout theo từng trạng thái và một hàng đợi sự kiện duy nhất.
+Không phụ thuộc Tk/phần cứng nên có thể chạy headless để replay và đo độ trễ.
+"""
+
+import logging
+import queue
+import random
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class AuthState(Enum):
+    IDLE = "idle"
+    FACE = "face"
+    FACE_VERIFIED = "face_verified"
+    FINGERPRINT = "fingerprint"
+    FINGERPRINT_VERIFIED = "fingerprint_verified"
+    RFID = "rfid"
+    RFID_VERIFIED = "rfid_verified"
+    PASSCODE = "passcode"
+    PARALLEL = "parallel"
+    UNLOCKED = "unlocked"
+    LOCKED = "locked"
+    FAILED = "failed"
+    LOCKED_OUT = "locked_out"  # Quá nhiều lần thử sai giữa các phiên - chờ hết khóa tạm
+    ADMIN = "admin"
+
+
+class EventType(Enum):
+    START = "start"
+    FACE_OK = "face_ok"
+    FINGER_OK = "finger_ok"
+    FINGER_FAIL = "finger_fail"
+    CARD_OK = "card_ok"
+    CARD_FAIL = "card_fail"
+    ADMIN_CARD = "admin_card"
+    PIN_OK = "pin_ok"
+    PIN_FAIL = "pin_fail"
+    FACTORS_OK = "factors_ok"
+    FACTOR_EXHAUSTED = "factor_exhausted"
+    FACTOR_SKIPPED = "factor_skipped"  # Thiết bị offline, chế độ suy giảm cho phép bỏ qua bước
+    FACTOR_UNAVAILABLE = "factor_unavailable"  # Thiết bị offline, không được phép bỏ qua
+    SCHEDULE_DENIED = "schedule_denied"  # Đủ yếu tố nhưng ngoài khung giờ cho phép
+    PASSBACK_DENIED = "passback_denied"  # Đã vào khu vực và chưa ra (anti-passback)
+    LOCKOUT = "lockout"  # Bộ đếm chống dò mã vượt ngưỡng (timeout = thời gian khóa)
+    SUSPEND = "suspend"  # Tạm dừng xác thực (vd. đang đăng ký khuôn mặt)
+    TIMEOUT = "timeout"
+
+
+@dataclass
+class AuthEvent:
+    type: EventType
+    payload: Any = None
+    session: Optional[int] = None  # None = phiên hiện tại
+    timestamp: float = 0.0
+    posted_at: float = field(default_factory=time.perf_counter)
+    timeout: Optional[float] = None  # Ghi đè timeout của trạng thái đích
+
+
+@dataclass(frozen=True)
+class Transition:
+    target: AuthState
+    counts_attempt: bool = False  # Sự kiện thất bại - hết lượt thì chuyển sang FAILED
+
+
+def default_transitions(entry_state: AuthState = AuthState.FACE) -> Dict[Tuple[Optional[AuthState], EventType], Transition]:
+    """Bảng chuyển trạng thái của quy trình 4 lớp (key None = mọi trạng thái)"""
+    S, E = AuthState, EventType
+    return {
+        (None, E.START): Transition(entry_state),
+        
+        (S.FACE, E.FACE_OK): Transition(S.FACE_VERIFIED),
+        (S.FACE_VERIFIED, E.TIMEOUT): Transition(S.FINGERPRINT),
+        
+        (S.FINGERPRINT, E.FINGER_OK): Transition(S.FINGERPRINT_VERIFIED),
+        (S.FINGERPRINT, E.FINGER_FAIL): Transition(S.FINGERPRINT, counts_attempt=True),
+        (S.FINGERPRINT, E.TIMEOUT): Transition(S.FAILED),
+        (S.FINGERPRINT, E.FACTOR_SKIPPED): Transition(S.RFID),
+        (S.FINGERPRINT, E.FACTOR_UNAVAILABLE): Transition(S.FAILED),
+        (S.FINGERPRINT_VERIFIED, E.TIMEOUT): Transition(S.RFID),
+        
+        (S.RFID, E.CARD_OK): Transition(S.RFID_VERIFIED),
+        (S.RFID, E.CARD_FAIL): Transition(S.RFID, counts_attempt=True),
+        (S.RFID, E.ADMIN_CARD): Transition(S.ADMIN),
+        (S.RFID, E.TIMEOUT): Transition(S.FAILED),
+        (S.RFID, E.FACTOR_SKIPPED): Transition(S.PASSCODE),
+        (S.RFID, E.FACTOR_UNAVAILABLE): Transition(S.FAILED),
+        (S.RFID_VERIFIED, E.TIMEOUT): Transition(S.PASSCODE),
+        
+        (S.PASSCODE, E.PIN_OK): Transition(S.UNLOCKED),
+        (S.PASSCODE, E.PIN_FAIL): Transition(S.PASSCODE, counts_attempt=True),
+        (S.PASSCODE, E.SCHEDULE_DENIED): Transition(S.FAILED),
+        (S.PASSCODE, E.PASSBACK_DENIED): Transition(S.FAILED),
+        
+        (S.PARALLEL, E.FACTORS_OK): Transition(S.UNLOCKED),
+        (S.PARALLEL, E.FACTOR_EXHAUSTED): Transition(S.FAILED),
+        (S.PARALLEL, E.ADMIN_CARD): Transition(S.ADMIN),
+        (S.PARALLEL, E.FACTOR_UNAVAILABLE): Transition(S.FAILED),
+        (S.PARALLEL, E.SCHEDULE_DENIED): Transition(S.FAILED),
+        (S.PARALLEL, E.PASSBACK_DENIED): Transition(S.FAILED),
+        
+        (S.UNLOCKED, E.TIMEOUT): Transition(S.LOCKED),
+        (S.LOCKED, E.TIMEOUT): Transition(entry_state),
+        (S.FAILED, E.TIMEOUT): Transition(entry_state),
+        (None, E.LOCKOUT): Transition(S.LOCKED_OUT),
+        (S.LOCKED_OUT, E.TIMEOUT): Transition(entry_state),
+        (None, E.SUSPEND): Transition(S.IDLE),
+    }
+
+
+class AuthStateMachine:
+    """Máy trạng thái xác thực - mọi chuyển trạng thái chạy trên luồng gọi process_pending()"""
+    
+    def __init__(self, entry_state: AuthState = AuthState.FACE, max_attempts: int = 5,
+                 timeouts: Optional[Dict[AuthState, float]] = None,
+                 transitions: Optional[Dict[Tuple[Optional[AuthState], EventType], Transition]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.entry_state = entry_state
+        self.max_attempts = max_attempts
+        self.timeouts = dict(timeouts or {})
+        self.transitions = transitions if transitions is not None else default_transitions(entry_state)
+        self.clock = clock
+        
+        self.state = AuthState.IDLE
+        self.session = 0
+        self._attempts: Dict[AuthState, int] = {}
+        self._deadline: Optional[float] = None
+        
+        self._queue: "queue.Queue[AuthEvent]" = queue.Queue()
+        self._enter_hooks: Dict[AuthState, List[Callable]] = {}
+        self._listeners: List[Callable] = []
+        self._processing = False
+        
+        # Thống kê độ trễ (từ lúc post đến khi chuyển trạng thái xong)
+        self.transition_count = 0
+        self.dropped_count = 0
+        self._latency_total = 0.0
+        self.latency_max = 0.0
+    
+    # ---- Registration ----
+    def on_enter(self, state: AuthState, callback: Callable[[AuthEvent, AuthState], None]):
+        """Gọi callback(event, prev_state) khi vào trạng thái (không gọi khi retry cùng trạng thái)"""
+        self._enter_hooks.setdefault(state, []).append(callback)
+    
+    def add_listener(self, callback: Callable[[AuthState, AuthEvent, AuthState], None]):
+        """Gọi callback(prev_state, event, new_state) cho mọi chuyển trạng thái"""
+        self._listeners.append(callback)
+    
+    # ---- Event queue ----
+    def post(self, event_type: EventType, payload: Any = None, session: Optional[int] = None,
+             timeout: Optional[float] = None) -> AuthEvent:
+        """Đưa sự kiện vào hàng đợi (thread-safe)"""
+        event = AuthEvent(event_type, payload, session, self.clock(), timeout=timeout)
+        self._queue.put(event)
+        return event
+    
+    def attempts(self, state: Optional[AuthState] = None) -> int:
+        """Số lần thất bại đã ghi nhận ở trạng thái (mặc định: trạng thái hiện tại)"""
+        return self._attempts.get(state or self.state, 0)
+    
+    def time_remaining(self) -> Optional[float]:
+        if self._deadline is None:
+            return None
+        return max(self._deadline - self.clock(), 0.0)
+    
+    def process_pending(self, max_events: Optional[int] = None) -> int:
+        """Xử lý hàng đợi và timeout, trả về số chuyển trạng thái đã thực hiện"""
+        if self._processing:
+            # Gọi lồng nhau (vd. dialog modal trong hook) - để vòng ngoài xử lý tiếp
+            return 0
+        self._processing = True
+        handled = 0
+        try:
+            while max_events is None or handled < max_events:
+                try:
+                    event = self._queue.get_nowait()
+                except queue.Empty:
+                    if self._deadline is not None and self.clock() >= self._deadline:
+                        event = AuthEvent(EventType.TIMEOUT, None, self.session, self._deadline)
+                        self._deadline = None
+                    else:
+                        break
+                if self._dispatch(event):
+                    handled += 1
+        finally:
+            self._processing = False
+        return handled
+    
+    def _dispatch(self, event: AuthEvent) -> bool:
+        if event.session is not None and event.session != self.session:
+            # Sự kiện cũ của phiên trước - bỏ qua
+            self.dropped_count += 1
+            return False
+        
+        transition = self.transitions.get((self.state, event.type)) or self.transitions.get((None, event.type))
+        if transition is None:
+            self.dropped_count += 1
+            logger.debug(f"FSM bỏ qua {event.type.value} ở trạng thái {self.state.value}")
+            return False
+        
+        prev_state = self.state
+        target = transition.target
+        if transition.counts_attempt:
+            self._attempts[prev_state] = self._attempts.get(prev_state, 0) + 1
+            if self._attempts[prev_state] >= self.max_attempts:
+                target = AuthState.FAILED
+        
+        entered = target != prev_state
+        if event.type == EventType.START:
+            self.session += 1
+            self._attempts.clear()
+            entered = True
+        elif entered:
+            self._attempts[target] = 0
+        
+        self.state = target
+        if entered:
+            timeout = event.timeout if event.timeout is not None else self.timeouts.get(target)
+            self._deadline = self.clock() + timeout if timeout is not None else None
+        
+        latency = time.perf_counter() - event.posted_at
+        self.transition_count += 1
+        self._latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+        
+        if entered:
+            logger.debug(f"FSM {prev_state.value} --{event.type.value}--> {target.value}")
+            for hook in self._enter_hooks.get(target, []):
+                self._safe_call(hook, event, prev_state)
+        for listener in self._listeners:
+            self._safe_call(listener, prev_state, event, target)
+        return True
+    
+    @staticmethod
+    def _safe_call(callback, *args):
+        try:
+            callback(*args)
+        except Exception as e:
+            logger.error(f"❌ FSM hook error ({getattr(callback, '__name__', callback)}): {e}")
+    
+    # ---- Statistics ----
+    @property
+    def latency_mean(self) -> float:
+        return self._latency_total / self.transition_count if self.transition_count else 0.0
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state.value,
+            "session": self.session,
+            "transitions": self.transition_count,
+            "dropped": self.dropped_count,
+            "latency_mean_us": self.latency_mean * 1e6,
+            "latency_max_us": self.latency_max * 1e6,
+            "queued": self._queue.qsize()
+        }
+
+
+# ==== HEADLESS REPLAY / BENCHMARK ====
+class _ManualClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+def replay(events: List[Tuple[EventType, Any]], fsm: Optional[AuthStateMachine] = None) -> AuthStateMachine:
+    """Replay một chuỗi sự kiện headless, TIMEOUT được mô phỏng bằng đồng hồ ảo"""
+    if fsm is None:
+        clock = _ManualClock()
+        fsm = AuthStateMachine(timeouts={s: 1.0 for s in (AuthState.FACE_VERIFIED, AuthState.FINGERPRINT_VERIFIED,
+                                                          AuthState.RFID_VERIFIED, AuthState.UNLOCKED,
+                                                          AuthState.LOCKED, AuthState.FAILED)},
+                               clock=clock)
+    for event_type, payload in events:
+        if event_type == EventType.TIMEOUT and isinstance(fsm.clock, _ManualClock):
+            remaining = fsm.time_remaining()
+            if remaining is not None:
+                fsm.clock.now += remaining
+            fsm.process_pending()
+            continue
+        fsm.post(event_type, payload)
+        fsm.process_pending()
+    return fsm
+
+
+def benchmark(sequences: int = 10000, seed: int = 0) -> Dict[str, Any]:
+    """Replay ngẫu nhiên nhiều chuỗi sự kiện và đo thông lượng/độ trễ"""
+    rng = random.Random(seed)
+    happy = [(EventType.START, None), (EventType.FACE_OK, "khoi"), (EventType.TIMEOUT, None),
+             (EventType.FINGER_OK, 1), (EventType.TIMEOUT, None), (EventType.CARD_OK, [1, 2, 3, 4]),
+             (EventType.TIMEOUT, None), (EventType.PIN_OK, None), (EventType.TIMEOUT, None),
+             (EventType.TIMEOUT, None)]
+    noise = [EventType.FINGER_FAIL, EventType.CARD_FAIL, EventType.PIN_FAIL, EventType.FACE_OK]
+    
+    fsm = replay([])
+    unlocked = [0]
+    fsm.on_enter(AuthState.UNLOCKED, lambda event, prev: unlocked.__setitem__(0, unlocked[0] + 1))
+    
+    start = time.perf_counter()
+    for _ in range(sequences):
+        events = list(happy)
+        for _ in range(rng.randint(0, 4)):
+            events.insert(rng.randint(1, len(events)), (rng.choice(noise), None))
+        replay(events, fsm)
+    elapsed = time.perf_counter() - start
+    
+    result = fsm.stats()
+    result.update({
+        "sequences": sequences,
+        "unlocks": unlocked[0],
+        "elapsed_s": elapsed,
+        "sequences_per_s": sequences / elapsed if elapsed else 0.0
+    })
+    return result
+
+
+if __name__ == "__main__":
+    stats = benchmark()
+    print("🔁 FSM replay benchmark")
+    for key, value in stats.items():
+        print(f"   {key}: {value:.2f}" if isinstance(value, float) else f"   {key}: {value}")
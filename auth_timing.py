@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+CHÍNH SÁCH THỜI GIAN & BỘ HẸN GIỜ CÓ THỂ HỦY
+Độ trễ UX giữa các bước được cấu hình tập trung (cho phép = 0 / fast-path),
+mọi callback root.after của một phiên được theo dõi để hủy khi reset/admin.
+"""
+
+import logging
+from dataclasses import dataclass, fields, replace
+from typing import Callable, Dict, Optional
+
+from auth_state_machine import AuthState
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TimingPolicy:
+    """Độ trễ (giây) cho từng chuyển bước, 0 = chuyển ngay"""
+    face_verified: float = 1.5
+    fingerprint_verified: float = 1.5
+    rfid_verified: float = 1.5
+    retry: float = 1.5
+    failure_restart: float = 3.0
+    relock_restart: float = 2.0
+    startup: float = 3.0
+    
+    @classmethod
+    def fast_path(cls) -> "TimingPolicy":
+        """Bỏ mọi khoảng chờ trên đường thành công, giữ thông báo lỗi ngắn"""
+        return cls(face_verified=0.0, fingerprint_verified=0.0, rfid_verified=0.0,
+                   retry=0.5, failure_restart=1.0, relock_restart=0.0, startup=0.0)
+    
+    @classmethod
+    def from_mode(cls, mode: str = "standard", overrides: Optional[Dict[str, float]] = None) -> "TimingPolicy":
+        """Tạo chính sách từ chế độ ('standard' | 'fast') và các giá trị ghi đè"""
+        if mode == "fast":
+            policy = cls.fast_path()
+        elif mode == "standard":
+            policy = cls()
+        else:
+            raise ValueError(f"Chế độ thời gian không hợp lệ: {mode!r}")
+        
+        overrides = overrides or {}
+        known = {f.name for f in fields(cls)}
+        unknown = set(overrides) - known
+        if unknown:
+            raise ValueError(f"Độ trễ không xác định: {sorted(unknown)}")
+        for name, value in overrides.items():
+            if value < 0:
+                raise ValueError(f"Độ trễ {name} phải >= 0")
+        return replace(policy, **{name: float(value) for name, value in overrides.items()})
+    
+    @property
+    def success_path_delay(self) -> float:
+        """Tổng thời gian chờ thuần trên một lượt xác thực thành công"""
+        return self.face_verified + self.fingerprint_verified + self.rfid_verified
+    
+    def state_timeouts(self) -> Dict[AuthState, float]:
+        """Timeout của các trạng thái chuyển tiếp cho AuthStateMachine"""
+        return {
+            AuthState.FACE_VERIFIED: self.face_verified,
+            AuthState.FINGERPRINT_VERIFIED: self.fingerprint_verified,
+            AuthState.RFID_VERIFIED: self.rfid_verified,
+            AuthState.LOCKED: self.relock_restart,
+            AuthState.FAILED: self.failure_restart
+        }
+
+
+class TimerManager:
+    """Theo dõi các callback root.after để có thể hủy khi reset phiên (chỉ dùng trên Tk thread)"""
+    
+    SESSION = "session"
+    SYSTEM = "system"
+    
+    def __init__(self, root):
+        self.root = root
+        self._pending: Dict[str, str] = {}  # after id -> tag
+    
+    def schedule(self, delay: float, callback: Callable, *args, tag: str = SESSION) -> str:
+        """Hẹn giờ callback sau `delay` giây, trả về id để hủy"""
+        after_id = None
+        
+        def _fire():
+            self._pending.pop(after_id, None)
+            callback(*args)
+        
+        after_id = self.root.after(max(int(delay * 1000), 0), _fire)
+        self._pending[after_id] = tag
+        return after_id
+    
+    def cancel(self, after_id: str) -> bool:
+        if self._pending.pop(after_id, None) is None:
+            return False
+        try:
+            self.root.after_cancel(after_id)
+        except Exception:
+            pass
+        return True
+    
+    def cancel_all(self, tag: Optional[str] = SESSION) -> int:
+        """Hủy mọi timer của tag (None = tất cả)"""
+        targets = [after_id for after_id, t in self._pending.items() if tag is None or t == tag]
+        for after_id in targets:
+            self.cancel(after_id)
+        if targets:
+            logger.info(f"⏹️ Đã hủy {len(targets)} timer ({tag or 'all'})")
+        return len(targets)
+    
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
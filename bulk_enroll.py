@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+ĐĂNG KÝ KHUÔN MẶT HÀNG LOẠT TỪ THƯ MỤC ẢNH
+Cấu trúc thư mục: <photos>/<tên người>/*.jpg. Ảnh được phát hiện + mã hóa
+song song trên mọi nhân CPU, ảnh không đổi được bỏ qua nhờ cache theo hash
+nội dung, kết quả ghi ra encodings.pickle ({"encodings", "names"}).
+
+Ví dụ:
+    python3 bulk_enroll.py /media/usb/staff -o /home/khoi/Desktop/Centek/encodings.pickle
+    python3 bulk_enroll.py new_hires -o encodings.pickle --merge
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import pickle
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import face_recognition
+
+from face_model_store import IncrementalFaceStore
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+def scan_photos(root: str) -> List[Tuple[str, str]]:
+    """Danh sách (tên người, đường dẫn ảnh) từ <root>/<tên>/..."""
+    photos = []
+    for person in sorted(os.listdir(root)):
+        person_dir = os.path.join(root, person)
+        if not os.path.isdir(person_dir):
+            continue
+        for dirpath, _, filenames in os.walk(person_dir):
+            for filename in sorted(filenames):
+                if os.path.splitext(filename)[1].lower() in IMAGE_EXTENSIONS:
+                    photos.append((person, os.path.join(dirpath, filename)))
+    return photos
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def encode_photo(path: str, model: str = "hog", max_size: int = 1024, jitters: int = 1) -> Tuple[Optional[list], str]:
+    """Chạy trong process con: trả về (encoding, trạng thái)"""
+    try:
+        image = face_recognition.load_image_file(path)
+        height, width = image.shape[:2]
+        scale = max_size / max(height, width)
+        if scale < 1:
+            image = cv2.resize(image, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+        
+        locations = face_recognition.face_locations(image, model=model)
+        if not locations:
+            return None, "no_face"
+        
+        # Ảnh nhiều mặt - lấy mặt lớn nhất (thường là chủ thể)
+        largest = max(locations, key=lambda box: (box[2] - box[0]) * (box[1] - box[3]))
+        encodings = face_recognition.face_encodings(image, [largest], num_jitters=jitters)
+        if not encodings:
+            return None, "no_encoding"
+        return encodings[0], "multi_face" if len(locations) > 1 else "ok"
+    except Exception as e:
+        return None, f"error: {e}"
+
+
+class EncodingCache:
+    """Cache encoding theo hash nội dung ảnh (+ size/mtime để khỏi hash lại)"""
+    
+    def __init__(self, path: str, params: str):
+        self.path = path
+        self.params = params
+        self.by_hash: Dict[str, Tuple[Optional[list], str]] = {}
+        self.by_file: Dict[str, Tuple[int, float, str]] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "rb") as f:
+                    data = pickle.load(f)
+                if data.get("params") == params:
+                    self.by_hash = data.get("by_hash", {})
+                    self.by_file = data.get("by_file", {})
+                else:
+                    logger.info("♻️ Tham số mã hóa đã đổi - bỏ cache cũ")
+            except Exception as e:
+                logger.warning(f"⚠️ Không đọc được cache {path}: {e}")
+    
+    def content_hash(self, path: str) -> str:
+        stat = os.stat(path)
+        cached = self.by_file.get(path)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime:
+            return cached[2]
+        digest = file_hash(path)
+        self.by_file[path] = (stat.st_size, stat.st_mtime, digest)
+        return digest
+    
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"params": self.params, "by_hash": self.by_hash, "by_file": self.by_file}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self.path)
+
+
+def bulk_enroll(photos_dir: str, output: str, cache_path: Optional[str] = None, workers: Optional[int] = None,
+                model: str = "hog", max_size: int = 1024, jitters: int = 1, merge: bool = False) -> Dict[str, int]:
+    """Mã hóa toàn bộ thư mục ảnh và ghi gallery, trả về thống kê"""
+    started = time.monotonic()
+    photos = scan_photos(photos_dir)
+    print(f"📂 {len(photos)} ảnh của {len({name for name, _ in photos})} người trong {photos_dir}")
+    
+    cache = EncodingCache(cache_path or output + ".cache", f"{model}:{max_size}:{jitters}")
+    hashes = {path: cache.content_hash(path) for _, path in photos}
+    todo = sorted({digest: path for path, digest in hashes.items() if digest not in cache.by_hash}.items())
+    print(f"⚡ {len(photos) - len(todo)} ảnh có trong cache, cần mã hóa {len(todo)} ảnh")
+    
+    if todo:
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(encode_photo, path, model, max_size, jitters): digest for digest, path in todo}
+            for done, future in enumerate(as_completed(futures), 1):
+                cache.by_hash[futures[future]] = future.result()
+                if done % 50 == 0 or done == len(todo):
+                    rate = done / max(time.monotonic() - started, 1e-6)
+                    print(f"   🧠 {done}/{len(todo)} ({rate:.1f} ảnh/s, {workers} process)")
+        cache.save()
+    
+    gallery: Dict[str, list] = {}
+    stats = {"photos": len(photos), "encoded": len(todo), "no_face": 0, "multi_face": 0, "errors": 0}
+    for person, path in photos:
+        encoding, status = cache.by_hash[hashes[path]]
+        if encoding is None:
+            stats["errors" if status.startswith("error") else "no_face"] += 1
+            logger.warning(f"⚠️ {path}: {status}")
+            continue
+        if status == "multi_face":
+            stats["multi_face"] += 1
+        gallery.setdefault(person, []).append(encoding)
+    
+    store = IncrementalFaceStore(output)
+    if merge:
+        # Giữ người không có trong thư mục, thay dữ liệu của người có trong thư mục
+        existing = store.snapshot()
+        kept: Dict[str, list] = {}
+        for name, encoding in zip(existing["names"], existing["encodings"]):
+            if name not in gallery:
+                kept.setdefault(name, []).append(encoding)
+        gallery = {**kept, **gallery}
+    store.rebuild(gallery)
+    
+    stats["people"] = len(store.people())
+    stats["gallery_encodings"] = len(store.names)
+    stats["seconds"] = round(time.monotonic() - started, 1)
+    return stats
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Đăng ký khuôn mặt hàng loạt từ thư mục <tên>/*.jpg")
+    parser.add_argument("photos_dir", help="Thư mục gốc, mỗi thư mục con là một người")
+    parser.add_argument("-o", "--output", required=True, help="File encodings.pickle cần ghi")
+    parser.add_argument("--cache", help="File cache encoding (mặc định: <output>.cache)")
+    parser.add_argument("-j", "--workers", type=int, help="Số process (mặc định: số nhân CPU)")
+    parser.add_argument("--model", choices=["hog", "cnn"], default="hog", help="Bộ phát hiện khuôn mặt")
+    parser.add_argument("--max-size", type=int, default=1024, help="Thu nhỏ ảnh có cạnh dài hơn giá trị này")
+    parser.add_argument("--jitters", type=int, default=1, help="Số lần lấy mẫu khi mã hóa")
+    parser.add_argument("--merge", action="store_true", help="Chỉ cập nhật người có trong thư mục, giữ người khác")
+    args = parser.parse_args(argv)
+    
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    if not os.path.isdir(args.photos_dir):
+        print(f"❌ Không tìm thấy thư mục: {args.photos_dir}")
+        return 1
+    
+    stats = bulk_enroll(args.photos_dir, args.output, args.cache, args.workers,
+                        args.model, args.max_size, args.jitters, args.merge)
+    print("✅ Hoàn tất:")
+    for key, value in stats.items():
+        print(f"   {key}: {value}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+PHÁT ÂM BÁO NỀN cho buzzer blocking
+EnhancedBuzzerManager của enhanced_components phát bằng time.sleep ngay trên
+luồng gọi (Tk thread) - BackgroundBuzzer đưa pattern vào hàng đợi và phát trên
+luồng riêng: beep() trả về ngay, âm "click" cắt ngang âm đang phát, hàng đợi
+đầy thì bỏ âm cũ nhất. Buzzer của README.py dùng chung lớp này với PWM của nó.
+"""
+
+import logging
+import queue
+import threading
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundBuzzer:
+    """Hàng đợi + luồng phát pattern trên một PWMOutputDevice"""
+    
+    PATTERNS = {
+        "success": [(2000, 0.5, 0.3), (2500, 0.5, 0.3)],
+        "error": [(400, 0.8, 0.8)],
+        "click": [(1500, 0.3, 0.1)],  # Click sound for keypad
+        "warning": [(800, 0.6, 0.2), (600, 0.6, 0.2)],
+        "startup": [(1000, 0.4, 0.12), (1500, 0.4, 0.12), (2000, 0.5, 0.2)]
+    }
+    PREEMPTIVE = {"click"}  # Âm tương tác cắt ngang âm đang phát
+    NOTE_GAP = 0.05
+    
+    def __init__(self, device: Any = None, fallback: Any = None, max_queue: int = 4):
+        """device: PWM phát trực tiếp (ngắt được giữa chừng).
+        fallback: buzzer có beep(pattern) blocking - cho pattern lạ hoặc khi không có device"""
+        self.buzzer = device
+        self.inner = fallback
+        
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._interrupt = threading.Event()
+        self._running = True
+        self._thread = threading.Thread(target=self._player_loop, name="buzzer", daemon=True)
+        self._thread.start()
+    
+    @classmethod
+    def wrap(cls, buzzer: Any, max_queue: int = 4) -> "BackgroundBuzzer":
+        """Bọc EnhancedBuzzerManager của enhanced_components - dùng PWM của nó nếu có"""
+        return cls(getattr(buzzer, "buzzer", None), buzzer, max_queue)
+    
+    def beep(self, pattern: str, preempt: Optional[bool] = None):
+        """Đưa pattern vào hàng đợi; preempt=True hủy âm đang phát và các âm đang chờ"""
+        if not self._running or (pattern not in self.PATTERNS and self.inner is None):
+            return
+        if preempt is None:
+            preempt = pattern in self.PREEMPTIVE
+        
+        if preempt:
+            self._drain()
+            self._interrupt.set()
+        
+        while True:
+            try:
+                self._queue.put_nowait(pattern)
+                return
+            except queue.Full:
+                # Hàng đợi đầy - bỏ âm cũ nhất, âm mới nhất luôn được phát
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+    
+    def _drain(self):
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                return
+    
+    def _player_loop(self):
+        while self._running:
+            pattern = self._queue.get()
+            if pattern is None:
+                break
+            self._interrupt.clear()
+            try:
+                if self.buzzer is None or pattern not in self.PATTERNS:
+                    # Pattern riêng của buzzer gốc - phát blocking nhưng trên luồng này
+                    if self.inner is not None:
+                        self.inner.beep(pattern)
+                    continue
+                for freq, volume, duration in self.PATTERNS[pattern]:
+                    self.buzzer.frequency = freq
+                    self.buzzer.value = volume
+                    interrupted = self._interrupt.wait(duration)
+                    self.buzzer.off()
+                    if interrupted or self._interrupt.wait(self.NOTE_GAP):
+                        break
+            except Exception as e:
+                logger.debug(f"Buzzer error: {e}")
+                try:
+                    if self.buzzer is not None:
+                        self.buzzer.off()
+                except Exception:
+                    pass
+    
+    def close(self):
+        """Dừng luồng phát và tắt buzzer"""
+        self._running = False
+        self._drain()
+        self._interrupt.set()
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+        self._thread.join(timeout=1)
+        if self.buzzer is not None:
+            self.buzzer.off()
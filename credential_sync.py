@@ -0,0 +1,634 @@
+#!/usr/bin/env python3
+"""
+ĐỒNG BỘ THÔNG TIN XÁC THỰC TỪ MÁY CHỦ TRUNG TÂM
+Máy chủ giữ nhật ký thay đổi có đánh số phiên bản (thẻ RFID, ID vân tay,
+passcode, khuôn mặt). Mỗi cửa chỉ kéo các thay đổi kể từ phiên bản đã áp dụng
+(nhiều thay đổi cùng một mục được gộp thành trạng thái cuối), áp dụng trọn gói
+vào AdminDataManager, sổ người dùng và kho khuôn mặt, rồi báo lại phiên bản
+của mình - không phải chép lại cả file / cả thư viện khuôn mặt qua Wi-Fi.
+Mỗi cửa có khóa riêng suy ra từ khóa chủ của máy chủ: yêu cầu được ký HMAC,
+phản hồi được mã hóa (HMAC-SHA256 dạng bộ đếm) rồi ký kèm nonce của yêu cầu -
+người trong LAN không đọc được passcode / UID thẻ và không giả được phản hồi.
+
+Máy chủ trung tâm:
+    python3 credential_sync.py gen-key central.key
+    python3 credential_sync.py door-key central.key main > /home/khoi/Desktop/KHOI_LUANAN/sync.key
+    python3 credential_sync.py serve central.sqlite --key-file central.key --port 8766
+    python3 credential_sync.py add-rfid central.sqlite e5a8bd02 --user khoi
+    python3 credential_sync.py import-faces central.sqlite encodings.pickle
+    python3 credential_sync.py status central.sqlite
+"""
+
+import argparse
+import base64
+import copy
+import gzip
+import hashlib
+import hmac
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+import urllib.request
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from audit_log import format_uid
+from lazy_imports import lazy_module
+
+np = lazy_module("numpy")
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS changes (
+    version INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    op TEXT NOT NULL,
+    payload TEXT,
+    ts REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_changes_key ON changes (kind, key, version);
+CREATE TABLE IF NOT EXISTS doors (
+    door TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,
+    reported REAL NOT NULL
+);
+"""
+
+KINDS = ("rfid", "fingerprint", "passcode", "face")
+MAX_CLOCK_SKEW = 300.0  # Giây - yêu cầu ký quá cũ bị từ chối (chống phát lại)
+
+
+# ==== KEYS / SIGNING ====
+def load_key(path: str) -> bytes:
+    with open(path, encoding="ascii") as f:
+        return bytes.fromhex(f.read().strip())
+
+
+def door_key(master: bytes, door: str) -> bytes:
+    """Khóa riêng của một cửa - lộ khóa một cửa không giả được phản hồi cho cửa khác"""
+    return hmac.new(master, b"door:" + door.encode("utf-8"), hashlib.sha256).digest()
+
+
+def _subkey(key: bytes, purpose: bytes) -> bytes:
+    return hmac.new(key, purpose, hashlib.sha256).digest()
+
+
+def sign(key: bytes, *parts: bytes) -> str:
+    return hmac.new(_subkey(key, b"mac"), b"\n".join(parts), hashlib.sha256).hexdigest()
+
+
+def _keystream_xor(key: bytes, nonce: bytes, data: bytes) -> bytes:
+    """HMAC-SHA256 theo bộ đếm làm dòng khóa (chỉ thư viện chuẩn); toàn vẹn do chữ ký phản hồi"""
+    enc_key = _subkey(key, b"enc")
+    stream = b"".join(hmac.new(enc_key, nonce + counter.to_bytes(8, "big"), hashlib.sha256).digest()
+                      for counter in range((len(data) + 31) // 32))
+    return (int.from_bytes(data, "big") ^ int.from_bytes(stream[:len(data)], "big")).to_bytes(len(data), "big")
+
+
+def seal(key: bytes, request_nonce: bytes, body: bytes) -> Dict[str, str]:
+    nonce = os.urandom(16)
+    data = _keystream_xor(key, nonce, body)
+    return {"nonce": nonce.hex(), "data": base64.b64encode(data).decode("ascii"),
+            "sig": sign(key, request_nonce, nonce, data)}
+
+
+def unseal(key: bytes, request_nonce: bytes, sealed: Dict[str, str]) -> bytes:
+    """Kiểm tra chữ ký (gắn với nonce của yêu cầu này) trước khi giải mã"""
+    nonce, data = bytes.fromhex(sealed["nonce"]), base64.b64decode(sealed["data"])
+    if not hmac.compare_digest(sign(key, request_nonce, nonce, data), sealed["sig"]):
+        raise ValueError("Chữ ký phản hồi không hợp lệ")
+    return _keystream_xor(key, nonce, data)
+
+
+@dataclass
+class Change:
+    version: int
+    kind: str  # rfid | fingerprint | passcode | face
+    key: str  # UID hex / ID vân tay / "system" / tên người
+    op: str  # "set" | "remove"
+    payload: Optional[Dict[str, Any]] = None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {"v": self.version, "kind": self.kind, "key": self.key, "op": self.op, "payload": self.payload}
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Change":
+        return cls(data["v"], data["kind"], data["key"], data["op"], data.get("payload"))
+
+
+def encode_encodings(encodings: List[Any]) -> Dict[str, Any]:
+    """Encoding khuôn mặt -> base64 float64 (gọn hơn danh sách số JSON)"""
+    return {"dtype": "float64",
+            "encodings": [base64.b64encode(np.asarray(e, dtype=np.float64).tobytes()).decode("ascii")
+                          for e in encodings]}
+
+
+def decode_encodings(payload: Dict[str, Any]) -> List[Any]:
+    return [np.frombuffer(base64.b64decode(e), dtype=payload.get("dtype", "float64")).copy()
+            for e in payload["encodings"]]
+
+
+# ==== CENTRAL STORE ====
+class CredentialStore:
+    """Nhật ký thay đổi có phiên bản trên SQLite (thread-safe)"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+    
+    # ---- Ghi ----
+    def record(self, kind: str, key: str, op: str, payload: Optional[Dict[str, Any]] = None) -> int:
+        return self.record_many([(kind, key, op, payload)])
+    
+    def record_many(self, changes: List[Tuple[str, str, str, Optional[Dict[str, Any]]]]) -> int:
+        """Ghi nhiều thay đổi trong một giao dịch, trả về phiên bản mới nhất"""
+        now = time.time()
+        with self._lock, self._conn:
+            for kind, key, op, payload in changes:
+                if kind not in KINDS:
+                    raise ValueError(f"Loại không hợp lệ: {kind}")
+                self._conn.execute("INSERT INTO changes (kind, key, op, payload, ts) VALUES (?, ?, ?, ?, ?)",
+                                   (kind, key, op, json.dumps(payload) if payload is not None else None, now))
+            return self._latest()
+    
+    def add_rfid(self, uid: List[int], user: Optional[str] = None) -> int:
+        return self.record("rfid", format_uid(uid), "set", {"user": user} if user else None)
+    
+    def remove_rfid(self, uid: List[int]) -> int:
+        return self.record("rfid", format_uid(uid), "remove")
+    
+    def add_fingerprint(self, template_id: int, user: Optional[str] = None) -> int:
+        return self.record("fingerprint", str(template_id), "set", {"user": user} if user else None)
+    
+    def remove_fingerprint(self, template_id: int) -> int:
+        return self.record("fingerprint", str(template_id), "remove")
+    
+    def set_passcode(self, passcode: str) -> int:
+        return self.record("passcode", "system", "set", {"value": passcode})
+    
+    def set_face(self, name: str, encodings: List[Any]) -> int:
+        """Thay toàn bộ encoding của một người"""
+        return self.record("face", name, "set", encode_encodings(encodings))
+    
+    def remove_face(self, name: str) -> int:
+        return self.record("face", name, "remove")
+    
+    # ---- Đọc ----
+    def _latest(self) -> int:
+        return self._conn.execute("SELECT COALESCE(MAX(version), 0) FROM changes").fetchone()[0]
+    
+    @property
+    def version(self) -> int:
+        with self._lock:
+            return self._latest()
+    
+    def changes_since(self, since: int, limit: int = 500,
+                      kinds: Optional[List[str]] = None) -> Tuple[List[Change], int, bool]:
+        """Trạng thái cuối của mỗi mục thay đổi sau 'since' -> (thay đổi, phiên bản mới nhất, còn nữa)"""
+        kinds = list(kinds or KINDS)
+        marks = ", ".join("?" for _ in kinds)
+        sql = (f"SELECT c.version, c.kind, c.key, c.op, c.payload FROM changes c "
+               f"JOIN (SELECT MAX(version) AS v FROM changes WHERE version > ? AND kind IN ({marks}) "
+               f"GROUP BY kind, key) latest ON c.version = latest.v ORDER BY c.version LIMIT ?")
+        with self._lock:
+            rows = self._conn.execute(sql, [since, *kinds, limit + 1]).fetchall()
+            latest = self._latest()
+        more = len(rows) > limit
+        changes = [Change(v, kind, key, op, json.loads(payload) if payload else None)
+                   for v, kind, key, op, payload in rows[:limit]]
+        return changes, latest, more
+    
+    def report(self, door: str, version: int):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT INTO doors (door, version, reported) VALUES (?, ?, ?) "
+                               "ON CONFLICT(door) DO UPDATE SET version = excluded.version, "
+                               "reported = excluded.reported", (door, version, time.time()))
+    
+    def doors(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT door, version, reported FROM doors ORDER BY door").fetchall()
+            latest = self._latest()
+        return [{"door": door, "version": version, "behind": latest - version, "reported": reported}
+                for door, version, reported in rows]
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# ==== TRANSPORT ====
+class LocalTransport:
+    """Dùng trực tiếp CredentialStore trong tiến trình (thử nghiệm / máy chủ giả lập)"""
+    
+    def __init__(self, store: CredentialStore):
+        self.store = store
+    
+    def fetch(self, since: int, limit: int, kinds: List[str]) -> Tuple[List[Change], int, bool]:
+        return self.store.changes_since(since, limit, kinds)
+    
+    def report(self, door: str, version: int):
+        self.store.report(door, version)
+
+
+class HttpTransport:
+    """GET /changes?since=N và POST /report tới máy chủ trung tâm, ký bằng khóa của cửa"""
+    
+    def __init__(self, url: str, key: bytes, door: str, timeout: float = 10.0):
+        self.url = url.rstrip("/")
+        self.key = key
+        self.door = door
+        self.timeout = timeout
+    
+    def _request(self, path: str, body: Optional[bytes] = None) -> Dict[str, Any]:
+        method = "POST" if body is not None else "GET"
+        nonce, stamp = os.urandom(16), str(time.time())
+        signature = sign(self.key, method.encode(), path.encode(), stamp.encode(), nonce,
+                         self.door.encode("utf-8"), body or b"")
+        headers = {"X-Door": self.door, "X-Timestamp": stamp, "X-Nonce": nonce.hex(), "X-Signature": signature}
+        if body is not None:
+            headers["Content-Type"] = "application/json"
+        request = urllib.request.Request(self.url + path, data=body, headers=headers, method=method)
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            sealed = json.loads(response.read())
+        # Chỉ dữ liệu đã xác thực mới được giải nén / phân tích và áp dụng
+        return json.loads(gzip.decompress(unseal(self.key, nonce, sealed)))
+    
+    def fetch(self, since: int, limit: int, kinds: List[str]) -> Tuple[List[Change], int, bool]:
+        data = self._request(f"/changes?since={since}&limit={limit}&kinds={','.join(kinds)}")
+        return [Change.from_dict(c) for c in data["changes"]], data["version"], data["more"]
+    
+    def report(self, door: str, version: int):
+        self._request("/report", json.dumps({"door": door, "version": version}).encode("utf-8"))
+
+
+# ==== DOOR SIDE ====
+@dataclass
+class SyncStats:
+    syncs: int = 0
+    applied: int = 0
+    failures: int = 0
+    last_sync: Optional[float] = None
+    last_error: Optional[str] = None
+    last_ms: float = 0.0
+    history: List[Tuple[int, int]] = field(default_factory=list)  # (phiên bản, số thay đổi)
+
+
+class CredentialSyncer:
+    """Kéo thay đổi định kỳ trên luồng nền và áp dụng trọn gói (tất cả hoặc không gì cả)"""
+    
+    def __init__(self, transport: Any, admin_data: Any, state_path: str, door: str,
+                 apply_faces: Optional[Callable[[List[tuple]], None]] = None,
+                 interval: float = 60.0, page_size: int = 500,
+                 on_applied: Optional[Callable[[int, int], None]] = None, users: Any = None):
+        """apply_faces: nhận bản ghi ("remove", tên) / ("add", tên, encodings) - None = không đồng bộ khuôn mặt.
+        users: UserRegistry - thẻ / vân tay gắn hoặc gỡ khỏi người dùng theo thay đổi"""
+        self.transport = transport
+        self.admin_data = admin_data
+        self.users = users
+        self.state_path = state_path
+        self.door = door
+        self.apply_faces = apply_faces
+        self.interval = interval
+        self.page_size = page_size
+        self.on_applied = on_applied
+        self.kinds = [k for k in KINDS if k != "face" or apply_faces is not None]
+        self.stats = SyncStats()
+        self.version = self._load_state()
+        
+        self._lock = threading.Lock()  # Một lần đồng bộ tại một thời điểm
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    def _load_state(self) -> int:
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                return int(json.load(f).get("version", 0))
+        except (OSError, ValueError):
+            return 0
+    
+    def _save_state(self):
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": self.version, "door": self.door, "ts": time.time()}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.state_path)
+    
+    # ---- Lifecycle ----
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="credential-sync", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+    
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.sync_once()
+            except Exception as e:
+                self.stats.failures += 1
+                self.stats.last_error = str(e)
+                logger.warning(f"⚠️ Credential sync lỗi: {e}")
+            self._stop.wait(self.interval)
+    
+    # ---- Sync ----
+    def sync_once(self) -> int:
+        """Kéo mọi trang thay đổi rồi áp dụng một lần, trả về số thay đổi đã áp dụng"""
+        with self._lock:
+            started = time.perf_counter()
+            changes: List[Change] = []
+            since = self.version
+            while True:
+                page, latest, more = self.transport.fetch(since, self.page_size, self.kinds)
+                changes.extend(page)
+                if not more or not page:
+                    break
+                since = page[-1].version
+            # Cùng một mục có thể xuất hiện ở hai trang - giữ bản mới nhất
+            final: Dict[Tuple[str, str], Change] = {}
+            for change in changes:
+                final[(change.kind, change.key)] = change
+            
+            if final:
+                self._apply(list(final.values()))
+            self.version = max(latest, self.version)
+            self._save_state()
+            self.transport.report(self.door, self.version)
+            
+            self.stats.syncs += 1
+            self.stats.applied += len(final)
+            self.stats.last_sync = time.time()
+            self.stats.last_error = None
+            self.stats.last_ms = (time.perf_counter() - started) * 1000
+            if final:
+                self.stats.history = (self.stats.history + [(self.version, len(final))])[-20:]
+                logger.info(f"🔄 Đồng bộ {len(final)} thay đổi -> phiên bản {self.version} "
+                            f"({self.stats.last_ms:.0f} ms)")
+                if self.on_applied:
+                    self.on_applied(self.version, len(final))
+            return len(final)
+    
+    def _apply(self, changes: List[Change]):
+        """Dữ liệu admin được dựng trên bản sao rồi thay một lần; khuôn mặt ghi thành một bản ghi delta"""
+        data = copy.deepcopy(self.admin_data.data)
+        uids = {format_uid(uid): uid for uid in data.get("valid_rfid_uids", [])}
+        fingerprints = set(data.get("fingerprint_ids", []))
+        faces: List[tuple] = []
+        bindings: List[Change] = []
+        
+        for change in changes:
+            if change.kind in ("rfid", "fingerprint") or (change.kind == "face" and change.op == "remove"):
+                bindings.append(change)
+            if change.kind == "rfid":
+                if change.op == "set":
+                    uids.setdefault(change.key, list(bytes.fromhex(change.key)))
+                else:
+                    uids.pop(change.key, None)
+            elif change.kind == "fingerprint":
+                if change.op == "set":
+                    fingerprints.add(int(change.key))
+                else:
+                    fingerprints.discard(int(change.key))
+            elif change.kind == "passcode" and change.op == "set":
+                data["system_passcode"] = change.payload["value"]
+            elif change.kind == "face":
+                faces.append(("remove", change.key))
+                if change.op == "set":
+                    faces.append(("add", change.key, decode_encodings(change.payload)))
+        
+        data["valid_rfid_uids"] = list(uids.values())
+        data["fingerprint_ids"] = sorted(fingerprints)
+        
+        # Khuôn mặt trước: lỗi ở đây thì dữ liệu admin chưa bị đổi và phiên bản không tăng
+        if faces:
+            self.apply_faces(faces)
+        if data != self.admin_data.data:
+            if self.admin_data._save_data(data) is False:
+                raise OSError("Không ghi được dữ liệu admin")
+            self.admin_data.data = data
+        # Sau cùng: lỗi ghi sổ người dùng -> phiên bản không tăng, lần sau áp dụng lại (idempotent)
+        if self.users is not None and bindings:
+            self._apply_bindings(bindings)
+    
+    def _apply_bindings(self, changes: List[Change]):
+        """Thẻ / vân tay / khuôn mặt bị xóa được gỡ khỏi người giữ; thêm kèm "user" thì gắn cho người đó"""
+        for change in changes:
+            if change.kind == "face":
+                self.users.unbind(face=change.key)
+                continue
+            card = change.key if change.kind == "rfid" else None
+            fingerprint = int(change.key) if change.kind == "fingerprint" else None
+            user_id = (change.payload or {}).get("user")
+            if change.op == "remove" or user_id:
+                self.users.unbind(fingerprint=fingerprint, card=card)
+            if change.op == "set" and user_id:
+                if self.users.get(user_id) is None:
+                    logger.warning(f"⚠️ Đồng bộ: {change.kind} {change.key} gắn với người dùng chưa có: {user_id}")
+                    continue
+                self.users.bind(user_id, fingerprint=fingerprint, card=card)
+
+
+# ==== HTTP SERVER ====
+class SyncServer(ThreadingHTTPServer):
+    daemon_threads = True
+    
+    def __init__(self, address: Tuple[str, int], store: CredentialStore, master_key: bytes):
+        self.store = store
+        self.master_key = master_key
+        super().__init__(address, _SyncHandler)
+
+
+class _SyncHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    
+    def _authenticate(self, method: str, body: bytes = b"") -> bool:
+        """Yêu cầu phải ký bằng khóa của cửa và còn mới; lưu khóa + nonce để niêm phong phản hồi"""
+        try:
+            door = self.headers["X-Door"]
+            stamp = self.headers["X-Timestamp"]
+            nonce = bytes.fromhex(self.headers["X-Nonce"])
+            key = door_key(self.server.master_key, door)
+            expected = sign(key, method.encode(), self.path.encode(), stamp.encode(), nonce,
+                            door.encode("utf-8"), body)
+            fresh = abs(time.time() - float(stamp)) <= MAX_CLOCK_SKEW
+        except (KeyError, TypeError, ValueError):
+            fresh, expected = False, ""
+        if not fresh or not hmac.compare_digest(expected, self.headers.get("X-Signature", "")):
+            logger.warning(f"⚠️ Yêu cầu không hợp lệ từ {self.client_address[0]}: {method} {self.path}")
+            self._reply(401, {"error": "unauthorized"}, sealed=False)
+            return False
+        self._door, self._key, self._nonce = door, key, nonce
+        return True
+    
+    def do_GET(self):
+        if not self._authenticate("GET"):
+            return
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        if url.path == "/changes":
+            since = int(query.get("since", ["0"])[0])
+            limit = min(int(query.get("limit", ["500"])[0]), 5000)
+            kinds = query.get("kinds", [",".join(KINDS)])[0].split(",")
+            changes, latest, more = self.server.store.changes_since(since, limit, kinds)
+            self._reply(200, {"version": latest, "more": more, "changes": [c.to_dict() for c in changes]})
+        elif url.path == "/doors":
+            self._reply(200, {"version": self.server.store.version, "doors": self.server.store.doors()})
+        else:
+            self._reply(404, {"error": "not found"})
+    
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self._authenticate("POST", body):
+            return
+        if urlsplit(self.path).path != "/report":
+            self._reply(404, {"error": "not found"})
+            return
+        try:
+            data = json.loads(body)
+            # Cửa chỉ báo phiên bản của chính nó
+            self.server.store.report(self._door, int(data["version"]))
+        except (ValueError, KeyError) as e:
+            self._reply(400, {"error": str(e)})
+            return
+        self._reply(200, {"ok": True})
+    
+    def _reply(self, status: int, payload: Dict[str, Any], sealed: bool = True):
+        """Phản hồi nén gzip, mã hóa và ký bằng khóa của cửa đã xác thực"""
+        data = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        if sealed:
+            data = json.dumps(seal(self._key, self._nonce, gzip.compress(data, compresslevel=6))).encode("ascii")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+def serve(store: CredentialStore, master_key: bytes, host: str = "0.0.0.0", port: int = 8766):
+    server = SyncServer((host, port), store, master_key)
+    logger.info(f"🔄 Credential sync server: http://{host}:{port} (phiên bản {store.version})")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        store.close()
+
+
+def _parse_uid(value: str) -> List[int]:
+    return list(bytes.fromhex(value.replace(":", "").replace(" ", "")))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Máy chủ đồng bộ thông tin xác thực")
+    sub = parser.add_subparsers(dest="command", required=True)
+    
+    s = sub.add_parser("serve", help="Chạy máy chủ HTTP")
+    s.add_argument("db", help="File SQLite trung tâm")
+    s.add_argument("--key-file", required=True, help="Khóa chủ (gen-key)")
+    s.add_argument("--host", default="0.0.0.0")
+    s.add_argument("--port", type=int, default=8766)
+    
+    p = sub.add_parser("gen-key", help="Tạo khóa chủ ngẫu nhiên")
+    p.add_argument("path")
+    p = sub.add_parser("door-key", help="In khóa của một cửa (ghi vào SYNC_KEY_PATH của cửa)")
+    p.add_argument("key_file")
+    p.add_argument("door")
+    
+    for name, help_text in (("add-rfid", "Thêm thẻ (UID hex)"), ("remove-rfid", "Xóa thẻ (UID hex)")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("db")
+        p.add_argument("uid")
+        if name == "add-rfid":
+            p.add_argument("--user", help="Gắn thẻ cho người dùng (user_registry)")
+    for name, help_text in (("add-fingerprint", "Thêm ID vân tay"), ("remove-fingerprint", "Xóa ID vân tay")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("db")
+        p.add_argument("template_id", type=int)
+        if name == "add-fingerprint":
+            p.add_argument("--user", help="Gắn template cho người dùng (user_registry)")
+    p = sub.add_parser("set-passcode", help="Đổi passcode")
+    p.add_argument("db")
+    p.add_argument("passcode")
+    p = sub.add_parser("import-faces", help="Nạp encodings.pickle ({'encodings', 'names'})")
+    p.add_argument("db")
+    p.add_argument("pickle_path")
+    p = sub.add_parser("remove-face", help="Xóa khuôn mặt")
+    p.add_argument("db")
+    p.add_argument("name")
+    p = sub.add_parser("status", help="Phiên bản từng cửa")
+    p.add_argument("db")
+    args = parser.parse_args(argv)
+    
+    if args.command == "gen-key":
+        fd = os.open(args.path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w", encoding="ascii") as f:
+            f.write(os.urandom(32).hex() + "\n")
+        print(f"🔑 {args.path}")
+        return 0
+    if args.command == "door-key":
+        print(door_key(load_key(args.key_file), args.door).hex())
+        return 0
+    
+    store = CredentialStore(args.db)
+    if args.command == "serve":
+        serve(store, load_key(args.key_file), args.host, args.port)
+        return 0
+    
+    if args.command == "add-rfid":
+        version = store.add_rfid(_parse_uid(args.uid), args.user)
+    elif args.command == "remove-rfid":
+        version = store.remove_rfid(_parse_uid(args.uid))
+    elif args.command == "add-fingerprint":
+        version = store.add_fingerprint(args.template_id, args.user)
+    elif args.command == "remove-fingerprint":
+        version = store.remove_fingerprint(args.template_id)
+    elif args.command == "set-passcode":
+        version = store.set_passcode(args.passcode)
+    elif args.command == "remove-face":
+        version = store.remove_face(args.name)
+    elif args.command == "import-faces":
+        with open(args.pickle_path, "rb") as f:
+            data = pickle.load(f)
+        gallery: Dict[str, List[Any]] = {}
+        for name, encoding in zip(data["names"], data["encodings"]):
+            gallery.setdefault(name, []).append(encoding)
+        version = store.record_many([("face", name, "set", encode_encodings(encodings))
+                                     for name, encodings in gallery.items()])
+        print(f"👥 {len(gallery)} người")
+    else:
+        print(f"📦 Phiên bản hiện tại: {store.version}")
+        for door in store.doors():
+            stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(door["reported"]))
+            print(f"   🚪 {door['door']:<12} v{door['version']:<8} chậm {door['behind']:<6} {stamp}")
+        store.close()
+        return 0
+    
+    store.close()
+    print(f"✅ Phiên bản {version}")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    sys.exit(main())
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+GIÁM SÁT SỨC KHỎE THIẾT BỊ
+Theo dõi trạng thái từng thiết bị (RFID, vân tay...), đánh dấu offline sau vài
+lỗi liên tiếp, tự kết nối lại nền với backoff lũy thừa và cho phép luồng xác
+thực bỏ qua / thay thế yếu tố ngay lập tức thay vì chờ hết timeout.
+"""
+
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class DeviceState(Enum):
+    UNKNOWN = "unknown"
+    ONLINE = "online"
+    OFFLINE = "offline"
+    RECONNECTING = "reconnecting"
+
+
+@dataclass
+class DeviceHealth:
+    name: str
+    state: DeviceState = DeviceState.UNKNOWN
+    failures: int = 0  # Lỗi liên tiếp
+    reconnect_attempts: int = 0
+    last_error: Optional[str] = None
+    since: float = 0.0
+    next_retry: Optional[float] = None
+    next_probe: Optional[float] = None
+
+
+@dataclass
+class _Device:
+    connect: Callable[[], Any]
+    attach: Optional[Callable[[Any], None]]
+    probe: Optional[Callable[[], bool]]
+    health: DeviceHealth
+
+
+class DeviceHealthSupervisor:
+    """Theo dõi thiết bị và kết nối lại nền (thread-safe)"""
+    
+    DOWN = (DeviceState.OFFLINE, DeviceState.RECONNECTING)
+    
+    def __init__(self, failure_threshold: int = 3, base_backoff: float = 1.0,
+                 max_backoff: float = 60.0, probe_interval: float = 15.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.probe_interval = probe_interval
+        self.clock = clock
+        
+        self._devices: Dict[str, _Device] = {}
+        self._listeners: List[Callable[[DeviceHealth], None]] = []
+        self._cond = threading.Condition()
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+    
+    # ---- Registration ----
+    def register(self, name: str, connect: Callable[[], Any],
+                 attach: Optional[Callable[[Any], None]] = None,
+                 probe: Optional[Callable[[], bool]] = None):
+        """connect() tạo driver mới, attach(driver) gắn vào hệ thống, probe() kiểm tra định kỳ"""
+        with self._cond:
+            self._devices[name] = _Device(connect, attach, probe, DeviceHealth(name, since=self.clock()))
+    
+    def add_listener(self, callback: Callable[[DeviceHealth], None]):
+        """callback(health) khi thiết bị đổi trạng thái (gọi từ luồng giám sát / luồng báo lỗi)"""
+        self._listeners.append(callback)
+    
+    # ---- Lifecycle ----
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._monitor_loop, name="device-health", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=2)
+    
+    def connect(self, name: str) -> Any:
+        """Kết nối lần đầu (đồng bộ). Lỗi thì lên lịch kết nối lại nền và ném lại ngoại lệ"""
+        device = self._devices[name]
+        try:
+            driver = device.connect()
+            if device.attach:
+                device.attach(driver)
+        except Exception as e:
+            self._set_offline(name, e)
+            raise
+        self._set_online(name)
+        return driver
+    
+    # ---- Reports từ luồng xác thực ----
+    def report_success(self, name: str):
+        with self._cond:
+            health = self._devices[name].health
+            health.failures = 0
+            if health.state == DeviceState.ONLINE:
+                return
+        self._set_online(name)
+    
+    def report_failure(self, name: str, error: Any = None):
+        """Một lần thao tác lỗi, đủ ngưỡng liên tiếp thì đánh dấu offline"""
+        with self._cond:
+            health = self._devices[name].health
+            if health.state in (DeviceState.OFFLINE, DeviceState.RECONNECTING):
+                return
+            health.failures += 1
+            health.last_error = str(error) if error is not None else None
+            if health.failures < self.failure_threshold:
+                return
+        self._set_offline(name, error)
+    
+    # ---- Query ----
+    def state(self, name: str) -> DeviceState:
+        with self._cond:
+            return self._devices[name].health.state
+    
+    def is_available(self, name: str) -> bool:
+        """Thiết bị chưa đăng ký được coi là luôn sẵn sàng. UNKNOWN (chưa thăm dò lần nào) là đang chờ,
+        không phải offline - bước xác thực vẫn chạy, lỗi thật sẽ qua report_failure"""
+        with self._cond:
+            device = self._devices.get(name)
+            return device is None or device.health.state not in self.DOWN
+    
+    def unavailable(self, names: Optional[Iterable[str]] = None) -> Set[str]:
+        with self._cond:
+            names = list(names) if names is not None else list(self._devices)
+            return {n for n in names if n in self._devices and self._devices[n].health.state in self.DOWN}
+    
+    def snapshot(self) -> Dict[str, DeviceHealth]:
+        with self._cond:
+            return {name: DeviceHealth(**vars(d.health)) for name, d in self._devices.items()}
+    
+    # ---- Internal ----
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.base_backoff * (2 ** attempts), self.max_backoff)
+        return delay * random.uniform(0.5, 1.0)
+    
+    def _set_online(self, name: str):
+        with self._cond:
+            health = self._devices[name].health
+            changed = health.state != DeviceState.ONLINE
+            health.state = DeviceState.ONLINE
+            health.failures = 0
+            health.reconnect_attempts = 0
+            health.next_retry = None
+            health.next_probe = self.clock() + self.probe_interval
+            if changed:
+                health.since = self.clock()
+            self._cond.notify_all()
+        if changed:
+            logger.info(f"🟢 {name} online")
+            self._notify(name)
+    
+    def _set_offline(self, name: str, error: Any = None):
+        with self._cond:
+            health = self._devices[name].health
+            changed = health.state not in (DeviceState.OFFLINE, DeviceState.RECONNECTING)
+            health.state = DeviceState.OFFLINE
+            health.last_error = str(error) if error is not None else health.last_error
+            health.next_probe = None
+            health.next_retry = self.clock() + self._backoff(health.reconnect_attempts)
+            if changed:
+                health.since = self.clock()
+            self._cond.notify_all()
+        if changed:
+            logger.warning(f"🔴 {name} offline: {error} - thử kết nối lại sau "
+                           f"{health.next_retry - self.clock():.1f}s")
+            self._notify(name)
+    
+    def _notify(self, name: str):
+        health = self.snapshot()[name]
+        for callback in self._listeners:
+            try:
+                callback(health)
+            except Exception as e:
+                logger.error(f"❌ Device health listener error: {e}")
+    
+    def _due_work(self):
+        """Việc đến hạn (tên, loại) và thời gian chờ tới việc kế tiếp"""
+        now = self.clock()
+        due, wait = [], None
+        for name, device in self._devices.items():
+            health = device.health
+            deadline, kind = None, None
+            if health.state == DeviceState.OFFLINE and health.next_retry is not None:
+                deadline, kind = health.next_retry, "reconnect"
+            elif health.state == DeviceState.ONLINE and device.probe and health.next_probe is not None:
+                deadline, kind = health.next_probe, "probe"
+            if deadline is None:
+                continue
+            if deadline <= now:
+                due.append((name, kind))
+                if kind == "reconnect":
+                    health.state = DeviceState.RECONNECTING
+                else:
+                    health.next_probe = now + self.probe_interval
+            else:
+                wait = deadline - now if wait is None else min(wait, deadline - now)
+        return due, wait
+    
+    def _monitor_loop(self):
+        while True:
+            with self._cond:
+                if not self._running:
+                    return
+                due, wait = self._due_work()
+                if not due:
+                    self._cond.wait(timeout=wait if wait is not None else self.probe_interval)
+                    continue
+            
+            for name, kind in due:
+                if kind == "reconnect":
+                    self._reconnect(name)
+                else:
+                    self._probe(name)
+    
+    def _reconnect(self, name: str):
+        device = self._devices[name]
+        with self._cond:
+            device.health.reconnect_attempts += 1
+            attempt = device.health.reconnect_attempts
+        logger.info(f"🔄 Kết nối lại {name} (lần {attempt})")
+        try:
+            driver = device.connect()
+            if device.attach:
+                device.attach(driver)
+        except Exception as e:
+            with self._cond:
+                device.health.state = DeviceState.OFFLINE
+                device.health.last_error = str(e)
+                device.health.next_retry = self.clock() + self._backoff(attempt)
+            logger.warning(f"⚠️ Kết nối lại {name} thất bại: {e} "
+                           f"(thử lại sau {device.health.next_retry - self.clock():.1f}s)")
+            return
+        self._set_online(name)
+    
+    def _probe(self, name: str):
+        device = self._devices[name]
+        try:
+            ok = device.probe()
+        except Exception as e:
+            ok, error = False, e
+        else:
+            error = "probe failed"
+        if ok:
+            self.report_success(name)
+        else:
+            self.report_failure(name, error)
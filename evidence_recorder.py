@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+GHI ẢNH BẰNG CHỨNG BẤT ĐỒNG BỘ
+Giữ vòng đệm các frame gần nhất từ vòng lặp camera; khi mở cửa / khuôn mặt
+lạ / thẻ sai, một loạt ảnh JPEG (trước + sau sự kiện) được mã hóa và ghi
+trên luồng nền qua hàng đợi giới hạn - vòng lặp nhận diện và relay không bao
+giờ phải chờ. Dung lượng lưu trữ có giới hạn, thư mục cũ nhất bị xóa trước.
+"""
+
+import json
+import logging
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from lazy_imports import lazy_module
+
+cv2 = lazy_module("cv2")
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class EvidenceJob:
+    event_id: str
+    reason: str
+    identity: Optional[str]
+    detail: Dict[str, Any]
+    triggered_at: float
+    frames: List[Tuple[float, Any]]
+    post_frames: int = 0  # Số frame còn phải chờ sau sự kiện
+
+
+@dataclass
+class EvidenceStats:
+    triggered: int = 0
+    written: int = 0
+    dropped: int = 0  # Hàng đợi đầy - bỏ sự kiện thay vì chặn luồng gọi
+    throttled: int = 0  # Cùng lý do trong thời gian cooldown
+    evicted: int = 0
+    bytes_stored: int = 0
+    write_ms: List[float] = field(default_factory=list)
+
+
+class EvidenceRecorder:
+    """Vòng đệm frame + luồng ghi JPEG nền (add_frame / trigger an toàn đa luồng)"""
+    
+    def __init__(self, root: str, ring_size: int = 30, pre_frames: int = 6, post_frames: int = 6,
+                 max_bytes: int = 512 * 1024 * 1024, queue_size: int = 4, jpeg_quality: int = 80,
+                 cooldown: float = 5.0, max_frame_age: float = 10.0, post_timeout: float = 3.0):
+        self.root = root
+        self.pre_frames = pre_frames
+        self.post_frames = post_frames
+        self.max_bytes = max_bytes
+        self.jpeg_quality = jpeg_quality
+        self.cooldown = cooldown
+        self.max_frame_age = max_frame_age
+        self.post_timeout = post_timeout
+        self.stats = EvidenceStats()
+        
+        self._ring: Deque[Tuple[float, Any]] = deque(maxlen=ring_size)
+        self._pending: List[EvidenceJob] = []
+        self._last_trigger: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._queue: "queue.Queue[Optional[EvidenceJob]]" = queue.Queue(maxsize=queue_size)
+        self._counter = 0
+        
+        os.makedirs(root, exist_ok=True)
+        self._stored: Deque[Tuple[str, int]] = deque(self._scan_storage())
+        self.stats.bytes_stored = sum(size for _, size in self._stored)
+        
+        self._thread = threading.Thread(target=self._worker, name="evidence-writer", daemon=True)
+        self._thread.start()
+    
+    # ---- Producer side (camera loop, Tk thread) ----
+    def add_frame(self, frame: Any):
+        """Thêm frame vào vòng đệm - chỉ lưu tham chiếu, không copy / mã hóa"""
+        now = time.time()
+        with self._lock:
+            self._ring.append((now, frame))
+            if not self._pending:
+                return
+            ready = []
+            for job in self._pending:
+                job.frames.append((now, frame))
+                job.post_frames -= 1
+                if job.post_frames <= 0:
+                    ready.append(job)
+            self._pending = [job for job in self._pending if job.post_frames > 0]
+        for job in ready:
+            self._enqueue(job)
+    
+    def trigger(self, reason: str, identity: Optional[str] = None, post_frames: Optional[int] = None,
+                **detail) -> Optional[str]:
+        """Ghi bằng chứng cho sự kiện, trả về mã sự kiện (None nếu bị bỏ qua)"""
+        now = time.time()
+        post_frames = self.post_frames if post_frames is None else post_frames
+        with self._lock:
+            last = self._last_trigger.get(reason)
+            if last is not None and now - last < self.cooldown:
+                self.stats.throttled += 1
+                return None
+            self._last_trigger[reason] = now
+            self.stats.triggered += 1
+            
+            frames = [(ts, frame) for ts, frame in self._ring if now - ts <= self.max_frame_age]
+            frames = frames[-self.pre_frames:] if self.pre_frames else []
+            self._counter += 1
+            stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now))
+            label = re.sub(r"[^A-Za-z0-9_-]+", "_", f"{reason}_{identity}" if identity else reason)
+            job = EvidenceJob(f"{stamp}-{self._counter:04d}-{label}", reason, identity, detail, now,
+                              frames, post_frames)
+            if post_frames > 0:
+                self._pending.append(job)
+                return job.event_id
+        return job.event_id if self._enqueue(job) else None
+    
+    def _enqueue(self, job: EvidenceJob) -> bool:
+        if not job.frames:
+            logger.debug(f"Evidence {job.event_id}: không có frame gần đây")
+            return False
+        try:
+            self._queue.put_nowait(job)
+            return True
+        except queue.Full:
+            self.stats.dropped += 1
+            logger.warning(f"⚠️ Evidence queue đầy - bỏ {job.event_id}")
+            return False
+    
+    # ---- Writer thread ----
+    def _expire_pending(self):
+        """Camera ngừng cấp frame - ghi sự kiện với số frame sau đã có"""
+        now = time.time()
+        with self._lock:
+            expired = [job for job in self._pending if now - job.triggered_at >= self.post_timeout]
+            self._pending = [job for job in self._pending if job not in expired]
+        for job in expired:
+            self._enqueue(job)
+    
+    def _worker(self):
+        while True:
+            self._expire_pending()
+            try:
+                job = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if job is None:
+                return
+            try:
+                self._write(job)
+            except Exception as e:
+                logger.error(f"❌ Evidence write error ({job.event_id}): {e}")
+    
+    def _write(self, job: EvidenceJob):
+        started = time.perf_counter()
+        day_dir = os.path.join(self.root, time.strftime("%Y-%m-%d", time.localtime(job.triggered_at)))
+        event_dir = os.path.join(day_dir, job.event_id)
+        os.makedirs(event_dir, exist_ok=True)
+        
+        size = 0
+        frames_meta = []
+        params = [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality]
+        for index, (ts, frame) in enumerate(job.frames):
+            if frame.ndim == 3 and frame.shape[2] == 4:
+                frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+            ok, encoded = cv2.imencode(".jpg", frame, params)
+            if not ok:
+                continue
+            name = f"frame_{index:02d}.jpg"
+            with open(os.path.join(event_dir, name), "wb") as f:
+                f.write(encoded.tobytes())
+            size += len(encoded)
+            frames_meta.append({"file": name, "ts": round(ts, 3), "offset": round(ts - job.triggered_at, 3)})
+        
+        meta = {"event_id": job.event_id, "reason": job.reason, "identity": job.identity,
+                "ts": job.triggered_at, "detail": job.detail, "frames": frames_meta}
+        meta_bytes = json.dumps(meta, ensure_ascii=False, indent=1, default=str).encode("utf-8")
+        with open(os.path.join(event_dir, "meta.json"), "wb") as f:
+            f.write(meta_bytes)
+        size += len(meta_bytes)
+        
+        self._stored.append((event_dir, size))
+        self.stats.bytes_stored += size
+        self.stats.written += 1
+        self.stats.write_ms = (self.stats.write_ms + [(time.perf_counter() - started) * 1000])[-100:]
+        self._evict()
+        logger.info(f"📸 Evidence {job.event_id}: {len(frames_meta)} ảnh, {size / 1024:.0f} KB")
+    
+    # ---- Storage cap ----
+    def _scan_storage(self) -> List[Tuple[str, int]]:
+        """Các thư mục sự kiện đã có, cũ nhất trước (tên thư mục theo thời gian)"""
+        stored = []
+        for day in sorted(os.listdir(self.root)):
+            day_dir = os.path.join(self.root, day)
+            if not os.path.isdir(day_dir):
+                continue
+            for event_id in sorted(os.listdir(day_dir)):
+                event_dir = os.path.join(day_dir, event_id)
+                if os.path.isdir(event_dir):
+                    size = sum(entry.stat().st_size for entry in os.scandir(event_dir) if entry.is_file())
+                    stored.append((event_dir, size))
+        return stored
+    
+    def _evict(self):
+        while self.stats.bytes_stored > self.max_bytes and len(self._stored) > 1:
+            event_dir, size = self._stored.popleft()
+            shutil.rmtree(event_dir, ignore_errors=True)
+            self.stats.bytes_stored -= size
+            self.stats.evicted += 1
+            day_dir = os.path.dirname(event_dir)
+            if not os.listdir(day_dir):
+                os.rmdir(day_dir)
+            logger.info(f"🗑️ Evidence cũ đã xóa: {os.path.basename(event_dir)}")
+    
+    def close(self, timeout: float = 5.0):
+        """Ghi nốt hàng đợi (kể cả sự kiện đang chờ frame sau) rồi dừng luồng ghi"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        for job in pending:
+            self._enqueue(job)
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            logger.warning("⚠️ Evidence writer chưa ghi xong")
+            return
+        self._thread.join(timeout=timeout)
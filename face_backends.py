@@ -0,0 +1,662 @@
+#!/usr/bin/env python3
+"""
+BACKEND NHẬN DIỆN KHUÔN MẶT CÓ THỂ THAY THẾ
+README.py dùng HOG + encoding dlib (face_recognition), KETHOP2 dùng SSD của
+OpenCV DNN + LBPH. Mỗi backend ở đây là một bộ phát hiện (hog, ssd, yunet)
+ghép với một bộ trích đặc trưng (dlib, lbph, onnx) sau cùng giao diện
+detect / embed / match, chọn bằng chuỗi cấu hình dạng "yunet+onnx". Lệnh
+bench chạy mọi backend khả dụng trên cùng bộ ảnh <photos>/<tên>/*.jpg và đề
+xuất backend nhanh nhất đủ chính xác cho thiết bị đang chạy.
+
+    python3 face_backends.py list --models models
+    python3 face_backends.py bench --models models --photos /media/usb/staff
+    python3 face_backends.py bench --models models --photos staff -b ssd+lbph -b yunet+onnx -o pi4.json
+"""
+
+import argparse
+import importlib.util
+import json
+import logging
+import os
+import platform
+import sys
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Type
+
+from face_model_store import IncrementalFaceStore
+from lazy_imports import lazy_module
+
+cv2 = lazy_module("cv2")
+np = lazy_module("numpy")
+face_recognition = lazy_module("face_recognition")
+onnxruntime = lazy_module("onnxruntime")
+
+logger = logging.getLogger(__name__)
+
+Box = Tuple[int, int, int, int]  # x, y, w, h
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp"}
+
+DETECTORS: Dict[str, Type["FaceDetector"]] = {}
+EMBEDDERS: Dict[str, Type["FaceEmbedder"]] = {}
+ALIASES = {"hog": "hog+dlib", "dlib": "hog+dlib", "lbph": "ssd+lbph", "onnx": "yunet+onnx"}
+
+
+def register_detector(name: str) -> Callable:
+    def decorator(cls):
+        cls.name = name
+        DETECTORS[name] = cls
+        return cls
+    return decorator
+
+
+def register_embedder(name: str) -> Callable:
+    def decorator(cls):
+        cls.name = name
+        EMBEDDERS[name] = cls
+        return cls
+    return decorator
+
+
+# ==== INTERFACE ====
+class _Component:
+    name = ""
+    REQUIRES: Tuple[str, ...] = ()  # Module Python cần có
+    FILES: Dict[str, str] = {}  # Tùy chọn -> tên file model mặc định trong models_path
+    
+    def __init__(self, models_path: str = ".", **options):
+        self.models_path = models_path
+        self.options = options
+    
+    def _file(self, key: str) -> str:
+        return os.path.join(self.models_path, self.options.get(key, self.FILES[key]))
+    
+    @classmethod
+    def missing(cls, models_path: str = ".", **options) -> List[str]:
+        """Module / file model còn thiếu (không nạp gì)"""
+        missing = [module for module in cls.REQUIRES if importlib.util.find_spec(module) is None]
+        for key, default in cls.FILES.items():
+            path = os.path.join(models_path, options.get(key, default))
+            if not os.path.exists(path):
+                missing.append(path)
+        return missing
+
+
+class FaceDetector(_Component):
+    """Tìm khuôn mặt trên ảnh BGR, trả về các bbox (x, y, w, h) trên ảnh gốc"""
+    
+    SCALE = 1.0  # Thu nhỏ trước khi phát hiện (tùy chọn detect_scale)
+    
+    def detect(self, image: "np.ndarray") -> List[Box]:
+        scale = float(self.options.get("detect_scale", self.SCALE))
+        small = image if scale == 1.0 else cv2.resize(image, (0, 0), fx=scale, fy=scale,
+                                                      interpolation=cv2.INTER_AREA)
+        height, width = image.shape[:2]
+        boxes = []
+        for x, y, w, h in self._detect(small):
+            x, y = max(int(x / scale), 0), max(int(y / scale), 0)
+            w, h = min(int(w / scale), width - x), min(int(h / scale), height - y)
+            if w > 0 and h > 0:
+                boxes.append((x, y, w, h))
+        return boxes
+    
+    def _detect(self, image: "np.ndarray") -> List[Box]:
+        raise NotImplementedError
+
+
+class FaceEmbedder(_Component):
+    """Vector đặc trưng cho từng bbox + khoảng cách tới thư viện (nhỏ hơn = giống hơn)"""
+    
+    METRIC = "euclidean"  # "euclidean", "cosine" (vector chuẩn hóa L2) hoặc "chi2"
+    THRESHOLD = 0.6  # Khoảng cách tối đa coi là cùng người
+    
+    def embed(self, image: "np.ndarray", boxes: Sequence[Box]) -> List["np.ndarray"]:
+        raise NotImplementedError
+    
+    def distances(self, embedding: "np.ndarray", gallery: "np.ndarray") -> "np.ndarray":
+        if self.METRIC == "cosine":
+            return 1.0 - gallery @ embedding
+        if self.METRIC == "chi2":
+            # Như HISTCMP_CHISQR_ALT mà LBPH của OpenCV dùng
+            return 2.0 * (np.square(gallery - embedding) / (gallery + embedding + 1e-10)).sum(axis=1)
+        return np.linalg.norm(gallery - embedding, axis=1)
+
+
+def _crop(image: "np.ndarray", box: Box, pad: float = 0.0) -> "np.ndarray":
+    x, y, w, h = box
+    height, width = image.shape[:2]
+    pad_x, pad_y = int(w * pad), int(h * pad)
+    crop = image[max(y - pad_y, 0):min(y + h + pad_y, height), max(x - pad_x, 0):min(x + w + pad_x, width)]
+    return crop if crop.size else image
+
+
+# ==== DETECTORS ====
+@register_detector("hog")
+class HogDetector(FaceDetector):
+    """HOG của dlib (face_recognition) - không cần file model, chậm trên ảnh lớn"""
+    REQUIRES = ("face_recognition",)
+    SCALE = 0.5
+    
+    def _detect(self, image):
+        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        locations = face_recognition.face_locations(rgb, self.options.get("upsample", 1), model="hog")
+        return [(left, top, right - left, bottom - top) for top, right, bottom, left in locations]
+
+
+@register_detector("ssd")
+class SsdDetector(FaceDetector):
+    """ResNet-10 SSD (Caffe) qua OpenCV DNN - bộ phát hiện của ImprovedFaceRecognition"""
+    REQUIRES = ("cv2",)
+    FILES = {"prototxt": "deploy.prototxt", "caffemodel": "res10_300x300_ssd_iter_140000.caffemodel"}
+    
+    def __init__(self, models_path: str = ".", **options):
+        super().__init__(models_path, **options)
+        self.confidence = float(options.get("confidence", 0.5))
+        self.net = cv2.dnn.readNetFromCaffe(self._file("prototxt"), self._file("caffemodel"))
+    
+    def _detect(self, image):
+        height, width = image.shape[:2]
+        blob = cv2.dnn.blobFromImage(cv2.resize(image, (300, 300)), 1.0, (300, 300), (104.0, 177.0, 123.0))
+        self.net.setInput(blob)
+        detections = self.net.forward()[0, 0]
+        boxes = []
+        for detection in detections[detections[:, 2] >= self.confidence]:
+            left, top, right, bottom = detection[3:7] * np.array([width, height, width, height])
+            boxes.append((int(left), int(top), int(right - left), int(bottom - top)))
+        return boxes
+
+
+@register_detector("yunet")
+class YuNetDetector(FaceDetector):
+    """YuNet (ONNX) qua cv2.FaceDetectorYN (OpenCV >= 4.5.4) - nhỏ và nhanh trên CPU ARM"""
+    REQUIRES = ("cv2",)
+    FILES = {"yunet": "face_detection_yunet_2023mar.onnx"}
+    
+    def __init__(self, models_path: str = ".", **options):
+        super().__init__(models_path, **options)
+        self.net = cv2.FaceDetectorYN.create(self._file("yunet"), "", (320, 320),
+                                             float(options.get("confidence", 0.5)), 0.3, 5000)
+        self._size: Optional[Tuple[int, int]] = None
+    
+    def _detect(self, image):
+        size = (image.shape[1], image.shape[0])
+        if size != self._size:
+            self.net.setInputSize(size)
+            self._size = size
+        _, faces = self.net.detect(image)
+        return [] if faces is None else [tuple(int(v) for v in face[:4]) for face in faces]
+
+
+# ==== EMBEDDERS ====
+@register_embedder("dlib")
+class DlibEmbedder(FaceEmbedder):
+    """Encoding 128 chiều của dlib (face_recognition) - tương thích encodings.pickle của README.py"""
+    REQUIRES = ("face_recognition",)
+    
+    def embed(self, image, boxes):
+        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        locations = [(y, x + w, y + h, x) for x, y, w, h in boxes]
+        return [np.asarray(encoding, dtype=np.float32)
+                for encoding in face_recognition.face_encodings(rgb, locations)]
+
+
+@register_embedder("lbph")
+class LbphEmbedder(FaceEmbedder):
+    """Histogram LBP 256 bin theo lưới 8x8, radius 1, 8 điểm như LBPHFaceRecognizer (cùng thang
+    khoảng cách với FACE_RECOGNITION_THRESHOLD) - chỉ cần numpy, không cần opencv-contrib"""
+    REQUIRES = ("cv2",)
+    METRIC = "chi2"
+    THRESHOLD = 85.0
+    SIZE = 98  # Ảnh mã LBP 96x96 -> ô 12x12
+    GRID = 8
+    
+    def __init__(self, models_path: str = ".", **options):
+        super().__init__(models_path, **options)
+        codes = self.SIZE - 2
+        cell = codes // self.GRID
+        rows = np.minimum(np.arange(codes) // cell, self.GRID - 1)
+        self._cells = (rows[:, None] * self.GRID + rows[None, :]) * 256
+        self._cell_pixels = float(cell * cell)
+    
+    def embed(self, image, boxes):
+        return [self._histogram(_crop(image, box)) for box in boxes]
+    
+    def _histogram(self, face: "np.ndarray") -> "np.ndarray":
+        gray = cv2.cvtColor(face, cv2.COLOR_BGR2GRAY) if face.ndim == 3 else face
+        gray = cv2.equalizeHist(cv2.resize(gray, (self.SIZE, self.SIZE), interpolation=cv2.INTER_AREA))
+        center = gray[1:-1, 1:-1]
+        code = np.zeros(center.shape, dtype=np.int32)
+        size = self.SIZE
+        for bit, (dy, dx) in enumerate(((-1, -1), (-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1))):
+            code |= (gray[1 + dy:size - 1 + dy, 1 + dx:size - 1 + dx] >= center).astype(np.int32) << bit
+        histogram = np.bincount((self._cells + code).ravel(), minlength=self.GRID * self.GRID * 256)
+        return histogram.astype(np.float32) / self._cell_pixels
+
+
+@register_embedder("onnx")
+class OnnxEmbedder(FaceEmbedder):
+    """Mạng embedding ONNX (ArcFace / MobileFaceNet, đầu vào NCHW 112x112) trên ONNX Runtime CPU"""
+    REQUIRES = ("onnxruntime",)
+    FILES = {"embedding_model": "face_embedding.onnx"}
+    METRIC = "cosine"
+    THRESHOLD = 0.6  # Khoảng cách cosin - tương đương độ tương đồng >= 0.4
+    
+    def __init__(self, models_path: str = ".", **options):
+        super().__init__(models_path, **options)
+        session_options = onnxruntime.SessionOptions()
+        session_options.intra_op_num_threads = int(options.get("threads", 0))
+        self.session = onnxruntime.InferenceSession(self._file("embedding_model"), session_options,
+                                                    providers=["CPUExecutionProvider"])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        height, width = model_input.shape[2:4]
+        # Kích thước động (tên chiều thay vì số) -> 112x112 như ArcFace / MobileFaceNet
+        self.input_size = (width, height) if isinstance(width, int) and isinstance(height, int) else (112, 112)
+        self.batched = not isinstance(model_input.shape[0], int)  # Batch động -> mọi khuôn mặt một lần chạy
+    
+    def embed(self, image, boxes):
+        if not boxes:
+            return []
+        faces = [cv2.resize(_crop(image, box, pad=0.1), self.input_size, interpolation=cv2.INTER_AREA)
+                 for box in boxes]
+        blob = (np.stack(faces)[..., ::-1].astype(np.float32) - 127.5) / 127.5
+        blob = np.ascontiguousarray(blob.transpose(0, 3, 1, 2))
+        if self.batched:
+            outputs = self.session.run(None, {self.input_name: blob})[0]
+        else:
+            outputs = np.concatenate([self.session.run(None, {self.input_name: blob[i:i + 1]})[0]
+                                      for i in range(len(faces))])
+        outputs = outputs.reshape(len(faces), -1).astype(np.float32)
+        return list(outputs / (np.linalg.norm(outputs, axis=1, keepdims=True) + 1e-10))
+
+
+# ==== BACKEND ====
+def resolve_backend(spec: str) -> str:
+    """"hog" / "yunet+onnx"... -> "bộ phát hiện+bộ trích đặc trưng" đã kiểm tra"""
+    spec = ALIASES.get(spec.strip().lower(), spec.strip().lower())
+    detector, _, embedder = spec.partition("+")
+    if detector not in DETECTORS or embedder not in EMBEDDERS:
+        raise ValueError(f"Backend không hợp lệ: {spec} (bộ phát hiện: {', '.join(DETECTORS)}; "
+                         f"đặc trưng: {', '.join(EMBEDDERS)})")
+    return spec
+
+
+def backend_modules(spec: str) -> List[str]:
+    """Module nặng backend cần - để nạp trước trên luồng nền"""
+    detector, _, embedder = resolve_backend(spec).partition("+")
+    return list(dict.fromkeys(DETECTORS[detector].REQUIRES + EMBEDDERS[embedder].REQUIRES))
+
+
+def missing(spec: str, models_path: str = ".", **options) -> List[str]:
+    detector, _, embedder = resolve_backend(spec).partition("+")
+    return sorted(set(DETECTORS[detector].missing(models_path, **options) +
+                      EMBEDDERS[embedder].missing(models_path, **options)))
+
+
+def available_backends(models_path: str = ".", **options) -> Dict[str, List[str]]:
+    """Mọi tổ hợp bộ phát hiện x bộ đặc trưng -> những gì còn thiếu (rỗng = dùng được)"""
+    return {f"{detector}+{embedder}": missing(f"{detector}+{embedder}", models_path, **options)
+            for detector in DETECTORS for embedder in EMBEDDERS}
+
+
+def gallery_path(base_path: str, spec: str) -> str:
+    """Encoding của mỗi bộ đặc trưng nằm trong file riêng; dlib giữ nguyên file gốc"""
+    embedder = resolve_backend(spec).partition("+")[2]
+    if embedder == "dlib":
+        return base_path
+    root, ext = os.path.splitext(base_path)
+    return f"{root}.{embedder}{ext or '.pickle'}"
+
+
+class FaceBackend:
+    """Bộ phát hiện + bộ trích đặc trưng + so khớp với thư viện khuôn mặt"""
+    
+    def __init__(self, detector: FaceDetector, embedder: FaceEmbedder, threshold: Optional[float] = None):
+        self.detector = detector
+        self.embedder = embedder
+        self.name = f"{detector.name}+{embedder.name}"
+        self.threshold = embedder.THRESHOLD if threshold is None else threshold
+        self._names: List[str] = []
+        self._matrix = None
+    
+    @staticmethod
+    def _bgr(image: "np.ndarray") -> "np.ndarray":
+        """Frame XRGB8888 của Picamera2 có 4 kênh"""
+        return cv2.cvtColor(image, cv2.COLOR_BGRA2BGR) if image.ndim == 3 and image.shape[2] == 4 else image
+    
+    def detect(self, image: "np.ndarray") -> List[Box]:
+        return self.detector.detect(self._bgr(image))
+    
+    def embed(self, image: "np.ndarray", boxes: Sequence[Box]) -> List["np.ndarray"]:
+        return self.embedder.embed(self._bgr(image), boxes) if boxes else []
+    
+    def set_gallery(self, encodings: Sequence[Any], names: Sequence[str]):
+        """Ma trận encoding dựng một lần - match() chỉ là một phép tính vector"""
+        self._names = list(names)
+        self._matrix = np.asarray(encodings, dtype=np.float32) if len(encodings) else None
+    
+    def match(self, embedding: "np.ndarray") -> Tuple[Optional[str], float]:
+        """(tên gần nhất nếu trong ngưỡng, khoảng cách)"""
+        if self._matrix is None:
+            return None, float("inf")
+        distances = self.embedder.distances(np.asarray(embedding, dtype=np.float32), self._matrix)
+        best = int(np.argmin(distances))
+        distance = float(distances[best])
+        return (self._names[best] if distance <= self.threshold else None), distance
+    
+    def score(self, distance: float) -> float:
+        """Khoảng cách -> độ tin cậy 0..100 (đúng ngưỡng = 50)"""
+        return max(0.0, 1.0 - distance / (2 * self.threshold)) * 100
+
+
+def create_backend(spec: str, models_path: str = ".", threshold: Optional[float] = None,
+                   **options) -> FaceBackend:
+    """Tạo backend từ chuỗi cấu hình; tùy chọn (confidence, detect_scale, threads...)
+    được chuyển cho cả hai thành phần"""
+    detector, _, embedder = resolve_backend(spec).partition("+")
+    return FaceBackend(DETECTORS[detector](models_path, **options),
+                       EMBEDDERS[embedder](models_path, **options), threshold)
+
+
+@dataclass
+class BackendFaceResult:
+    """Cùng các thuộc tính FaceDetectionResult mà vòng lặp xác thực / GUI dùng"""
+    detected: bool = False
+    recognized: bool = False
+    person_name: Optional[str] = None
+    confidence: float = 0.0
+    bbox: Optional[Box] = None  # x, y, w, h trên frame gốc
+    distance: Optional[float] = None
+    source: str = ""
+
+
+class BackendRecognizer:
+    """Thay thế ImprovedFaceRecognition bằng một FaceBackend: process_frame, đăng ký khuôn mặt
+    và thư viện encoding cập nhật tăng dần (IncrementalFaceStore)"""
+    
+    def __init__(self, backend: FaceBackend, gallery_file: str, compact_every: int = 50):
+        self.backend = backend
+        self.store = IncrementalFaceStore(gallery_file, compact_every=compact_every)
+        self.face_data = self.store.snapshot()
+        logger.info(f"🤖 Face backend {backend.name}: {len(self.store.people())} người ({gallery_file})")
+    
+    @property
+    def face_data(self) -> Dict[str, List]:
+        return self._face_data
+    
+    @face_data.setter
+    def face_data(self, data: Dict[str, List]):
+        self._face_data = data
+        self.backend.set_gallery(data["encodings"], data["names"])
+    
+    def process_frame(self, frame: "np.ndarray") -> Tuple["np.ndarray", BackendFaceResult]:
+        """Chỉ khuôn mặt lớn nhất (người đứng trước cửa) được trích đặc trưng"""
+        boxes = self.backend.detect(frame)
+        if not boxes:
+            return frame, BackendFaceResult(source=self.backend.name)
+        box = max(boxes, key=lambda b: b[2] * b[3])
+        embeddings = self.backend.embed(frame, [box])
+        if not embeddings:
+            return frame, BackendFaceResult(True, bbox=box, source=self.backend.name)
+        name, distance = self.backend.match(embeddings[0])
+        result = BackendFaceResult(True, name is not None, name, self.backend.score(distance), box,
+                                   distance, self.backend.name)
+        return annotate(frame, result), result
+    
+    def capture_training_images(self, frame: "np.ndarray", count: int = 1) -> List["np.ndarray"]:
+        """Ảnh khuôn mặt (lớn nhất trước) cắt từ frame cho pipeline đăng ký"""
+        boxes = sorted(self.backend.detect(frame), key=lambda b: b[2] * b[3], reverse=True)
+        return [_crop(frame, box, pad=0.2).copy() for box in boxes[:count]]
+    
+    def _encode_images(self, images) -> List[List[float]]:
+        encodings = []
+        for image in images:
+            height, width = image.shape[:2]
+            # Ảnh đã cắt sẵn khuôn mặt thì dùng cả khung hình
+            boxes = self.backend.detect(image) or [(0, 0, width, height)]
+            found = self.backend.embed(image, [max(boxes, key=lambda b: b[2] * b[3])])
+            if found:
+                encodings.append(found[0].tolist())
+        return encodings
+    
+    def add_person(self, person_name: str, images) -> bool:
+        encodings = self._encode_images(images)
+        if not encodings:
+            logger.warning(f"⚠️ Không tạo được encoding cho {person_name}")
+            return False
+        self.store.add_person(person_name, encodings)
+        self.face_data = self.store.snapshot()
+        logger.info(f"✅ Đã thêm {len(encodings)} encoding ({self.backend.name}) cho {person_name}")
+        return True
+    
+    def remove_person(self, person_name: str) -> bool:
+        removed = self.store.remove_person(person_name)
+        self.face_data = self.store.snapshot()
+        return removed > 0
+    
+    def get_database_info(self) -> Dict[str, Any]:
+        people = self.store.people()
+        return {"total_people": len(people), "backend": self.backend.name,
+                "people": {name: {"face_count": count} for name, count in people.items()}}
+
+
+def annotate(frame: "np.ndarray", result: BackendFaceResult) -> "np.ndarray":
+    """Khung xanh (đã nhận diện) / đỏ (người lạ) như model cục bộ"""
+    if result.bbox is None:
+        return frame
+    x, y, w, h = result.bbox
+    color = (0, 255, 0) if result.recognized else (0, 0, 255)
+    label = f"{result.person_name} {result.confidence:.0f}" if result.recognized else "Unknown"
+    frame = frame.copy()
+    cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
+    cv2.putText(frame, label, (x, max(y - 8, 12)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+    return frame
+
+
+# ==== BENCHMARK ====
+@dataclass
+class BackendBenchmark:
+    backend: str
+    images: int = 0
+    detect_ms: float = 0.0  # Trung bình mỗi ảnh
+    embed_ms: float = 0.0  # Trung bình mỗi khuôn mặt
+    match_us: float = 0.0
+    detection_rate: float = 0.0
+    accuracy: Optional[float] = None  # Ảnh thử của người đã đăng ký được nhận đúng
+    false_accept: Optional[float] = None  # Ảnh thử của người chưa đăng ký bị nhận nhầm
+    error: Optional[str] = None
+    
+    @property
+    def frame_ms(self) -> float:
+        return self.detect_ms + self.embed_ms
+
+
+def load_photos(root: str, max_size: int = 800) -> Dict[str, List["np.ndarray"]]:
+    """{tên người: [ảnh BGR]} từ <root>/<tên>/..., ảnh lớn thu nhỏ về cỡ frame camera"""
+    photos: Dict[str, List] = {}
+    for person in sorted(os.listdir(root)):
+        person_dir = os.path.join(root, person)
+        if not os.path.isdir(person_dir):
+            continue
+        for filename in sorted(os.listdir(person_dir)):
+            if os.path.splitext(filename)[1].lower() not in IMAGE_EXTENSIONS:
+                continue
+            image = cv2.imread(os.path.join(person_dir, filename))
+            if image is None:
+                continue
+            scale = max_size / max(image.shape[:2])
+            if scale < 1:
+                image = cv2.resize(image, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            photos.setdefault(person, []).append(image)
+    return photos
+
+
+def _bench_backend(backend: FaceBackend, photos: Dict[str, List], enroll: int,
+                   unknown_every: int) -> BackendBenchmark:
+    """Mỗi người: `enroll` ảnh đầu vào thư viện, phần còn lại là ảnh thử.
+    Cứ `unknown_every` người thì một người không đăng ký - đo nhận nhầm"""
+    result = BackendBenchmark(backend.name)
+    detect_s = embed_s = 0.0
+    faces = 0
+    encodings, names = [], []
+    probes: List[Tuple[Optional[str], Any]] = []
+    for index, (person, images) in enumerate(photos.items()):
+        known = unknown_every <= 0 or index % unknown_every != unknown_every - 1
+        for position, image in enumerate(images):
+            started = time.perf_counter()
+            boxes = backend.detect(image)
+            detect_s += time.perf_counter() - started
+            result.images += 1
+            if not boxes:
+                continue
+            started = time.perf_counter()
+            embedding = backend.embed(image, [max(boxes, key=lambda b: b[2] * b[3])])
+            embed_s += time.perf_counter() - started
+            faces += 1
+            if not embedding:
+                continue
+            if known and position < enroll:
+                encodings.append(embedding[0])
+                names.append(person)
+            else:
+                probes.append((person if known else None, embedding[0]))
+    
+    backend.set_gallery(encodings, names)
+    started = time.perf_counter()
+    matches = [(person, backend.match(embedding)[0]) for person, embedding in probes]
+    match_s = time.perf_counter() - started
+    
+    known_probes = [name for person, name in matches if person is not None]
+    unknown_probes = [name for person, name in matches if person is None]
+    result.detect_ms = detect_s / max(result.images, 1) * 1000
+    result.embed_ms = embed_s / max(faces, 1) * 1000
+    result.match_us = match_s / max(len(matches), 1) * 1e6
+    result.detection_rate = faces / max(result.images, 1)
+    if known_probes:
+        result.accuracy = sum(person == name for person, name in matches if person is not None) / len(known_probes)
+    if unknown_probes:
+        result.false_accept = sum(name is not None for name in unknown_probes) / len(unknown_probes)
+    return result
+
+
+def _bench_timing(backend: FaceBackend, frames: int, size: Tuple[int, int]) -> BackendBenchmark:
+    """Không có bộ ảnh: chỉ đo thời gian trên frame nhiễu cỡ camera, bbox cố định ở giữa"""
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 255, (size[1], size[0], 3), dtype=np.uint8)
+    box = (size[0] // 3, size[1] // 4, size[0] // 3, size[1] // 2)
+    result = BackendBenchmark(backend.name, images=frames)
+    started = time.perf_counter()
+    for _ in range(frames):
+        backend.detect(frame)
+    result.detect_ms = (time.perf_counter() - started) / frames * 1000
+    started = time.perf_counter()
+    for _ in range(frames):
+        embedding = backend.embed(frame, [box])
+    result.embed_ms = (time.perf_counter() - started) / frames * 1000
+    if embedding:
+        backend.set_gallery([embedding[0]] * 100, [f"person_{i}" for i in range(100)])
+        started = time.perf_counter()
+        for _ in range(frames):
+            backend.match(embedding[0])
+        result.match_us = (time.perf_counter() - started) / frames * 1e6
+    return result
+
+
+def benchmark(backends: Optional[Sequence[str]] = None, models_path: str = ".",
+              photos_dir: Optional[str] = None, enroll: int = 3, unknown_every: int = 5,
+              frames: int = 30, size: Tuple[int, int] = (800, 600), **options) -> List[BackendBenchmark]:
+    """So sánh các backend trên cùng dữ liệu; backend thiếu module / model được ghi lý do"""
+    specs = [resolve_backend(spec) for spec in backends] if backends else list(available_backends(models_path))
+    photos = load_photos(photos_dir) if photos_dir else None
+    results = []
+    for spec in specs:
+        lacking = missing(spec, models_path, **options)
+        if lacking:
+            results.append(BackendBenchmark(spec, error="thiếu " + ", ".join(lacking)))
+            continue
+        try:
+            backend = create_backend(spec, models_path, **options)
+            if photos:
+                results.append(_bench_backend(backend, photos, enroll, unknown_every))
+            else:
+                results.append(_bench_timing(backend, frames, size))
+        except Exception as e:
+            logger.warning(f"⚠️ {spec}: {e}")
+            results.append(BackendBenchmark(spec, error=str(e)))
+    return results
+
+
+def recommend(results: Sequence[BackendBenchmark], min_accuracy: float = 0.95,
+              max_false_accept: float = 0.02) -> Optional[BackendBenchmark]:
+    """Nhanh nhất trong các backend đủ chính xác; không backend nào đạt thì chính xác nhất"""
+    usable = [r for r in results if r.error is None]
+    if not usable:
+        return None
+    if all(r.accuracy is None for r in usable):
+        return min(usable, key=lambda r: r.frame_ms)
+    accurate = [r for r in usable if r.accuracy is not None and r.accuracy >= min_accuracy and
+                (r.false_accept is None or r.false_accept <= max_false_accept)]
+    if accurate:
+        return min(accurate, key=lambda r: r.frame_ms)
+    return max(usable, key=lambda r: (r.accuracy or 0.0, -r.frame_ms))
+
+
+def device_info() -> Dict[str, Any]:
+    return {"machine": platform.machine(), "processor": platform.processor() or platform.machine(),
+            "cpus": os.cpu_count(), "system": platform.platform(), "python": platform.python_version()}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Backend nhận diện khuôn mặt: liệt kê và so sánh")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("list", help="Các backend và thành phần còn thiếu")
+    p.add_argument("--models", default=".", help="Thư mục file model")
+    b = sub.add_parser("bench", help="So sánh tốc độ / độ chính xác")
+    b.add_argument("--models", default=".", help="Thư mục file model")
+    b.add_argument("--photos", help="Thư mục <tên>/*.jpg (không có = chỉ đo thời gian trên frame giả)")
+    b.add_argument("-b", "--backend", action="append", help="Backend cần đo (mặc định: tất cả)")
+    b.add_argument("--enroll", type=int, default=3, help="Số ảnh đầu của mỗi người đưa vào thư viện")
+    b.add_argument("--unknown-every", type=int, default=5, help="Cứ N người thì một người không đăng ký")
+    b.add_argument("--min-accuracy", type=float, default=0.95)
+    b.add_argument("--max-false-accept", type=float, default=0.02)
+    b.add_argument("-o", "--output", help="Ghi kết quả JSON (kèm thông tin thiết bị)")
+    args = parser.parse_args(argv)
+    
+    if args.command == "list":
+        for spec, lacking in available_backends(args.models).items():
+            print(f"{'✅' if not lacking else '❌'} {spec:<12} {'thiếu ' + ', '.join(lacking) if lacking else ''}")
+        return 0
+    
+    try:
+        results = benchmark(args.backend, args.models, args.photos, args.enroll, args.unknown_every)
+    except ValueError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    device = device_info()
+    print(f"📊 Face backend benchmark - {device['processor']}, {device['cpus']} CPU")
+    print(f"   {'backend':<12} {'detect ms':>10} {'embed ms':>9} {'match us':>9} {'faces':>6} {'acc':>6} {'FAR':>6}")
+    
+    def percent(value: Optional[float]) -> str:
+        return "-" if value is None else f"{value * 100:.1f}%"
+    
+    for r in results:
+        if r.error:
+            print(f"   {r.backend:<12} ⚠️ {r.error}")
+            continue
+        print(f"   {r.backend:<12} {r.detect_ms:>10.1f} {r.embed_ms:>9.1f} {r.match_us:>9.1f} "
+              f"{percent(r.detection_rate):>6} {percent(r.accuracy):>6} {percent(r.false_accept):>6}")
+    best = recommend(results, args.min_accuracy, args.max_false_accept)
+    if best is not None:
+        print(f"🏆 Đề xuất cho thiết bị này: FACE_BACKEND = \"{best.backend}\" (~{best.frame_ms:.1f} ms / frame)")
+    
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"device": device, "photos": args.photos, "recommended": best.backend if best else None,
+                       "results": [asdict(r) for r in results]}, f, ensure_ascii=False, indent=1)
+    return 0 if best is not None else 1
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main())
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+PIPELINE ĐĂNG KÝ KHUÔN MẶT THEO LUỒNG FRAME
+Mỗi khuôn mặt ứng viên được chấm điểm (độ nét, góc mặt, độ sáng) và so sánh
+trùng lặp với các mẫu đã giữ; chỉ giữ top-N mẫu đa dạng và kết thúc ngay khi
+đủ mẫu tốt thay vì chụp cố định 20 ảnh cách nhau 0.8s.
+"""
+
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SampleQuality:
+    sharpness: float
+    brightness: float
+    pose: float
+    score: float
+
+
+@dataclass
+class EnrollmentSample:
+    image: np.ndarray
+    quality: SampleQuality
+    signature: np.ndarray  # Vector 16x16 chuẩn hóa để đo trùng lặp
+    timestamp: float = field(default_factory=time.monotonic)
+
+
+@dataclass
+class EnrollmentProgress:
+    frames: int
+    candidates: int
+    kept: int
+    target: int
+    duplicates: int
+    rejected: int
+    done: bool
+    
+    @property
+    def percent(self) -> float:
+        return min(self.kept / self.target, 1.0) * 100 if self.target else 100.0
+
+
+class FaceQualityScorer:
+    """Chấm điểm ảnh khuôn mặt - chỉ dùng OpenCV, đủ nhanh cho Pi 5"""
+    
+    def __init__(self, sharpness_ref: float = 150.0, weights=(0.45, 0.25, 0.30)):
+        self.sharpness_ref = sharpness_ref
+        self.weights = weights
+    
+    @staticmethod
+    def _gray(image: np.ndarray) -> np.ndarray:
+        if image.ndim == 3:
+            return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+        return image
+    
+    def score(self, image: np.ndarray) -> SampleQuality:
+        gray = self._gray(image)
+        
+        # Độ nét: phương sai Laplacian
+        sharpness = min(cv2.Laplacian(gray, cv2.CV_64F).var() / self.sharpness_ref, 1.0)
+        
+        # Độ sáng: gần mức giữa và đủ tương phản
+        mean = float(gray.mean())
+        brightness = max(1.0 - abs(mean - 128.0) / 128.0, 0.0) * min(float(gray.std()) / 40.0, 1.0)
+        
+        # Góc mặt: mặt nhìn thẳng gần đối xứng trái-phải
+        small = cv2.resize(gray, (32, 32)).astype(np.float32)
+        asymmetry = float(np.abs(small - small[:, ::-1]).mean()) / 255.0
+        pose = max(1.0 - asymmetry * 4.0, 0.0)
+        
+        w_sharp, w_pose, w_bright = self.weights
+        total = w_sharp * sharpness + w_pose * pose + w_bright * brightness
+        return SampleQuality(sharpness, brightness, pose, total)
+    
+    def signature(self, image: np.ndarray) -> np.ndarray:
+        vec = cv2.resize(self._gray(image), (16, 16)).astype(np.float32).ravel()
+        vec -= vec.mean()
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm > 0 else vec
+
+
+class FaceEnrollmentPipeline:
+    """Nhận frame liên tục, giữ top-N mẫu chất lượng cao và không trùng lặp"""
+    
+    def __init__(self, extract_faces: Callable[[np.ndarray], List[np.ndarray]],
+                 target: int = 20, min_samples: int = 15, min_quality: float = 0.45,
+                 duplicate_threshold: float = 0.95, max_frames: int = 600,
+                 scorer: Optional[FaceQualityScorer] = None):
+        self.extract_faces = extract_faces
+        self.target = target
+        self.min_samples = min_samples
+        self.min_quality = min_quality
+        self.duplicate_threshold = duplicate_threshold
+        self.max_frames = max_frames
+        self.scorer = scorer or FaceQualityScorer()
+        
+        self.samples: List[EnrollmentSample] = []
+        self.frames = 0
+        self.candidates = 0
+        self.duplicates = 0
+        self.rejected = 0
+    
+    @property
+    def done(self) -> bool:
+        return len(self.samples) >= self.target or self.frames >= self.max_frames
+    
+    @property
+    def succeeded(self) -> bool:
+        return len(self.samples) >= self.min_samples
+    
+    def progress(self) -> EnrollmentProgress:
+        return EnrollmentProgress(self.frames, self.candidates, len(self.samples), self.target,
+                                  self.duplicates, self.rejected, self.done)
+    
+    def offer(self, frame: np.ndarray) -> EnrollmentProgress:
+        """Xử lý một frame (chạy trên luồng compute, không chạm GUI)"""
+        self.frames += 1
+        if frame is None:
+            return self.progress()
+        
+        for face in self.extract_faces(frame) or []:
+            self.candidates += 1
+            quality = self.scorer.score(face)
+            if quality.score < self.min_quality:
+                self.rejected += 1
+                continue
+            self._consider(EnrollmentSample(face, quality, self.scorer.signature(face)))
+        return self.progress()
+    
+    def _consider(self, candidate: EnrollmentSample):
+        if self.samples:
+            similarities = [float(np.dot(candidate.signature, s.signature)) for s in self.samples]
+            nearest = int(np.argmax(similarities))
+            if similarities[nearest] >= self.duplicate_threshold:
+                # Gần trùng - chỉ giữ bản tốt hơn
+                self.duplicates += 1
+                if candidate.quality.score > self.samples[nearest].quality.score:
+                    self.samples[nearest] = candidate
+                return
+        
+        if len(self.samples) < self.target:
+            self.samples.append(candidate)
+            return
+        
+        worst = min(range(len(self.samples)), key=lambda i: self.samples[i].quality.score)
+        if candidate.quality.score > self.samples[worst].quality.score:
+            self.samples[worst] = candidate
+    
+    def images(self) -> List[np.ndarray]:
+        """Ảnh đã chọn, sắp theo chất lượng giảm dần"""
+        ranked = sorted(self.samples, key=lambda s: s.quality.score, reverse=True)
+        return [s.image for s in ranked]
+    
+    def mean_quality(self) -> float:
+        if not self.samples:
+            return 0.0
+        return sum(s.quality.score for s in self.samples) / len(self.samples)
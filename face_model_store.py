@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+KHO ENCODING KHUÔN MẶT CẬP NHẬT TĂNG DẦN
+File gốc (encodings.pickle) + file delta chỉ ghi nối (add/remove). Thêm hoặc
+xóa một người chỉ ghi phần thay đổi thay vì ghi lại / train lại toàn bộ dữ liệu;
+delta được gộp vào file gốc định kỳ (compaction). File gốc mang số thế hệ, delta
+bắt đầu bằng thế hệ của file gốc nó nối tiếp - delta cũ (mất điện giữa lúc gộp)
+không bị áp dụng lại lên file gốc mới.
+"""
+
+import logging
+import os
+import pickle
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class IncrementalFaceStore:
+    """Encoding + tên theo định dạng {"encodings": [...], "names": [...]}"""
+    
+    def __init__(self, base_path: str, delta_path: Optional[str] = None, compact_every: int = 50):
+        self.base_path = base_path
+        self.delta_path = delta_path or base_path + ".delta"
+        self.compact_every = compact_every
+        
+        self.encodings: List[Any] = []
+        self.names: List[str] = []
+        self.generation = 0
+        self.delta_ops = 0
+        self._lock = threading.Lock()
+        self.load()
+    
+    # ---- Load ----
+    def load(self):
+        with self._lock:
+            self.encodings, self.names = [], []
+            if os.path.exists(self.base_path):
+                with open(self.base_path, "rb") as f:
+                    data = pickle.load(f)
+                self.encodings = list(data.get("encodings", []))
+                self.names = list(data.get("names", ["unknown"] * len(self.encodings)))
+                self.generation = data.get("generation", 0)
+            else:
+                logger.warning(f"⚠️ Chưa có file encodings: {self.base_path}")
+            
+            self.delta_ops = self._replay_delta()
+            logger.info(f"📂 Face store: {len(self.encodings)} encodings, {len(set(self.names))} người "
+                        f"({self.delta_ops} thay đổi chưa gộp)")
+    
+    def _replay_delta(self) -> int:
+        if not os.path.exists(self.delta_path):
+            return 0
+        ops = 0
+        good = 0  # Vị trí cuối bản ghi hợp lệ cuối cùng
+        with open(self.delta_path, "rb") as f:
+            while True:
+                try:
+                    record = pickle.load(f)
+                except EOFError:
+                    break
+                except Exception as e:
+                    # Bản ghi cuối bị cắt (mất điện khi đang ghi) - bỏ qua phần còn lại
+                    logger.warning(f"⚠️ Delta hỏng sau {ops} bản ghi: {e}")
+                    break
+                if record[0] == "generation":
+                    if record[1] != self.generation:
+                        # Delta của file gốc trước lần gộp - đã nằm trong file gốc
+                        logger.warning(f"⚠️ Bỏ delta cũ (thế hệ {record[1]}, file gốc {self.generation})")
+                        good = 0
+                        break
+                else:
+                    self._apply(record)
+                    ops += 1
+                good = f.tell()
+            size = f.seek(0, os.SEEK_END)
+        if good == 0:
+            os.remove(self.delta_path)
+        elif good < size:
+            # Cắt phần hỏng - bản ghi nối sau không bị kẹt phía sau phần rác
+            os.truncate(self.delta_path, good)
+        return ops
+    
+    def _apply(self, record: Tuple):
+        op, name = record[0], record[1]
+        if op == "batch":
+            for sub_record in record[1]:
+                self._apply(sub_record)
+        elif op == "add":
+            self.encodings.extend(record[2])
+            self.names.extend([name] * len(record[2]))
+        elif op == "remove":
+            keep = [i for i, n in enumerate(self.names) if n != name]
+            self.encodings = [self.encodings[i] for i in keep]
+            self.names = [self.names[i] for i in keep]
+    
+    # ---- Incremental updates ----
+    def _append(self, record: Tuple):
+        with open(self.delta_path, "ab") as f:
+            if f.tell() == 0:
+                pickle.dump(("generation", self.generation), f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(record, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        self._apply(record)
+        self.delta_ops += 1
+    
+    def add_person(self, name: str, encodings: List[Any]) -> int:
+        """Thêm encoding của một người, trả về số encoding đã thêm"""
+        encodings = list(encodings)
+        if not encodings:
+            return 0
+        with self._lock:
+            self._append(("add", name, encodings))
+            compact = self.delta_ops >= self.compact_every
+        if compact:
+            self.compact()
+        return len(encodings)
+    
+    def remove_person(self, name: str) -> int:
+        """Xóa mọi encoding của một người, trả về số encoding đã xóa"""
+        with self._lock:
+            count = self.names.count(name)
+            if count == 0:
+                return 0
+            self._append(("remove", name))
+            compact = self.delta_ops >= self.compact_every
+        if compact:
+            self.compact()
+        return count
+    
+    def apply(self, records: List[Tuple]) -> int:
+        """Nhiều thay đổi ("add", tên, encodings) / ("remove", tên) trong một bản ghi delta -
+        mất điện khi đang ghi thì không thay đổi nào được áp dụng"""
+        records = list(records)
+        if not records:
+            return 0
+        with self._lock:
+            self._append(("batch", records))
+            compact = self.delta_ops >= self.compact_every
+        if compact:
+            self.compact()
+        return len(records)
+    
+    def compact(self):
+        """Gộp delta vào file gốc (ghi file tạm rồi thay thế nguyên tử)"""
+        with self._lock:
+            tmp_path = self.base_path + ".tmp"
+            generation = self.generation + 1
+            with open(tmp_path, "wb") as f:
+                pickle.dump({"encodings": self.encodings, "names": self.names, "generation": generation}, f,
+                            protocol=pickle.HIGHEST_PROTOCOL)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.base_path)
+            # Mất điện ở đây: delta còn lại mang thế hệ cũ nên bị bỏ qua khi nạp
+            self.generation = generation
+            if os.path.exists(self.delta_path):
+                os.remove(self.delta_path)
+            logger.info(f"🗜️ Đã gộp {self.delta_ops} thay đổi vào {self.base_path}")
+            self.delta_ops = 0
+    
+    def rebuild(self, gallery: Dict[str, List[Any]]):
+        """Thay toàn bộ dữ liệu bằng gallery {tên: [encoding]} và ghi file gốc"""
+        with self._lock:
+            self.encodings = [encoding for encodings in gallery.values() for encoding in encodings]
+            self.names = [name for name, encodings in gallery.items() for _ in encodings]
+        self.compact()
+    
+    # ---- Query ----
+    def snapshot(self) -> Dict[str, List]:
+        """Bản sao dữ liệu hiện tại (an toàn khi đang có cập nhật)"""
+        with self._lock:
+            return {"encodings": list(self.encodings), "names": list(self.names)}
+    
+    def people(self) -> Dict[str, int]:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for name in self.names:
+                counts[name] = counts.get(name, 0) + 1
+            return counts
+
+
+def benchmark(people: int = 500, per_person: int = 20, dim: int = 128) -> Dict[str, float]:
+    """So sánh thêm tăng dần với ghi lại toàn bộ file encodings"""
+    import random
+    import tempfile
+    
+    rng = random.Random(0)
+    
+    def person_encodings():
+        return [[rng.random() for _ in range(dim)] for _ in range(per_person)]
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        store = IncrementalFaceStore(os.path.join(tmp, "encodings.pickle"), compact_every=10 ** 9)
+        for i in range(people):
+            store.add_person(f"person_{i}", person_encodings())
+        store.compact()
+        
+        new_encodings = person_encodings()
+        start = time.perf_counter()
+        store.add_person("new_person", new_encodings)
+        incremental = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        store.compact()
+        full_rewrite = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        store.remove_person("person_0")
+        remove = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        IncrementalFaceStore(store.base_path)
+        reload = time.perf_counter() - start
+    
+    return {"people": people, "encodings": people * per_person + per_person,
+            "incremental_add_ms": incremental * 1000, "remove_ms": remove * 1000,
+            "full_rewrite_ms": full_rewrite * 1000, "reload_ms": reload * 1000}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    print("📊 Face store benchmark:")
+    for key, value in benchmark().items():
+        print(f"   {key}: {value:.2f}" if isinstance(value, float) else f"   {key}: {value}")
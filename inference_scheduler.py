@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+BỘ LẬP LỊCH NHẬN DIỆN DÙNG CHUNG
+Một model nhận diện khuôn mặt duy nhất phục vụ nhiều cửa: frame từ camera
+các cửa được đưa vào hàng đợi riêng từng cửa và được xử lý theo lô xen kẽ
+(round-robin) trên một luồng suy luận, nên model chỉ nạp một lần và không
+cửa nào chiếm hết thời gian suy luận.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Request:
+    door_id: str
+    frame: Any
+    future: Future
+    submitted: float
+
+
+@dataclass
+class SchedulerStats:
+    batches: int = 0
+    frames: int = 0
+    latency_total: float = 0.0
+    per_door: Dict[str, int] = field(default_factory=dict)
+    
+    @property
+    def mean_batch(self) -> float:
+        return self.frames / self.batches if self.batches else 0.0
+    
+    @property
+    def mean_latency_ms(self) -> float:
+        return self.latency_total / self.frames * 1000 if self.frames else 0.0
+
+
+class InferenceScheduler:
+    """Một luồng suy luận, hàng đợi theo cửa, lô xen kẽ giữa các cửa"""
+    
+    def __init__(self, max_batch: int = 3, batch_window: float = 0.005):
+        self.max_batch = max_batch
+        self.batch_window = batch_window  # Chờ tối đa để gom frame của cửa khác vào cùng lô
+        self.model = None
+        self.model_ready: Future = Future()
+        self.stats = SchedulerStats()
+        
+        self._queues: "OrderedDict[str, Deque[_Request]]" = OrderedDict()
+        self._calls: Deque = deque()
+        self._cond = threading.Condition()
+        self._next_door = 0
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+    
+    # ---- Lifecycle ----
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name="inference", daemon=True)
+        self._thread.start()
+    
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=2)
+        # Frame / lệnh chưa xử lý - không để luồng gọi chờ mãi
+        with self._cond:
+            pending = [request.future for queue in self._queues.values() for request in queue]
+            pending += [future for _, _, future in self._calls]
+            for queue in self._queues.values():
+                queue.clear()
+            self._calls.clear()
+        for future in pending:
+            future.cancel()
+    
+    def load(self, loader: Callable[[], Any]) -> Future:
+        """Nạp model trên luồng suy luận, model_ready hoàn tất khi xong"""
+        future = self.call(loader)
+        
+        def _loaded(f: Future):
+            if f.exception() is not None:
+                self.model_ready.set_exception(f.exception())
+                return
+            self.model = f.result()
+            self.model_ready.set_result(self.model)
+        
+        future.add_done_callback(_loaded)
+        return future
+    
+    def register(self, door_id: str):
+        """Khai báo cửa trước để lô đầu tiên đã biết cần chờ bao nhiêu cửa"""
+        with self._cond:
+            self._queues.setdefault(door_id, deque())
+    
+    # ---- Submit ----
+    def infer(self, door_id: str, frame: Any) -> Future:
+        """Future -> kết quả model.process_frame(frame)"""
+        request = _Request(door_id, frame, Future(), time.perf_counter())
+        with self._cond:
+            self._queues.setdefault(door_id, deque()).append(request)
+            self._cond.notify()
+        return request.future
+    
+    async def ainfer(self, door_id: str, frame: Any) -> Any:
+        return await asyncio.wrap_future(self.infer(door_id, frame))
+    
+    def call(self, func: Callable, *args) -> Future:
+        """Chạy hàm trên luồng suy luận giữa hai lô (cập nhật model, đăng ký khuôn mặt...)"""
+        future: Future = Future()
+        with self._cond:
+            self._calls.append((func, args, future))
+            self._cond.notify()
+        return future
+    
+    async def acall(self, func: Callable, *args) -> Any:
+        return await asyncio.wrap_future(self.call(func, *args))
+    
+    # ---- Inference thread ----
+    def _pending_doors(self) -> int:
+        return sum(1 for queue in self._queues.values() if queue)
+    
+    def _take_batch(self) -> List[_Request]:
+        """Lấy tối đa max_batch frame, mỗi lượt một frame của mỗi cửa bắt đầu từ cửa kế tiếp"""
+        doors = list(self._queues)
+        batch: List[_Request] = []
+        start = self._next_door % len(doors)
+        order = doors[start:] + doors[:start]
+        while len(batch) < self.max_batch and any(self._queues[door] for door in order):
+            for door in order:
+                if self._queues[door] and len(batch) < self.max_batch:
+                    batch.append(self._queues[door].popleft())
+        self._next_door = (start + 1) % len(doors)
+        return batch
+    
+    def _loop(self):
+        while True:
+            with self._cond:
+                while self._running and not self._calls and not self._pending_doors():
+                    self._cond.wait()
+                if not self._running:
+                    return
+                call = self._calls.popleft() if self._calls else None
+                if call is None:
+                    # Chỉ chờ khi còn cửa chưa gửi frame - một cửa thì không thêm độ trễ
+                    waited = 0.0
+                    while (self._pending_doors() < len(self._queues) and
+                           self._pending_doors() < self.max_batch and waited < self.batch_window):
+                        started = time.perf_counter()
+                        self._cond.wait(self.batch_window - waited)
+                        waited += time.perf_counter() - started
+                    batch = self._take_batch()
+            
+            if call is not None:
+                func, args, future = call
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(func(*args))
+                    except BaseException as e:
+                        future.set_exception(e)
+                continue
+            self._run_batch(batch)
+    
+    def _run_batch(self, batch: List[_Request]):
+        batch = [request for request in batch if request.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            if hasattr(self.model, "process_batch"):
+                results = self.model.process_batch([request.frame for request in batch])
+            else:
+                results = [self.model.process_frame(request.frame) for request in batch]
+        except Exception as e:
+            for request in batch:
+                request.future.set_exception(e)
+            return
+        
+        now = time.perf_counter()
+        self.stats.batches += 1
+        for request, result in zip(batch, results):
+            self.stats.frames += 1
+            self.stats.latency_total += now - request.submitted
+            self.stats.per_door[request.door_id] = self.stats.per_door.get(request.door_id, 0) + 1
+            request.future.set_result(result)
+    
+    def report(self) -> str:
+        doors = ", ".join(f"{door}: {count}" for door, count in self.stats.per_door.items())
+        return (f"{self.stats.frames} frame / {self.stats.batches} lô (trung bình {self.stats.mean_batch:.2f}), "
+                f"độ trễ {self.stats.mean_latency_ms:.1f} ms [{doors}]")
+
+
+def benchmark(doors: int = 3, frames_per_door: int = 60, fixed_ms: float = 12.0,
+              per_frame_ms: float = 8.0) -> Dict[str, float]:
+    """So sánh xử lý từng frame với lô xen kẽ bằng model giả (chi phí cố định + theo frame)"""
+    
+    class _FakeModel:
+        def process_frame(self, frame):
+            time.sleep((fixed_ms + per_frame_ms) / 1000)
+            return frame, None
+        
+        def process_batch(self, frames):
+            time.sleep((fixed_ms + per_frame_ms * len(frames)) / 1000)
+            return [(frame, None) for frame in frames]
+    
+    def run(model) -> float:
+        scheduler = InferenceScheduler(max_batch=doors)
+        scheduler.start()
+        scheduler.load(lambda: model).result()
+        for door in range(doors):
+            scheduler.register(str(door))
+        
+        def camera(door: int):
+            for index in range(frames_per_door):
+                scheduler.infer(str(door), index).result()
+        
+        started = time.perf_counter()
+        threads = [threading.Thread(target=camera, args=(door,)) for door in range(doors)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        scheduler.stop()
+        return elapsed
+    
+    class _SingleFrameModel:
+        process_frame = _FakeModel.process_frame
+    
+    single = run(_SingleFrameModel())
+    batched = run(_FakeModel())
+    total = doors * frames_per_door
+    return {"doors": doors, "frames": total, "single_fps": total / single, "batched_fps": total / batched,
+            "speedup": single / batched}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    print("📊 Inference scheduler benchmark:")
+    for key, value in benchmark().items():
+        print(f"   {key}: {value:.2f}" if isinstance(value, float) else f"   {key}: {value}")
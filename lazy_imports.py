@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+IMPORT TRÌ HOÃN & BÁO CÁO THỜI GIAN KHỞI ĐỘNG
+cv2, numpy, PIL, face_recognition và driver phần cứng chỉ được import khi dùng
+lần đầu (hoặc nạp trước trên luồng nền) để màn hình khóa và relay hoạt động
+ngay; mỗi lần import / bước khởi tạo được ghi lại để in báo cáo thời gian.
+"""
+
+import importlib
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PROCESS_START = time.monotonic()
+
+
+@dataclass
+class TimingRecord:
+    kind: str  # "import" | "init" | "mark"
+    name: str
+    started: float  # Giây kể từ PROCESS_START
+    duration: float
+    thread: str
+    error: Optional[str] = None
+
+
+_records: List[TimingRecord] = []
+_records_lock = threading.Lock()
+
+
+def _record(kind: str, name: str, started: float, duration: float, error: Optional[str] = None):
+    with _records_lock:
+        _records.append(TimingRecord(kind, name, started - PROCESS_START, duration,
+                                     threading.current_thread().name, error))
+
+
+@contextmanager
+def timed(name: str, kind: str = "init"):
+    """Đo thời gian một bước khởi tạo"""
+    started = time.monotonic()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = str(e)
+        raise
+    finally:
+        _record(kind, name, started, time.monotonic() - started, error)
+
+
+def mark(name: str):
+    """Ghi một mốc thời gian (vd. GUI đã hiện, relay đã khóa)"""
+    now = time.monotonic()
+    _record("mark", name, now, 0.0)
+
+
+def timed_import(name: str):
+    """Import module và ghi lại thời gian nếu đây là lần nạp đầu tiên"""
+    if name not in sys.modules:
+        with timed(name, kind="import"):
+            return importlib.import_module(name)
+    # Luôn qua importlib: module có thể đã nằm trong sys.modules nhưng luồng preload() vẫn đang
+    # chạy code của nó - import_module chờ khóa của module tới khi nạp xong (đã nạp thì gần như miễn phí)
+    return importlib.import_module(name)
+
+
+class LazyModule:
+    """Proxy module - import thật sự khi truy cập thuộc tính đầu tiên"""
+    
+    def __init__(self, name: str):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+    
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            module = timed_import(self.__dict__["_name"])
+            self.__dict__["_module"] = module
+        return module
+    
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self._load(), attr)
+    
+    def __repr__(self) -> str:
+        state = "loaded" if self.__dict__["_module"] is not None else "not loaded"
+        return f"<lazy module {self.__dict__['_name']!r} ({state})>"
+
+
+class LazyAttr:
+    """Proxy cho một class/hàm trong module nạp trễ (vd. Picamera2)"""
+    
+    def __init__(self, module: str, attr: str):
+        self._module = module
+        self._attr = attr
+    
+    def __call__(self, *args, **kwargs):
+        return getattr(timed_import(self._module), self._attr)(*args, **kwargs)
+    
+    def __repr__(self) -> str:
+        return f"<lazy {self._module}.{self._attr}>"
+
+
+def lazy_module(name: str) -> LazyModule:
+    return LazyModule(name)
+
+
+def lazy_attr(module: str, attr: str) -> LazyAttr:
+    return LazyAttr(module, attr)
+
+
+def preload(names: Iterable[str]) -> threading.Thread:
+    """Nạp trước các module nặng trên luồng nền theo thứ tự"""
+    names = list(names)
+    
+    def _run():
+        for name in names:
+            try:
+                timed_import(name)
+            except Exception as e:
+                logger.warning(f"⚠️ Preload {name} lỗi: {e}")
+    
+    thread = threading.Thread(target=_run, name="preload", daemon=True)
+    thread.start()
+    return thread
+
+
+def startup_report() -> str:
+    """Bảng thời gian import / khởi tạo theo thứ tự bắt đầu"""
+    with _records_lock:
+        records = sorted(_records, key=lambda r: r.started)
+    lines = [f"{'t(s)':>7}  {'dur(s)':>7}  {'kind':<6} {'name':<32} thread"]
+    for r in records:
+        detail = f"  ❌ {r.error}" if r.error else ""
+        lines.append(f"{r.started:7.2f}  {r.duration:7.2f}  {r.kind:<6} {r.name:<32} {r.thread}{detail}")
+    imports = sum(r.duration for r in records if r.kind == "import")
+    lines.append(f"Tổng thời gian import: {imports:.2f}s, "
+                 f"đã chạy: {time.monotonic() - PROCESS_START:.2f}s")
+    return "\n".join(lines)
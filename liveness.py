@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+KIỂM TRA NGƯỜI THẬT (LIVENESS / CHỐNG GIẢ MẠO)
+Nhận diện khớp không có nghĩa là người thật: ảnh in hay màn hình điện thoại
+cũng khớp. Bộ kiểm tra chạy trên khuôn mặt đang được theo dõi qua nhiều frame:
+- Chuyển động: thị sai giữa vùng giữa mặt và toàn khuôn mặt (ảnh phẳng dịch
+  chuyển cứng, mặt thật thì không) và nháy mắt (vùng mắt đổi nhiều hơn vùng miệng)
+- Kết cấu: hồi quy logistic nhỏ trên độ nét, vân moiré của màn hình và vùng
+  lóa; trọng số mặc định là heuristic, có thể nạp trọng số đã huấn luyện (JSON)
+Chỉ chạy trên frame đã nhận diện được danh tính, trên ảnh mặt thu nhỏ 64x64,
+nên nằm gọn trong khoảng nghỉ FACE_DETECTION_INTERVAL giữa hai frame.
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CROP = 64
+
+
+@dataclass
+class LivenessVerdict:
+    live: bool
+    decided: bool  # live, hoặc đã đủ frame để kết luận là giả mạo
+    score: float
+    motion: float
+    texture: float
+    frames: int
+    cost_ms: float
+    checked: bool = True  # False: kết quả nhận diện không có bbox, không kiểm tra được
+
+
+class TextureModel:
+    """P(người thật) từ đặc trưng kết cấu của ảnh mặt (hồi quy logistic)"""
+    
+    FEATURES = ("sharpness", "moire", "glare")
+    
+    def __init__(self, weights: Sequence[float] = (2.5, -3.0, -4.0), bias: float = 0.3):
+        self.weights = np.asarray(weights, dtype=np.float32)
+        self.bias = float(bias)
+    
+    @classmethod
+    def load(cls, path: str) -> "TextureModel":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls([data["weights"][name] for name in cls.FEATURES], data["bias"])
+    
+    @staticmethod
+    def features(gray: np.ndarray, color: Optional[np.ndarray] = None) -> np.ndarray:
+        # Ảnh chụp lại từ giấy / màn hình mất chi tiết tần số cao
+        sharpness = min(float(cv2.Laplacian(gray, cv2.CV_32F).var()) / 400.0, 1.0)
+        # Lưới điểm ảnh của màn hình tạo đỉnh tuần hoàn nổi bật ở dải tần số cao
+        spectrum = np.abs(np.fft.fftshift(np.fft.fft2(gray - gray.mean())))
+        center = CROP // 2
+        spectrum[center - 8:center + 8, center - 8:center + 8] = 0
+        moire = min(float(np.log1p(spectrum.max() / (spectrum.mean() + 1e-6))) / 6.0, 1.0)
+        # Màn hình / giấy bóng phản chiếu thành vùng gần như trắng
+        bright = color.max(axis=2) if color is not None and color.ndim == 3 else gray
+        glare = min(float((bright >= 250).mean()) * 10.0, 1.0)
+        return np.array([sharpness, moire, glare], dtype=np.float32)
+    
+    def predict(self, gray: np.ndarray, color: Optional[np.ndarray] = None) -> float:
+        z = float(self.weights @ self.features(gray, color)) + self.bias
+        return 1.0 / (1.0 + np.exp(-z))
+
+
+class LivenessDetector:
+    """Theo dõi một khuôn mặt qua các frame và chấm điểm người thật (một cửa / một camera)"""
+    
+    def __init__(self, threshold: float = 0.5, min_frames: int = 5, max_frames: int = 45,
+                 budget_ms: float = 15.0, texture: Optional[TextureModel] = None,
+                 motion_weight: float = 0.6, parallax_px: float = 1.5, blink_ratio: float = 2.5):
+        self.threshold = threshold
+        self.min_frames = min_frames
+        self.max_frames = max_frames  # Chưa đủ bằng chứng sau số frame này -> giả mạo
+        self.budget_ms = budget_ms
+        self.texture = texture or TextureModel()
+        self.motion_weight = motion_weight
+        self.parallax_px = parallax_px  # Chênh lệch dịch chuyển (px trên ảnh 64x64) coi là 3D
+        self.blink_ratio = blink_ratio  # Vùng mắt đổi gấp bao nhiêu lần vùng miệng coi là nháy mắt
+        
+        self.cost_ms = 0.0  # Trung bình trượt chi phí mỗi frame
+        self.checked_frames = 0
+        self.spoofs = 0
+        self._texture_stride = 1
+        self._window = cv2.createHanningWindow((CROP, CROP), cv2.CV_32F)
+        self.reset()
+    
+    def reset(self):
+        """Mất dấu khuôn mặt hoặc đổi người - bắt đầu lại"""
+        self._identity: Optional[str] = None
+        self._previous: Optional[np.ndarray] = None
+        self._previous_center: Optional[Tuple[float, float]] = None
+        self._parallax: Deque[float] = deque(maxlen=self.max_frames)
+        self._blinks: Deque[float] = deque(maxlen=self.max_frames)
+        self._texture_scores: Deque[float] = deque(maxlen=self.max_frames)
+        self._frames = 0
+    
+    def update(self, frame: np.ndarray, bbox: Optional[Sequence[int]], identity: Optional[str] = None) -> LivenessVerdict:
+        """Thêm một frame đã nhận diện (bbox = x, y, w, h trên frame)"""
+        if bbox is None:
+            return LivenessVerdict(True, True, 1.0, 0.0, 0.0, 0, 0.0, checked=False)
+        started = time.perf_counter()
+        x, y, w, h = (int(v) for v in bbox)
+        center = (x + w / 2, y + h / 2)
+        if identity != self._identity or (self._previous_center is not None and
+                                          abs(center[0] - self._previous_center[0]) > w / 2):
+            self.reset()
+            self._identity = identity
+        
+        color = self._crop(frame, x, y, w, h)
+        gray = cv2.cvtColor(color, cv2.COLOR_RGB2GRAY) if color.ndim == 3 else color
+        gray = gray.astype(np.float32)
+        
+        if self._previous is not None:
+            parallax, blink = self._motion_cues(self._previous, gray)
+            if parallax is not None:
+                self._parallax.append(parallax)
+            self._blinks.append(blink)
+        if self._frames % self._texture_stride == 0:
+            self._texture_scores.append(self.texture.predict(gray, color))
+        self._previous, self._previous_center = gray, center
+        self._frames += 1
+        
+        # Thị sai lấy trung bình qua các frame có dịch chuyển (nhiễu ước lượng một frame lớn),
+        # nháy mắt là sự kiện một frame nên lấy giá trị lớn nhất
+        parallax = float(np.mean(self._parallax)) if len(self._parallax) >= 3 else 0.0
+        motion = max(parallax, max(self._blinks, default=0.0))
+        texture = float(np.mean(self._texture_scores)) if self._texture_scores else 0.5
+        score = self.motion_weight * motion + (1 - self.motion_weight) * texture
+        live = self._frames >= self.min_frames and score >= self.threshold
+        decided = live or self._frames >= self.max_frames
+        if decided and not live:
+            self.spoofs += 1
+        
+        cost = (time.perf_counter() - started) * 1000
+        self._account(cost)
+        return LivenessVerdict(live, decided, score, motion, texture, self._frames, cost)
+    
+    def _crop(self, frame: np.ndarray, x: int, y: int, w: int, h: int) -> np.ndarray:
+        height, width = frame.shape[:2]
+        pad_x, pad_y = w // 10, h // 10
+        left, top = max(x - pad_x, 0), max(y - pad_y, 0)
+        right, bottom = min(x + w + pad_x, width), min(y + h + pad_y, height)
+        crop = frame[top:bottom, left:right]
+        if crop.size == 0:
+            crop = frame
+        return cv2.resize(crop, (CROP, CROP), interpolation=cv2.INTER_AREA)
+    
+    def _motion_cues(self, previous: np.ndarray, current: np.ndarray) -> Tuple[Optional[float], float]:
+        """(thị sai giữa vùng giữa và toàn mặt - None nếu mặt đứng yên, nháy mắt), mỗi giá trị 0..1"""
+        (fx, fy), _ = cv2.phaseCorrelate(previous, current, self._window)
+        inner = slice(CROP // 4, CROP * 3 // 4)
+        (cx, cy), _ = cv2.phaseCorrelate(np.ascontiguousarray(previous[inner, inner]),
+                                         np.ascontiguousarray(current[inner, inner]))
+        parallax = None
+        if abs(fx) + abs(fy) > 0.5:  # Chỉ đo thị sai khi khuôn mặt có dịch chuyển
+            parallax = min(float(np.hypot(cx - fx, cy - fy)) / self.parallax_px, 1.0)
+        
+        diff = np.abs(current - previous)
+        eyes = float(diff[CROP // 4:CROP * 7 // 16].mean())
+        mouth = float(diff[CROP * 9 // 16:CROP * 7 // 8].mean())
+        ratio = eyes / (mouth + 1.0)
+        blink = min(max((ratio - 1.0) / (self.blink_ratio - 1.0), 0.0), 1.0)
+        return parallax, blink
+    
+    def _account(self, cost: float):
+        """Trung bình trượt chi phí; vượt ngân sách thì thưa phần kết cấu (chuyển động cần mọi frame)"""
+        self.checked_frames += 1
+        self.cost_ms = cost if self.checked_frames == 1 else self.cost_ms * 0.9 + cost * 0.1
+        if self.cost_ms > self.budget_ms:
+            self._texture_stride = min(self._texture_stride + 1, 8)
+        elif self.cost_ms < self.budget_ms / 2 and self._texture_stride > 1:
+            self._texture_stride -= 1
+
+
+def benchmark(frames: int = 300, size: Tuple[int, int] = (800, 600)) -> Dict[str, float]:
+    """Chi phí mỗi frame trên frame giả kích thước camera, khuôn mặt dịch chuyển chậm"""
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 255, (size[1] + 40, size[0] + 40, 3), dtype=np.uint8)
+    detector = LivenessDetector(max_frames=frames + 1)
+    costs: List[float] = []
+    for index in range(frames):
+        offset = index % 20
+        frame = np.ascontiguousarray(base[offset:offset + size[1], offset:offset + size[0]])
+        verdict = detector.update(frame, (300, 200, 180, 220), "bench")
+        costs.append(verdict.cost_ms)
+    return {"frames": frames, "mean_ms": float(np.mean(costs)), "p95_ms": float(np.percentile(costs, 95)),
+            "max_ms": float(np.max(costs)), "texture_stride": detector._texture_stride}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Liveness / chống giả mạo khuôn mặt")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("bench", help="Đo chi phí mỗi frame")
+    p = sub.add_parser("features", help="In đặc trưng kết cấu của ảnh (để huấn luyện trọng số)")
+    p.add_argument("images", nargs="+")
+    args = parser.parse_args(argv)
+    
+    if args.command == "bench":
+        print("📊 Liveness benchmark:")
+        for key, value in benchmark().items():
+            print(f"   {key}: {value:.3f}" if isinstance(value, float) else f"   {key}: {value}")
+        return 0
+    
+    print("image," + ",".join(TextureModel.FEATURES))
+    for path in args.images:
+        image = cv2.imread(path)
+        if image is None:
+            print(f"❌ {path}", file=sys.stderr)
+            continue
+        color = cv2.resize(image, (CROP, CROP), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(color, cv2.COLOR_BGR2GRAY).astype(np.float32)
+        print(path + "," + ",".join(f"{v:.4f}" for v in TextureModel.features(gray, color)))
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main())
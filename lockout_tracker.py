@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+CHỐNG DÒ MÃ / THẺ - KHÓA TẠM GIỮA CÁC PHIÊN
+MAX_ATTEMPTS chỉ giới hạn trong một lượt xác thực; lượt mới bắt đầu lại từ 0.
+Bộ đếm ở đây đếm thất bại theo cửa sổ trượt cho từng cửa, từng yếu tố của cửa
+và từng UID thẻ (dùng chung giữa các cửa). Vượt ngưỡng thì khóa tạm, mỗi lần
+khóa sau dài gấp đôi lần trước. Mỗi khóa là một mảng bucket cố định trong RAM,
+tra cứu O(1); trạng thái được một luồng nền ghi định kỳ ra JSON (chỉ khi có
+thay đổi) để khởi động lại không xóa khóa.
+
+    python3 lockout_tracker.py list lockout.json
+    python3 lockout_tracker.py clear lockout.json card:e5a8bd02
+    python3 lockout_tracker.py bench
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from user_registry import card_key
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLDS = {"door": 15, "passcode": 5, "fingerprint": 10, "rfid": 5, "card": 3}
+
+
+def card_lockout_key(uid) -> str:
+    return f"card:{card_key(uid)}"
+
+
+def lockout_keys(door: str, factors: Iterable[str] = (), uid=None) -> List[str]:
+    """Khóa của một lần thử: cửa, từng yếu tố của cửa, UID thẻ (chung mọi cửa)"""
+    keys = [f"door:{door}"] + [f"{factor}:{door}" for factor in factors]
+    if uid is not None:
+        keys.append(card_lockout_key(uid))
+    return keys
+
+
+class _Counter:
+    """Bộ đếm cửa sổ trượt gồm số bucket cố định + trạng thái khóa của một khóa"""
+    __slots__ = ("buckets", "epoch", "total", "strikes", "locked_until", "last_seen")
+    
+    def __init__(self, size: int):
+        self.buckets = [0] * size
+        self.epoch = 0  # Chỉ số bucket (theo thời gian) của lần ghi gần nhất
+        self.total = 0
+        self.strikes = 0  # Số lần đã bị khóa - quyết định thời gian khóa tiếp theo
+        self.locked_until = 0.0
+        self.last_seen = 0.0
+    
+    def advance(self, epoch: int):
+        """Xóa các bucket đã trôi ra khỏi cửa sổ (tối đa len(buckets) bước)"""
+        size = len(self.buckets)
+        if epoch - self.epoch >= size:
+            self.buckets = [0] * size
+            self.total = 0
+        else:
+            for index in range(self.epoch + 1, epoch + 1):
+                self.total -= self.buckets[index % size]
+                self.buckets[index % size] = 0
+        self.epoch = max(self.epoch, epoch)
+
+
+class LockoutTracker:
+    """Đếm thất bại theo khóa ("door:main", "passcode:main", "card:<uid>"...), thread-safe"""
+    
+    def __init__(self, path: Optional[str] = None, thresholds: Optional[Dict[str, int]] = None,
+                 window: float = 600.0, buckets: int = 12, base: float = 30.0, max_lockout: float = 3600.0,
+                 strike_ttl: float = 24 * 3600.0, max_keys: int = 4096, save_interval: float = 2.0):
+        self.path = path
+        self.thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+        self.window = window
+        self.bucket_seconds = window / buckets
+        self.size = buckets
+        self.base = base
+        self.max_lockout = max_lockout
+        self.strike_ttl = strike_ttl  # Không thất bại trong khoảng này thì thời gian khóa quay về base
+        self.max_keys = max_keys  # UID thẻ ngẫu nhiên không làm phình bộ nhớ
+        self.save_interval = save_interval
+        
+        self._counters: "OrderedDict[str, _Counter]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._dirty = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if path is not None:
+            self._load()
+            self._thread = threading.Thread(target=self._save_loop, name="lockout", daemon=True)
+            self._thread.start()
+    
+    # ---- Lookup (O(1)) ----
+    def remaining(self, *keys: str, now: Optional[float] = None) -> float:
+        """Số giây còn bị khóa (lớn nhất trong các khóa), 0 = không bị khóa"""
+        now = time.time() if now is None else now
+        counters = [self._counters.get(key) for key in keys]
+        return max([counter.locked_until - now for counter in counters if counter is not None] + [0.0])
+    
+    # ---- Record ----
+    def failure(self, *keys: str, now: Optional[float] = None) -> float:
+        """Ghi một thất bại cho mỗi khóa, trả về số giây bị khóa (0 = chưa tới ngưỡng)"""
+        now = time.time() if now is None else now
+        epoch = int(now // self.bucket_seconds)
+        locked = 0.0
+        with self._lock:
+            for key in keys:
+                counter = self._counter(key, now)
+                if now - counter.last_seen > self.strike_ttl:
+                    counter.strikes = 0
+                counter.last_seen = now
+                counter.advance(epoch)
+                counter.buckets[epoch % self.size] += 1
+                counter.total += 1
+                
+                threshold = self.thresholds.get(key.split(":", 1)[0])
+                if threshold and counter.total >= threshold and counter.locked_until <= now:
+                    duration = min(self.base * 2 ** counter.strikes, self.max_lockout)
+                    counter.strikes += 1
+                    counter.locked_until = now + duration
+                    # Sau khi hết khóa đếm lại từ đầu - lần vượt ngưỡng sau khóa lâu gấp đôi
+                    counter.buckets = [0] * self.size
+                    counter.total = 0
+                    logger.warning(f"🔒 {key}: {threshold} lần thất bại / {self.window:.0f}s "
+                                   f"- khóa {duration:.0f}s (lần {counter.strikes})")
+                locked = max(locked, counter.locked_until - now)
+            self._dirty = True
+        return locked
+    
+    def success(self, *keys: str):
+        """Xác thực thành công - xóa bộ đếm và mức tăng thời gian khóa của các khóa"""
+        with self._lock:
+            removed = [self._counters.pop(key, None) for key in keys]
+            if any(counter is not None for counter in removed):
+                self._dirty = True
+    
+    def clear(self, key: Optional[str] = None) -> int:
+        """Admin mở khóa (None = tất cả)"""
+        with self._lock:
+            if key is None:
+                count = len(self._counters)
+                self._counters.clear()
+            else:
+                count = 1 if self._counters.pop(key, None) is not None else 0
+            self._dirty = True
+        self.save()
+        return count
+    
+    def locked(self, now: Optional[float] = None) -> Dict[str, float]:
+        now = time.time() if now is None else now
+        with self._lock:
+            return {key: counter.locked_until - now for key, counter in self._counters.items()
+                    if counter.locked_until > now}
+    
+    def _counter(self, key: str, now: float) -> _Counter:
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters[key] = _Counter(self.size)
+            if len(self._counters) > self.max_keys:
+                self._evict(now)
+        else:
+            self._counters.move_to_end(key)
+        return counter
+    
+    def _evict(self, now: float):
+        """Bỏ bộ đếm ít dùng nhất chưa bị khóa - thẻ đang bị khóa không được thoát khóa nhờ
+        phun UID ngẫu nhiên. Tất cả đang khóa thì tạm vượt max_keys (khóa tự hết hạn)"""
+        for _ in range(len(self._counters) - 1):
+            key, counter = next(iter(self._counters.items()))
+            if counter.locked_until <= now:
+                del self._counters[key]
+                return
+            self._counters.move_to_end(key)
+    
+    # ---- Persistence ----
+    def _snapshot(self) -> Dict:
+        return {"bucket_seconds": self.bucket_seconds,
+                "counters": {key: {"buckets": list(c.buckets), "epoch": c.epoch, "strikes": c.strikes,
+                                   "locked_until": c.locked_until, "last_seen": c.last_seen}
+                             for key, c in self._counters.items()}}
+    
+    def _save_loop(self):
+        while not self._stop.wait(self.save_interval):
+            self.save()
+    
+    def save(self):
+        """Ghi trạng thái ra đĩa nếu có thay đổi - nhiều thất bại liên tiếp chỉ tốn một lần ghi"""
+        if self.path is None:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = self._snapshot()
+            self._dirty = False
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with self._io_lock:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+        except OSError as e:
+            self._dirty = True
+            logger.error(f"❌ Lockout save error: {e}")
+    
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"❌ Lockout load error: {e}")
+            return
+        now = time.time()
+        same_layout = data.get("bucket_seconds") == self.bucket_seconds
+        for key, record in data.get("counters", {}).items():
+            if now - record["last_seen"] > self.strike_ttl and record["locked_until"] <= now:
+                continue
+            counter = self._counter(key, now)
+            counter.strikes = record["strikes"]
+            counter.locked_until = record["locked_until"]
+            counter.last_seen = record["last_seen"]
+            if same_layout and len(record["buckets"]) == self.size:
+                counter.buckets = record["buckets"]
+                counter.epoch = record["epoch"]
+                counter.total = sum(counter.buckets)
+        active = self.locked(now)
+        logger.info(f"🔒 Lockout: {len(self._counters)} bộ đếm, {len(active)} đang khóa ({self.path})")
+    
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        self.save()
+
+
+def benchmark(keys: int = 5000, lookups: int = 200_000) -> Dict[str, float]:
+    """Tra cứu khi đang có nhiều khóa + chi phí ghi một thất bại"""
+    tracker = LockoutTracker()
+    now = time.time()
+    cards = [lockout_keys("main", ["rfid"], f"{index:08x}") for index in range(keys)]
+    for index, card in enumerate(cards):
+        tracker.failure(card[-1], now=now + index % 60)
+    
+    started = time.perf_counter()
+    for index in range(lookups):
+        tracker.remaining(*cards[index % keys], now=now)
+    lookup = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    for index in range(lookups // 10):
+        tracker.failure(*cards[index % keys], now=now + index)
+    record = time.perf_counter() - started
+    return {"keys": keys, "lookup_us": lookup / lookups * 1e6, "failure_us": record / (lookups // 10) * 1e6,
+            "locked": len(tracker.locked(now + lookups // 10))}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Khóa tạm chống dò mã / thẻ")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("list", help="Các khóa đang bị khóa")
+    p.add_argument("path")
+    p = sub.add_parser("clear", help="Mở khóa (không có key = tất cả)")
+    p.add_argument("path")
+    p.add_argument("key", nargs="?")
+    sub.add_parser("bench", help="Đo tra cứu / ghi")
+    args = parser.parse_args(argv)
+    
+    if args.command == "bench":
+        print("📊 Lockout tracker benchmark:")
+        for key, value in benchmark().items():
+            print(f"   {key}: {value:.3f}" if isinstance(value, float) else f"   {key}: {value}")
+        return 0
+    
+    tracker = LockoutTracker(args.path)
+    try:
+        if args.command == "clear":
+            print(f"🔓 {tracker.clear(args.key)} khóa đã mở")
+        for key, seconds in sorted(tracker.locked().items()):
+            print(f"🔒 {key:<24} còn {seconds:.0f}s")
+    finally:
+        tracker.close()
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main())
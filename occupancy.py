@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+CHỐNG QUAY VÒNG THẺ (ANTI-PASSBACK) VÀ ĐẾM NGƯỜI TRONG KHU VỰC
+Mỗi lần mở cửa được ghi theo hướng đầu đọc của cửa ("in" / "out") vào trạng
+thái có mặt trong RAM, dùng chung giữa các cửa của cùng khu vực. "X có đang
+ở trong không" và "bao nhiêu người trong khu vực" đều là tra cứu dict O(1).
+Một danh tính đã vào thì không vào lại được cho tới khi đã ra. Trạng thái
+được chụp định kỳ ra JSON ở luồng nền để khởi động lại không mất.
+
+    python3 occupancy.py list occupancy.json
+    python3 occupancy.py clear occupancy.json khoi
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+IN = "in"
+OUT = "out"
+
+
+class OccupancyEngine:
+    """Ai đang ở trong khu vực nào (zone -> danh tính -> (cửa, thời điểm vào)), thread-safe"""
+    
+    def __init__(self, path: Optional[str] = None, snapshot_interval: float = 30.0):
+        self.path = path
+        self.snapshot_interval = snapshot_interval
+        self.denied = 0
+        
+        self._inside: Dict[str, Dict[str, Tuple[str, float]]] = {}
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()  # Luồng chụp định kỳ và clear() không ghi chồng file tạm
+        self._dirty = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if path is not None:
+            self._load()
+            self._thread = threading.Thread(target=self._snapshot_loop, name="occupancy", daemon=True)
+            self._thread.start()
+    
+    # ---- Lookup (O(1)) ----
+    def is_inside(self, subject: str, zone: str) -> bool:
+        return subject in self._inside.get(zone, {})
+    
+    def count(self, zone: str) -> int:
+        return len(self._inside.get(zone, {}))
+    
+    def occupants(self, zone: str) -> Dict[str, Tuple[str, float]]:
+        with self._lock:
+            return dict(self._inside.get(zone, {}))
+    
+    def zones(self) -> Dict[str, int]:
+        with self._lock:
+            return {zone: len(people) for zone, people in self._inside.items()}
+    
+    # ---- Anti-passback ----
+    def allows(self, subject: Optional[str], zone: str, direction: str) -> bool:
+        """Vào khi đang ở trong bị từ chối. Ra không bao giờ bị chặn (an toàn thoát hiểm)"""
+        if subject is None or direction != IN or not self.is_inside(subject, zone):
+            return True
+        self.denied += 1
+        return False
+    
+    def record(self, subject: Optional[str], zone: str, direction: str, door: str,
+               now: Optional[float] = None):
+        """Ghi một lần mở cửa theo hướng đầu đọc của cửa"""
+        if subject is None or direction not in (IN, OUT):
+            return
+        now = time.time() if now is None else now
+        with self._lock:
+            people = self._inside.setdefault(zone, {})
+            if direction == IN:
+                people[subject] = (door, now)
+            else:
+                people.pop(subject, None)
+            self._dirty = True
+        logger.info(f"🧍 {subject} {'vào' if direction == IN else 'ra'} {zone} qua cửa {door} "
+                    f"- {len(people)} người trong khu vực")
+    
+    def clear(self, subject: Optional[str] = None, zone: Optional[str] = None) -> int:
+        """Admin xóa trạng thái có mặt (vd. người ra bằng lối thoát hiểm). None = tất cả"""
+        with self._lock:
+            removed = 0
+            for name, people in self._inside.items():
+                if zone is not None and name != zone:
+                    continue
+                if subject is None:
+                    removed += len(people)
+                    people.clear()
+                elif people.pop(subject, None) is not None:
+                    removed += 1
+            self._dirty = True
+        self.snapshot()
+        return removed
+    
+    # ---- Snapshot ----
+    def _snapshot_loop(self):
+        while not self._stop.wait(self.snapshot_interval):
+            self.snapshot()
+    
+    def snapshot(self):
+        """Ghi trạng thái ra đĩa nếu có thay đổi (ghi file tạm rồi thay thế)"""
+        if self.path is None:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            data = {"saved_at": time.time(),
+                    "zones": {zone: {subject: list(entry) for subject, entry in people.items()}
+                              for zone, people in self._inside.items()}}
+            self._dirty = False
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with self._io_lock:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f, ensure_ascii=False)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+        except OSError as e:
+            self._dirty = True
+            logger.error(f"❌ Occupancy snapshot error: {e}")
+    
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"❌ Occupancy load error: {e}")
+            return
+        self._inside = {zone: {subject: (entry[0], entry[1]) for subject, entry in people.items()}
+                        for zone, people in data.get("zones", {}).items()}
+        logger.info(f"🧍 Occupancy: {sum(map(len, self._inside.values()))} người trong "
+                    f"{len(self._inside)} khu vực ({self.path})")
+    
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        self.snapshot()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Anti-passback và số người trong khu vực")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("list", help="Người đang ở trong từng khu vực")
+    p.add_argument("path")
+    p = sub.add_parser("clear", help="Xóa trạng thái có mặt (không có subject = tất cả)")
+    p.add_argument("path")
+    p.add_argument("subject", nargs="?")
+    p.add_argument("--zone")
+    args = parser.parse_args(argv)
+    
+    engine = OccupancyEngine(args.path)
+    try:
+        if args.command == "clear":
+            print(f"🧹 Đã xóa {engine.clear(args.subject, args.zone)} lượt có mặt")
+        for zone, count in sorted(engine.zones().items()):
+            print(f"🏢 {zone}: {count} người")
+            for subject, (door, entered) in sorted(engine.occupants(zone).items()):
+                print(f"   🧍 {subject:<16} cửa {door:<8} vào lúc "
+                      f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entered))}")
+    finally:
+        engine.close()
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main())
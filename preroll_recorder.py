@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+VIDEO PRE-ROLL (VÒNG ĐỆM H.264)
+Bộ mã hóa H.264 của Picamera2 ghi liên tục stream lores vào vòng đệm trong
+RAM (CircularOutput). Khi có sự kiện (thẻ sai, hết lượt thử...) vòng đệm
+~10s trước sự kiện + 10s sau được ghi ra đĩa. Mã hóa chạy trong bộ mã hóa
+của camera, không dùng CPU của luồng nhận diện khuôn mặt.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from lazy_imports import timed_import
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ClipExport:
+    clip_id: str
+    path: str
+    started_at: float
+    stop_at: float
+    events: List[Dict[str, Any]] = field(default_factory=list)
+
+
+class PrerollRecorder:
+    """Vòng đệm pre-roll + xuất clip theo yêu cầu (export() gọi được từ mọi luồng)"""
+    
+    def __init__(self, picam2, root: str, seconds_before: float = 10.0, seconds_after: float = 10.0,
+                 fps: int = 30, bitrate: int = 2_000_000, stream: str = "lores",
+                 max_bytes: int = 2 * 1024 * 1024 * 1024):
+        self.picam2 = picam2
+        self.root = root
+        self.seconds_before = seconds_before
+        self.seconds_after = seconds_after
+        self.fps = fps
+        self.bitrate = bitrate
+        self.stream = stream
+        self.max_bytes = max_bytes
+        
+        self.encoder = None
+        self.output = None
+        self.current: Optional[ClipExport] = None
+        self.exported = 0
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        # Mở / đóng file clip trên một luồng riêng - luồng gọi không chờ I/O
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="preroll")
+        os.makedirs(root, exist_ok=True)
+    
+    def start(self):
+        """Bắt đầu mã hóa vào vòng đệm (camera phải đang chạy)"""
+        H264Encoder = timed_import("picamera2.encoders").H264Encoder
+        CircularOutput = timed_import("picamera2.outputs").CircularOutput
+        self.encoder = H264Encoder(bitrate=self.bitrate, repeat=True, iperiod=self.fps)
+        self.output = CircularOutput(buffersize=int(self.fps * self.seconds_before))
+        self.picam2.start_encoder(self.encoder, self.output, name=self.stream)
+        logger.info(f"🎞️ Pre-roll {self.seconds_before:.0f}s đang ghi vào RAM ({self.stream}, {self.fps} fps)")
+    
+    @property
+    def recording(self) -> bool:
+        with self._lock:
+            return self.current is not None
+    
+    def export(self, reason: str, identity: Optional[str] = None, **detail) -> Optional[str]:
+        """Ghi pre-roll + post-roll ra đĩa. Sự kiện trong lúc đang ghi sẽ kéo dài clip hiện tại"""
+        if self.output is None:
+            return None
+        now = time.time()
+        event = {"reason": reason, "identity": identity, "ts": now, "detail": detail}
+        with self._lock:
+            if self.current is not None:
+                self.current.stop_at = now + self.seconds_after
+                self.current.events.append(event)
+                self._schedule_stop()
+                return self.current.clip_id
+            
+            stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(now))
+            clip_id = f"{stamp}-{reason}"
+            self.current = ClipExport(clip_id, os.path.join(self.root, f"{clip_id}.h264"),
+                                      now, now + self.seconds_after, [event])
+            self._executor.submit(self._begin, self.current)
+            self._schedule_stop()
+        logger.info(f"🎬 Xuất clip {clip_id} ({self.seconds_before:.0f}s trước + {self.seconds_after:.0f}s sau)")
+        return clip_id
+    
+    # ---- Internal ----
+    def _schedule_stop(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        delay = max(self.current.stop_at - time.time(), 0.0)
+        self._timer = threading.Timer(delay, lambda: self._executor.submit(self._finish))
+        self._timer.daemon = True
+        self._timer.start()
+    
+    def _begin(self, clip: ClipExport):
+        # CircularOutput ghi vòng đệm trước rồi tiếp tục ghi frame mới cho tới khi stop()
+        self.output.fileoutput = clip.path
+        self.output.start()
+    
+    def _finish(self):
+        with self._lock:
+            clip, self.current = self.current, None
+            self._timer = None
+        if clip is None:
+            return
+        try:
+            self.output.stop()
+        except Exception as e:
+            logger.error(f"❌ Pre-roll stop error: {e}")
+        
+        meta = {"clip_id": clip.clip_id, "file": os.path.basename(clip.path), "codec": "h264",
+                "fps": self.fps, "pre_roll_s": self.seconds_before, "started_at": clip.started_at,
+                "ended_at": time.time(), "events": clip.events}
+        with open(os.path.join(self.root, f"{clip.clip_id}.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=1, default=str)
+        self.exported += 1
+        size = os.path.getsize(clip.path) if os.path.exists(clip.path) else 0
+        logger.info(f"🎬 Clip {clip.clip_id}: {size / 1024 / 1024:.1f} MB")
+        self._evict()
+    
+    def _evict(self):
+        """Xóa clip cũ nhất khi vượt giới hạn dung lượng"""
+        clips = sorted(name[:-5] for name in os.listdir(self.root) if name.endswith(".h264"))
+        sizes = {clip: os.path.getsize(os.path.join(self.root, f"{clip}.h264")) for clip in clips}
+        total = sum(sizes.values())
+        for clip in clips[:-1]:
+            if total <= self.max_bytes:
+                break
+            for ext in (".h264", ".json"):
+                path = os.path.join(self.root, clip + ext)
+                if os.path.exists(path):
+                    os.remove(path)
+            total -= sizes[clip]
+            logger.info(f"🗑️ Clip cũ đã xóa: {clip}")
+    
+    def stop(self):
+        """Ghi nốt clip đang xuất rồi dừng bộ mã hóa"""
+        with self._lock:
+            timer = self._timer
+        if timer is not None:
+            timer.cancel()
+            self._executor.submit(self._finish)
+        self._executor.shutdown(wait=True)
+        if self.encoder is not None:
+            try:
+                self.picam2.stop_encoder(self.encoder)
+            except Exception as e:
+                logger.warning(f"⚠️ Pre-roll encoder stop: {e}")
@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+"""
+NHẬN DIỆN TỪ XA (OFFLOAD LÊN MÁY CHỦ TRONG LAN)
+Pi yếu ở cửa gửi frame (thu nhỏ, JPEG) lên một máy chủ nhận diện mạnh hơn.
+Máy chủ gom frame của nhiều cửa thành lô qua InferenceScheduler và trả về
+danh tính. Client giữ kết nối HTTP keep-alive trong pool; khi máy chủ chậm
+hoặc không truy cập được, frame được xử lý bằng model trên thiết bị và máy
+chủ tạm bị bỏ qua trong một khoảng thời gian (circuit breaker).
+Yêu cầu và phản hồi được ký HMAC bằng khóa của cửa như credential_sync
+(phản hồi gắn với nonce của yêu cầu) - phản hồi sai chữ ký bị coi là lỗi
+máy chủ và frame được nhận diện bằng model trên thiết bị.
+
+Máy chủ (khóa chủ / khóa cửa: credential_sync.py gen-key / door-key):
+    python3 remote_recognition.py serve --key-file central.key --port 8765 --models models --face-data face_data
+Máy chủ giả lập (không cần model) + đo độ trễ / fallback:
+    python3 remote_recognition.py serve --stand-in --delay-ms 20
+    python3 remote_recognition.py bench
+"""
+
+import argparse
+import hmac
+import http.client
+import json
+import logging
+import os
+import queue
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from credential_sync import MAX_CLOCK_SKEW, door_key, load_key, sign
+from inference_scheduler import InferenceScheduler
+from lazy_imports import lazy_module, timed_import
+
+cv2 = lazy_module("cv2")
+np = lazy_module("numpy")
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "application/x-face-batch"
+
+
+@dataclass
+class RemoteFaceResult:
+    """Cùng các thuộc tính FaceDetectionResult mà vòng lặp xác thực / GUI dùng"""
+    detected: bool = False
+    recognized: bool = False
+    person_name: Optional[str] = None
+    confidence: float = 0.0
+    bbox: Optional[Tuple[int, int, int, int]] = None  # x, y, w, h trên frame gốc
+    source: str = "remote"
+
+
+@dataclass
+class RemoteStats:
+    remote_frames: int = 0
+    local_frames: int = 0
+    failures: int = 0
+    rtt_ms: List[float] = field(default_factory=list)
+    
+    @property
+    def mean_rtt_ms(self) -> float:
+        return sum(self.rtt_ms) / len(self.rtt_ms) if self.rtt_ms else 0.0
+
+
+# ==== WIRE FORMAT ====
+# Yêu cầu: một dòng JSON {"client": ..., "frames": [{"codec", "size", ...}]} + các khối nhị phân nối tiếp
+# Phản hồi: JSON {"results": [{"detected", "recognized", "name", "confidence", "bbox"}]}
+# Xác thực: X-Door / X-Timestamp / X-Nonce / X-Signature trên yêu cầu, X-Signature(nonce, body) trên phản hồi
+def encode_frames(frames: List[Any], client: str, codec: str = "jpeg", quality: int = 80,
+                  max_width: int = 640) -> Tuple[bytes, List[float]]:
+    """Mã hóa lô frame, trả về (body, hệ số thu nhỏ của từng frame)"""
+    metas, blobs, scales = [], [], []
+    for frame in frames:
+        if frame.ndim == 3 and frame.shape[2] == 4:
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2BGR)
+        scale = 1.0
+        if max_width and frame.shape[1] > max_width:
+            scale = max_width / frame.shape[1]
+            frame = cv2.resize(frame, (max_width, int(frame.shape[0] * scale)), interpolation=cv2.INTER_AREA)
+        if codec == "jpeg":
+            ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            if not ok:
+                raise ValueError("JPEG encode failed")
+            blob = encoded.tobytes()
+            metas.append({"codec": "jpeg", "size": len(blob)})
+        else:
+            blob = np.ascontiguousarray(frame).tobytes()
+            metas.append({"codec": "raw", "size": len(blob), "shape": list(frame.shape), "dtype": str(frame.dtype)})
+        blobs.append(blob)
+        scales.append(scale)
+    header = json.dumps({"client": client, "frames": metas}, separators=(",", ":")).encode("utf-8")
+    return header + b"\n" + b"".join(blobs), scales
+
+
+def decode_frames(body: bytes) -> Tuple[str, List[Any]]:
+    header, _, data = body.partition(b"\n")
+    meta = json.loads(header)
+    frames, offset = [], 0
+    for item in meta["frames"]:
+        blob = data[offset:offset + item["size"]]
+        offset += item["size"]
+        if item["codec"] == "jpeg":
+            frame = cv2.imdecode(np.frombuffer(blob, dtype=np.uint8), cv2.IMREAD_COLOR)
+        else:
+            frame = np.frombuffer(blob, dtype=item["dtype"]).reshape(item["shape"])
+        frames.append(frame)
+    return meta.get("client", "?"), frames
+
+
+def result_to_dict(result: Any) -> Dict[str, Any]:
+    bbox = getattr(result, "bbox", None)
+    return {"detected": bool(getattr(result, "detected", False)),
+            "recognized": bool(getattr(result, "recognized", False)),
+            "name": getattr(result, "person_name", None),
+            "confidence": float(getattr(result, "confidence", 0.0) or 0.0),
+            "bbox": [int(v) for v in bbox] if bbox is not None and len(bbox) == 4 else None}
+
+
+# ==== CLIENT ====
+class _ConnectionPool:
+    """Kết nối HTTP/1.1 keep-alive dùng lại giữa các yêu cầu"""
+    
+    def __init__(self, host: str, port: int, size: int, timeout: float):
+        self.host, self.port, self.timeout = host, port, timeout
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue(maxsize=size)
+    
+    def get(self) -> http.client.HTTPConnection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+    
+    def put(self, conn: http.client.HTTPConnection):
+        try:
+            self._idle.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+    
+    def close(self):
+        while not self._idle.empty():
+            self._idle.get_nowait().close()
+
+
+class RemoteRecognizer:
+    """Thay thế ImprovedFaceRecognition: process_frame / process_batch gửi lên máy chủ,
+    lỗi hoặc chậm -> model trên thiết bị. Thuộc tính khác (add_person, get_database_info...)
+    chuyển thẳng cho model cục bộ."""
+    
+    def __init__(self, url: str, local: Any, key: bytes, timeout: float = 0.25, pool_size: int = 2,
+                 failure_threshold: int = 2, retry_after: float = 10.0, codec: str = "jpeg",
+                 jpeg_quality: int = 80, max_width: int = 640, client: Optional[str] = None):
+        """key: khóa của cửa client (credential_sync.py door-key <khóa chủ> <client>)"""
+        parts = urlsplit(url)
+        self.url = url
+        self.local = local
+        self.key = key
+        self.path = (parts.path.rstrip("/") or "") + "/recognize"
+        self.failure_threshold = failure_threshold
+        self.retry_after = retry_after
+        self.codec = codec
+        self.jpeg_quality = jpeg_quality
+        self.max_width = max_width
+        self.client = client or socket.gethostname()
+        self.stats = RemoteStats()
+        
+        self._pool = _ConnectionPool(parts.hostname, parts.port or 80, pool_size, timeout)
+        self._lock = threading.Lock()
+        self._consecutive_failures = 0
+        self._skip_until = 0.0
+    
+    def __getattr__(self, name: str):
+        return getattr(self.local, name)
+    
+    @property
+    def remote_available(self) -> bool:
+        with self._lock:
+            return time.monotonic() >= self._skip_until
+    
+    def process_frame(self, frame: Any) -> Tuple[Any, Any]:
+        return self.process_batch([frame])[0]
+    
+    def process_batch(self, frames: List[Any]) -> List[Tuple[Any, Any]]:
+        if self.remote_available:
+            try:
+                results = self._recognize_remote(frames)
+            except (OSError, http.client.HTTPException, ValueError) as e:
+                self._on_failure(e)
+            else:
+                self._on_success()
+                return [(self._annotate(frame, result), result) for frame, result in zip(frames, results)]
+        
+        self.stats.local_frames += len(frames)
+        if hasattr(self.local, "process_batch"):
+            return self.local.process_batch(frames)
+        return [self.local.process_frame(frame) for frame in frames]
+    
+    def _recognize_remote(self, frames: List[Any]) -> List[RemoteFaceResult]:
+        body, scales = encode_frames(frames, self.client, self.codec, self.jpeg_quality, self.max_width)
+        started = time.perf_counter()
+        nonce, stamp = os.urandom(16), str(time.time())
+        headers = {"Content-Type": CONTENT_TYPE, "X-Door": self.client, "X-Timestamp": stamp,
+                   "X-Nonce": nonce.hex(),
+                   "X-Signature": sign(self.key, b"POST", self.path.encode(), stamp.encode(), nonce,
+                                       self.client.encode("utf-8"), body)}
+        conn = self._pool.get()
+        try:
+            conn.request("POST", self.path, body=body, headers=headers)
+            response = conn.getresponse()
+            payload = response.read()
+        except BaseException:
+            conn.close()  # Kết nối hỏng / đang đọc dở - không trả lại pool
+            raise
+        self._pool.put(conn)
+        if response.status != 200:
+            raise ValueError(f"HTTP {response.status}")
+        # Danh tính chỉ tin khi phản hồi do máy chủ giữ khóa trả lời đúng yêu cầu này
+        if not hmac.compare_digest(sign(self.key, nonce, payload), response.getheader("X-Signature", "")):
+            raise ValueError("Chữ ký phản hồi không hợp lệ")
+        
+        self.stats.rtt_ms = (self.stats.rtt_ms + [(time.perf_counter() - started) * 1000])[-100:]
+        self.stats.remote_frames += len(frames)
+        results = []
+        for item, scale in zip(json.loads(payload)["results"], scales):
+            bbox = tuple(int(v / scale) for v in item["bbox"]) if item.get("bbox") else None
+            results.append(RemoteFaceResult(item["detected"], item["recognized"], item.get("name"),
+                                            item.get("confidence", 0.0), bbox))
+        if len(results) != len(frames):
+            raise ValueError(f"Server trả {len(results)} kết quả cho {len(frames)} frame")
+        return results
+    
+    def _annotate(self, frame: Any, result: RemoteFaceResult) -> Any:
+        """Khung xanh (đã nhận diện) / đỏ (người lạ) như model cục bộ"""
+        if result.bbox is None:
+            return frame
+        x, y, w, h = result.bbox
+        color = (0, 255, 0) if result.recognized else (0, 0, 255)
+        label = f"{result.person_name} {result.confidence:.0f}" if result.recognized else "Unknown"
+        frame = frame.copy()
+        cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
+        cv2.putText(frame, label, (x, max(y - 8, 12)), cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
+        return frame
+    
+    def _on_success(self):
+        with self._lock:
+            if self._consecutive_failures >= self.failure_threshold:
+                logger.info(f"🌐 Recognition server {self.url} hoạt động trở lại")
+            self._consecutive_failures = 0
+    
+    def _on_failure(self, error: Exception):
+        with self._lock:
+            self.stats.failures += 1
+            self._consecutive_failures += 1
+            if self._consecutive_failures >= self.failure_threshold:
+                self._skip_until = time.monotonic() + self.retry_after
+                logger.warning(f"⚠️ Recognition server lỗi ({error}) - dùng model trên thiết bị "
+                               f"{self.retry_after:.0f}s")
+    
+    def report(self) -> str:
+        return (f"remote {self.stats.remote_frames} frame (RTT {self.stats.mean_rtt_ms:.1f} ms), "
+                f"local {self.stats.local_frames}, lỗi {self.stats.failures}")
+    
+    def close(self):
+        self._pool.close()
+
+
+# ==== SERVER ====
+class RecognitionServer(ThreadingHTTPServer):
+    """Mỗi yêu cầu một luồng HTTP; frame của mọi cửa vào chung một InferenceScheduler"""
+    
+    daemon_threads = True
+    
+    def __init__(self, address: Tuple[str, int], scheduler: InferenceScheduler, master_key: bytes):
+        self.scheduler = scheduler
+        self.master_key = master_key
+        super().__init__(address, _RecognitionHandler)
+
+
+class _RecognitionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive cho pool kết nối của client
+    disable_nagle_algorithm = True  # Header + body gửi riêng - tránh chờ delayed ACK ~40 ms
+    
+    def do_GET(self):
+        self._key = None
+        if self.path.rstrip("/").endswith("/health"):
+            self._reply(200, {"ok": True, "stats": self.server.scheduler.report()})
+        else:
+            self._reply(404, {"error": "not found"})
+    
+    def _authenticate(self, body: bytes) -> bool:
+        """Yêu cầu phải ký bằng khóa của cửa và còn mới; lưu khóa + nonce để ký phản hồi"""
+        try:
+            door = self.headers["X-Door"]
+            stamp = self.headers["X-Timestamp"]
+            nonce = bytes.fromhex(self.headers["X-Nonce"])
+            key = door_key(self.server.master_key, door)
+            expected = sign(key, b"POST", self.path.encode(), stamp.encode(), nonce, door.encode("utf-8"), body)
+            fresh = abs(time.time() - float(stamp)) <= MAX_CLOCK_SKEW
+        except (KeyError, TypeError, ValueError):
+            fresh, expected = False, ""
+        if not fresh or not hmac.compare_digest(expected, self.headers.get("X-Signature", "")):
+            logger.warning(f"⚠️ Yêu cầu không hợp lệ từ {self.client_address[0]}: POST {self.path}")
+            self._reply(401, {"error": "unauthorized"})
+            return False
+        self._door, self._key, self._nonce = door, key, nonce
+        return True
+    
+    def do_POST(self):
+        self._key = None
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self._authenticate(body):
+            return
+        if not self.path.rstrip("/").endswith("/recognize"):
+            self._reply(404, {"error": "not found"})
+            return
+        try:
+            _, frames = decode_frames(body)
+            client = self._door
+            futures = [self.server.scheduler.infer(client, frame) for frame in frames]
+            results = [result_to_dict(future.result()[1]) for future in futures]
+        except Exception as e:
+            logger.error(f"❌ Recognize error: {e}")
+            self._reply(500, {"error": str(e)})
+            return
+        self._reply(200, {"results": results})
+    
+    def _reply(self, status: int, payload: Dict[str, Any]):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if getattr(self, "_key", None) is not None:
+            self.send_header("X-Signature", sign(self._key, self._nonce, data))
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+    
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class _StandInModel:
+    """Model giả cho máy chủ thử nghiệm: luôn nhận ra "stand-in", có thể giả lập độ trễ"""
+    
+    def __init__(self, delay_ms: float = 0.0):
+        self.delay = delay_ms / 1000
+    
+    def process_batch(self, frames: List[Any]) -> List[Tuple[Any, RemoteFaceResult]]:
+        if self.delay:
+            time.sleep(self.delay)
+        return [(frame, RemoteFaceResult(True, True, "stand-in", 99.0)) for frame in frames]
+
+
+def serve(master_key: bytes, host: str = "0.0.0.0", port: int = 8765, model: Any = None,
+          max_batch: int = 8, batch_window: float = 0.005):
+    scheduler = InferenceScheduler(max_batch=max_batch, batch_window=batch_window)
+    scheduler.start()
+    scheduler.load(lambda: model).result()
+    server = RecognitionServer((host, port), scheduler, master_key)
+    logger.info(f"🌐 Recognition server: http://{host}:{port}/recognize (lô tối đa {max_batch})")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        scheduler.stop()
+
+
+def _wait_healthy(host: str, port: int, timeout: float = 10.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection(host, port, timeout=1)
+            conn.request("GET", "/health")
+            ok = conn.getresponse().status == 200
+            conn.close()
+            if ok:
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
+def benchmark(frames: int = 200, port: int = 18765, delay_ms: float = 5.0) -> Dict[str, float]:
+    """Máy chủ giả lập trong tiến trình riêng: độ trễ remote, rồi fallback khi máy chủ bị tắt"""
+    
+    class _LocalModel:
+        def process_frame(self, frame):
+            return frame, RemoteFaceResult(source="local")
+    
+    master = os.urandom(32)
+    with tempfile.NamedTemporaryFile("w", suffix=".key", delete=False) as f:
+        f.write(master.hex())
+    server = subprocess.Popen([sys.executable, os.path.abspath(__file__), "serve", "--stand-in",
+                               "--key-file", f.name, "--host", "127.0.0.1", "--port", str(port),
+                               "--delay-ms", str(delay_ms)])
+    try:
+        if not _wait_healthy("127.0.0.1", port):
+            raise RuntimeError("Stand-in server không khởi động")
+        recognizer = RemoteRecognizer(f"http://127.0.0.1:{port}", _LocalModel(), door_key(master, "bench"),
+                                      codec="raw", retry_after=60, client="bench")
+        frame = np.zeros((480, 640, 3), dtype=np.uint8)
+        started = time.perf_counter()
+        for _ in range(frames):
+            _, result = recognizer.process_frame(frame)
+        remote_s = time.perf_counter() - started
+        remote_ok = result.source == "remote"
+    finally:
+        server.terminate()
+        server.wait()
+        os.remove(f.name)
+    
+    started = time.perf_counter()
+    for _ in range(frames):
+        _, result = recognizer.process_frame(frame)
+    fallback_s = time.perf_counter() - started
+    recognizer.close()
+    return {"frames": frames, "remote_ok": remote_ok, "remote_ms_per_frame": remote_s / frames * 1000,
+            "rtt_ms": recognizer.stats.mean_rtt_ms, "fallback_ms_per_frame": fallback_s / frames * 1000,
+            "local_frames": recognizer.stats.local_frames, "failures": recognizer.stats.failures}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Máy chủ nhận diện khuôn mặt dùng chung cho nhiều cửa")
+    sub = parser.add_subparsers(dest="command", required=True)
+    
+    s = sub.add_parser("serve", help="Chạy máy chủ nhận diện")
+    s.add_argument("--key-file", required=True, help="Khóa chủ (credential_sync.py gen-key)")
+    s.add_argument("--host", default="0.0.0.0")
+    s.add_argument("--port", type=int, default=8765)
+    s.add_argument("--max-batch", type=int, default=8, help="Frame tối đa mỗi lô suy luận")
+    s.add_argument("--models", default="models", help="Thư mục model (ImprovedFaceRecognition)")
+    s.add_argument("--face-data", default="face_data", help="Thư mục dữ liệu khuôn mặt")
+    s.add_argument("--confidence", type=float, default=0.5)
+    s.add_argument("--threshold", type=float, default=85.0)
+    s.add_argument("--stand-in", action="store_true", help="Model giả - thử nghiệm không cần model thật")
+    s.add_argument("--delay-ms", type=float, default=0.0, help="Độ trễ giả lập mỗi lô (chỉ với --stand-in)")
+    
+    b = sub.add_parser("bench", help="Đo độ trễ và fallback với máy chủ giả lập cục bộ")
+    b.add_argument("--frames", type=int, default=200)
+    b.add_argument("--port", type=int, default=18765)
+    args = parser.parse_args(argv)
+    
+    if args.command == "bench":
+        print("📊 Remote recognition benchmark:")
+        for key, value in benchmark(args.frames, args.port).items():
+            print(f"   {key}: {value:.2f}" if isinstance(value, float) else f"   {key}: {value}")
+        return 0
+    
+    if args.stand_in:
+        model = _StandInModel(args.delay_ms)
+    else:
+        ImprovedFaceRecognition = timed_import("improved_face_recognition").ImprovedFaceRecognition
+        model = ImprovedFaceRecognition(models_path=args.models, face_data_path=args.face_data,
+                                        confidence_threshold=args.confidence,
+                                        recognition_threshold=args.threshold)
+    serve(load_key(args.key_file), args.host, args.port, model, args.max_batch)
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    sys.exit(main())
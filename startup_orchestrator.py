@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+ĐIỀU PHỐI KHỞI ĐỘNG SONG SONG
+Mỗi thành phần (camera, RFID, vân tay, model AI...) được khởi tạo trên một
+luồng riêng ngay khi các phụ thuộc của nó sẵn sàng; mỗi thành phần có một
+Future báo sẵn sàng để GUI và luồng xác thực chờ đúng thứ mình cần.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ComponentState(Enum):
+    PENDING = "pending"
+    STARTING = "starting"
+    READY = "ready"
+    FAILED = "failed"
+
+
+class DependencyError(RuntimeError):
+    """Thành phần không thể khởi tạo vì phụ thuộc bị lỗi"""
+
+
+@dataclass
+class Component:
+    name: str
+    init: Callable[[], Any]
+    deps: List[str] = field(default_factory=list)
+    state: ComponentState = ComponentState.PENDING
+    future: Future = field(default_factory=Future)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[BaseException] = None
+    
+    @property
+    def duration(self) -> Optional[float]:
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+
+class StartupOrchestrator:
+    """Khởi tạo các thành phần đồng thời theo thứ tự phụ thuộc"""
+    
+    def __init__(self, max_workers: int = 6):
+        self._components: Dict[str, Component] = {}
+        self._listeners: List[Callable[[Component], None]] = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="startup")
+        self._started_at: Optional[float] = None
+    
+    def add(self, name: str, init: Callable[[], Any], deps: Iterable[str] = ()):
+        """Đăng ký thành phần, init() chạy trên luồng nền và trả về giá trị của Future"""
+        if name in self._components:
+            raise ValueError(f"Thành phần đã tồn tại: {name}")
+        self._components[name] = Component(name, init, list(deps))
+    
+    def add_listener(self, callback: Callable[[Component], None]):
+        """callback(component) mỗi khi trạng thái một thành phần thay đổi (gọi từ luồng nền)"""
+        self._listeners.append(callback)
+    
+    def start(self):
+        for component in self._components.values():
+            missing = [dep for dep in component.deps if dep not in self._components]
+            if missing:
+                raise ValueError(f"{component.name}: phụ thuộc không tồn tại {missing}")
+        self._started_at = time.monotonic()
+        for component in self._components.values():
+            self._schedule_if_ready(component)
+    
+    # ---- Internal ----
+    def _schedule_if_ready(self, component: Component):
+        with self._lock:
+            if component.state != ComponentState.PENDING:
+                return
+            deps = [self._components[dep] for dep in component.deps]
+            failed = [dep.name for dep in deps if dep.state == ComponentState.FAILED]
+            if not failed and any(dep.state != ComponentState.READY for dep in deps):
+                return
+            component.state = ComponentState.FAILED if failed else ComponentState.STARTING
+            component.started_at = time.monotonic()
+        
+        if failed:
+            self._finish(component, error=DependencyError(f"{component.name} cần {', '.join(failed)}"))
+            return
+        self._notify(component)
+        self._executor.submit(self._run, component)
+    
+    def _run(self, component: Component):
+        try:
+            result = component.init()
+        except BaseException as e:
+            self._finish(component, error=e)
+        else:
+            self._finish(component, result=result)
+    
+    def _finish(self, component: Component, result: Any = None, error: Optional[BaseException] = None):
+        with self._lock:
+            component.finished_at = time.monotonic()
+            component.state = ComponentState.FAILED if error else ComponentState.READY
+            component.error = error
+        
+        if error:
+            logger.error(f"❌ Khởi tạo {component.name} lỗi: {error}")
+            component.future.set_exception(error)
+        else:
+            logger.info(f"✅ {component.name} sẵn sàng ({component.duration:.2f}s)")
+            component.future.set_result(result)
+        self._notify(component)
+        
+        for dependent in self._components.values():
+            if component.name in dependent.deps:
+                self._schedule_if_ready(dependent)
+    
+    def _notify(self, component: Component):
+        for callback in self._listeners:
+            try:
+                callback(component)
+            except Exception as e:
+                logger.error(f"❌ Startup listener error: {e}")
+    
+    # ---- Query ----
+    def ready(self, name: str) -> Future:
+        """Future sẵn sàng của thành phần"""
+        return self._components[name].future
+    
+    def is_ready(self, *names: str) -> bool:
+        return all(self._components[name].state == ComponentState.READY for name in names)
+    
+    def when_ready(self, names: Iterable[str], callback: Callable[[bool], None]):
+        """Gọi callback(all_ok) một lần khi mọi thành phần đã xong (thành công hoặc lỗi)"""
+        names = list(names)
+        remaining = [len(names)]
+        lock = threading.Lock()
+        
+        def _done(_):
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            callback(self.is_ready(*names))
+        
+        if not names:
+            callback(True)
+        for name in names:
+            self.ready(name).add_done_callback(_done)
+    
+    def wait(self, names: Optional[Iterable[str]] = None, timeout: Optional[float] = None) -> bool:
+        futures = [self.ready(name) for name in (names or self._components)]
+        wait(futures, timeout=timeout)
+        return all(f.done() and f.exception() is None for f in futures)
+    
+    def status(self) -> Dict[str, Component]:
+        with self._lock:
+            return dict(self._components)
+    
+    def report(self) -> str:
+        """Bảng thời gian khởi động từng thành phần"""
+        lines = []
+        for component in self.status().values():
+            duration = f"{component.duration:.2f}s" if component.duration is not None else "-"
+            detail = f" ({component.error})" if component.error else ""
+            lines.append(f"{component.name:<12} {component.state.value:<8} {duration}{detail}")
+        finished = [c.finished_at for c in self._components.values() if c.finished_at is not None]
+        if self._started_at is not None and finished:
+            lines.append(f"{'total':<12} {'':<8} {max(finished) - self._started_at:.2f}s")
+        return "\n".join(lines)
+    
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+SỔ NGƯỜI DÙNG - RÀNG BUỘC DANH TÍNH GIỮA CÁC YẾU TỐ
+Mỗi người dùng gắn với một danh tính khuôn mặt, các template vân tay và các
+thẻ RFID. Chỉ mục ngược (khuôn mặt / template / UID -> người dùng) tra cứu
+O(1), để mỗi yếu tố được kiểm tra có thuộc đúng người đã xác định ở bước đầu
+hay không - khuôn mặt của A + thẻ của B không còn mở được cửa.
+
+    python3 user_registry.py users.json add khoi --name "Khoi" --face khoi --fingerprint 3 --card e5a8bd02
+    python3 user_registry.py users.json bind khoi --card 1b93f23c
+    python3 user_registry.py users.json list
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterable, List, Optional, Union
+
+from audit_log import format_uid
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class UserRecord:
+    user_id: str
+    name: str = ""
+    face: Optional[str] = None  # Tên người trong thư viện khuôn mặt
+    fingerprints: List[int] = field(default_factory=list)  # Vị trí template trên cảm biến
+    cards: List[str] = field(default_factory=list)  # UID dạng hex (format_uid)
+    enabled: bool = True
+
+
+def card_key(uid: Union[str, Iterable[int]]) -> str:
+    """UID [0xe5, 0xa8, ...] hoặc "E5:A8..." -> "e5a8..." """
+    if isinstance(uid, str):
+        return uid.replace(":", "").replace(" ", "").lower()
+    return format_uid(uid)
+
+
+class UserRegistry:
+    """Người dùng + chỉ mục ngược, lưu JSON (ghi file tạm rồi thay thế), thread-safe"""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._users: Dict[str, UserRecord] = {}
+        self._by_face: Dict[str, str] = {}
+        self._by_template: Dict[int, str] = {}
+        self._by_card: Dict[str, str] = {}
+        self._mtime: Optional[float] = None
+        self._lock = threading.RLock()
+        self.load()
+    
+    # ---- Persistence ----
+    def load(self):
+        with self._lock:
+            self._users = {}
+            if os.path.exists(self.path):
+                self._mtime = os.path.getmtime(self.path)
+                with open(self.path, encoding="utf-8") as f:
+                    for record in json.load(f).get("users", []):
+                        user = UserRecord(**record)
+                        self._users[user.user_id] = user
+            self._reindex()
+        logger.info(f"👥 {len(self._users)} người dùng ({self.path})")
+    
+    def refresh(self) -> bool:
+        """Nạp lại nếu file đã đổi (một lần stat) - vd. sửa bằng CLI khi hệ thống đang chạy"""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return False
+        if mtime == self._mtime:
+            return False
+        self.load()
+        return True
+    
+    def save(self):
+        with self._lock:
+            data = {"users": [asdict(user) for user in self._users.values()]}
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=1)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            self._mtime = os.path.getmtime(self.path)
+    
+    def _reindex(self):
+        """Dựng chỉ mục mới rồi thay một lần - luồng tra cứu không thấy chỉ mục dở dang.
+        Một khuôn mặt / template / thẻ chỉ thuộc về một người"""
+        by_face: Dict[str, str] = {}
+        by_template: Dict[int, str] = {}
+        by_card: Dict[str, str] = {}
+        for user in self._users.values():
+            if user.face is not None:
+                self._claim(by_face, user.face, user.user_id, "khuôn mặt")
+            for template_id in user.fingerprints:
+                self._claim(by_template, template_id, user.user_id, "template")
+            for card in user.cards:
+                self._claim(by_card, card, user.user_id, "thẻ")
+        self._by_face, self._by_template, self._by_card = by_face, by_template, by_card
+    
+    @staticmethod
+    def _claim(index: Dict, key, user_id: str, label: str):
+        owner = index.get(key)
+        if owner is not None and owner != user_id:
+            raise ValueError(f"{label} {key} đã gắn với {owner}")
+        index[key] = user_id
+    
+    # ---- Lookup (O(1)) ----
+    def __len__(self) -> int:
+        return len(self._users)
+    
+    def get(self, user_id: str) -> Optional[UserRecord]:
+        return self._users.get(user_id)
+    
+    def users(self) -> List[UserRecord]:
+        with self._lock:
+            return list(self._users.values())
+    
+    def _enabled(self, user_id: Optional[str]) -> Optional[UserRecord]:
+        user = self._users.get(user_id) if user_id is not None else None
+        return user if user is not None and user.enabled else None
+    
+    def by_face(self, name: Optional[str]) -> Optional[UserRecord]:
+        return self._enabled(self._by_face.get(name)) if name is not None else None
+    
+    def by_template(self, template_id: Optional[int]) -> Optional[UserRecord]:
+        return self._enabled(self._by_template.get(template_id)) if template_id is not None else None
+    
+    def by_card(self, uid: Optional[Union[str, Iterable[int]]]) -> Optional[UserRecord]:
+        return self._enabled(self._by_card.get(card_key(uid))) if uid is not None else None
+    
+    # ---- Management ----
+    def upsert(self, user: UserRecord) -> UserRecord:
+        """Thêm / thay người dùng - lỗi nếu khuôn mặt, template hoặc thẻ đã thuộc người khác"""
+        user.cards = [card_key(card) for card in user.cards]
+        with self._lock:
+            previous = self._users.get(user.user_id)
+            self._users[user.user_id] = user
+            try:
+                self._reindex()
+            except ValueError:
+                if previous is None:
+                    del self._users[user.user_id]
+                else:
+                    self._users[user.user_id] = previous
+                self._reindex()
+                raise
+            self.save()
+        return user
+    
+    def bind(self, user_id: str, face: Optional[str] = None, fingerprint: Optional[int] = None,
+             card: Optional[Union[str, Iterable[int]]] = None) -> UserRecord:
+        with self._lock:
+            user = self._users.get(user_id)
+            if user is None:
+                raise KeyError(user_id)
+            updated = UserRecord(user.user_id, user.name, user.face, list(user.fingerprints),
+                                 list(user.cards), user.enabled)
+            if face is not None:
+                updated.face = face
+            if fingerprint is not None and fingerprint not in updated.fingerprints:
+                updated.fingerprints.append(fingerprint)
+            if card is not None and card_key(card) not in updated.cards:
+                updated.cards.append(card_key(card))
+            return self.upsert(updated)
+    
+    def unbind(self, fingerprint: Optional[int] = None, card: Optional[Union[str, Iterable[int]]] = None,
+               face: Optional[str] = None):
+        """Gỡ template / thẻ / khuôn mặt khỏi người đang giữ (vd. khi admin xóa thẻ)"""
+        with self._lock:
+            changed = False
+            if fingerprint is not None and fingerprint in self._by_template:
+                user = self._users[self._by_template.pop(fingerprint)]
+                user.fingerprints.remove(fingerprint)
+                changed = True
+            if card is not None and card_key(card) in self._by_card:
+                user = self._users[self._by_card.pop(card_key(card))]
+                user.cards.remove(card_key(card))
+                changed = True
+            if face is not None and face in self._by_face:
+                self._users[self._by_face.pop(face)].face = None
+                changed = True
+            if changed:
+                self.save()
+    
+    def remove(self, user_id: str) -> bool:
+        with self._lock:
+            if self._users.pop(user_id, None) is None:
+                return False
+            self._reindex()
+            self.save()
+            return True
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Quản lý người dùng và ràng buộc yếu tố xác thực")
+    parser.add_argument("path", help="File người dùng (vd. users.json)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    
+    for name in ("add", "bind"):
+        p = sub.add_parser(name, help="Thêm người dùng" if name == "add" else "Gắn thêm yếu tố")
+        p.add_argument("user_id")
+        if name == "add":
+            p.add_argument("--name", default="")
+        p.add_argument("--face", help="Tên trong thư viện khuôn mặt")
+        p.add_argument("--fingerprint", type=int, action="append", default=[], help="ID template")
+        p.add_argument("--card", action="append", default=[], help="UID thẻ (hex)")
+    p = sub.add_parser("disable", help="Tạm khóa người dùng")
+    p.add_argument("user_id")
+    p = sub.add_parser("remove", help="Xóa người dùng")
+    p.add_argument("user_id")
+    sub.add_parser("list", help="Liệt kê")
+    args = parser.parse_args(argv)
+    
+    registry = UserRegistry(args.path)
+    try:
+        if args.command == "add":
+            registry.upsert(UserRecord(args.user_id, args.name or args.user_id, args.face,
+                                       args.fingerprint, args.card))
+        elif args.command == "bind":
+            registry.bind(args.user_id, face=args.face)
+            for template_id in args.fingerprint:
+                registry.bind(args.user_id, fingerprint=template_id)
+            for card in args.card:
+                registry.bind(args.user_id, card=card)
+        elif args.command == "disable":
+            user = registry.get(args.user_id)
+            if user is None:
+                raise KeyError(args.user_id)
+            user.enabled = False
+            registry.save()
+        elif args.command == "remove":
+            if not registry.remove(args.user_id):
+                raise KeyError(args.user_id)
+    except (KeyError, ValueError) as e:
+        print(f"❌ {e}", file=sys.stderr)
+        return 1
+    
+    for user in registry.users():
+        status = "✅" if user.enabled else "⛔"
+        print(f"{status} {user.user_id:<12} {user.name:<20} 🤖 {user.face or '-':<12} "
+              f"👆 {','.join(map(str, user.fingerprints)) or '-':<10} 📱 {','.join(user.cards) or '-'}")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    sys.exit(main())